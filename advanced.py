@@ -6,7 +6,7 @@ from qt.core import (  # type: ignore
     QPlainTextEdit, QPushButton, QSplitter, QLabel, QThread, QLineEdit,
     QGridLayout, QProgressBar, pyqtSignal, pyqtSlot, QPixmap, QEvent,
     QStackedWidget, QSpacerItem, QTabWidget, QCheckBox,
-    QComboBox, QSizePolicy)
+    QComboBox, QSizePolicy, QTimer)
 from calibre.constants import __version__  # type: ignore
 from calibre.gui2 import I  # type: ignore
 from calibre.utils.localization import _  # type: ignore
@@ -20,6 +20,7 @@ from .lib.translation import get_engine_class, get_translator, get_translation
 from .lib.element import get_element_handler
 from .lib.conversion import extract_item, extra_formats
 from .engines.openai import ChatgptTranslate, ChatgptBatchTranslate
+from .engines.anthropic import ClaudeTranslate, ClaudeBatchTranslate
 from .engines.custom import CustomTranslate
 from .components import (
     EngineList, Footer, SourceLang, TargetLang, InputFormat, OutputFormat,
@@ -178,6 +179,7 @@ class TranslationWorker(QObject):
         self.on_working = False
         self.canceled = False
         self.need_close = False
+        self.translation = None
         self.translate.connect(self.translate_paragraphs)
         # self.finished.connect(lambda: self.set_canceled(False))
 
@@ -199,11 +201,11 @@ class TranslationWorker(QObject):
     def set_need_close(self, need_close):
         self.need_close = need_close
 
-    @pyqtSlot(list, bool)
-    def translate_paragraphs(self, paragraphs=[], fresh=False):
-        """:fresh: retranslate all paragraphs."""
-        self.on_working = True
-        self.start.emit()
+    def prioritize(self, rows):
+        if self.translation is not None:
+            self.translation.prioritize(rows)
+
+    def get_translation(self, fresh):
         translator = get_translator(self.engine_class)
         translator.set_source_lang(self.source_lang)
         translator.set_target_lang(self.target_lang)
@@ -214,7 +216,17 @@ class TranslationWorker(QObject):
         translation.set_streaming(self.streaming.emit)
         translation.set_callback(self.callback.emit)
         translation.set_cancel_request(self.cancel_request)
+        return translation
+
+    @pyqtSlot(list, bool)
+    def translate_paragraphs(self, paragraphs=[], fresh=False):
+        """:fresh: retranslate all paragraphs."""
+        self.on_working = True
+        self.start.emit()
+        translation = self.get_translation(fresh)
+        self.translation = translation
         translation.handle(paragraphs)
+        self.translation = None
         self.on_working = False
         self.finished.emit()
         if self.need_close:
@@ -222,6 +234,23 @@ class TranslationWorker(QObject):
             self.close.emit(0)
 
 
+class PrefetchWorker(TranslationWorker):
+    """Translate the paragraphs around the rows under review in the
+    background, so that their translations are ready when the user steps to
+    them. The requests are sent one at a time in the given order, which
+    leaves most of the engine's budgets to the translation started by the
+    user.
+    """
+    def get_translation(self, fresh):
+        translation = TranslationWorker.get_translation(self, fresh)
+        translator = translation.translator
+        translator.concurrency_limit = 1
+        translator.adaptive_concurrency = False
+        translator.hedge_requests = False
+        translation.set_priority(None)
+        return translation
+
+
 class CreateTranslationProject(QDialog):
     start_translation = pyqtSignal(object)
 
@@ -364,8 +393,15 @@ class AdvancedTranslation(QDialog):
 
     preparation_thread = QThread()
     trans_thread = QThread()
+    prefetch_thread = QThread()
     editor_thread = QThread()
 
+    # The number of rows to prefetch from the current one onwards.
+    prefetch_rows = 10
+    # The delay in milliseconds before prefetching, which lets the view
+    # settle while the user is scrolling or stepping through the rows.
+    prefetch_delay = 500
+
     def __init__(self, plugin, parent, worker, ebook):
         QDialog.__init__(self, parent)
 
@@ -396,6 +432,16 @@ class AdvancedTranslation(QDialog):
         self.trans_thread.finished.connect(self.trans_worker.deleteLater)
         self.trans_thread.start()
 
+        self.prefetch_enabled = False
+        self.prefetch_worker = PrefetchWorker(self.current_engine, self.ebook)
+        self.prefetch_worker.moveToThread(self.prefetch_thread)
+        self.prefetch_thread.finished.connect(self.prefetch_worker.deleteLater)
+        self.prefetch_thread.start()
+        self.prefetch_timer = QTimer(self)
+        self.prefetch_timer.setSingleShot(True)
+        self.prefetch_timer.setInterval(self.prefetch_delay)
+        self.prefetch_timer.timeout.connect(self.prefetch_paragraphs)
+
         self.preparation_worker = PreparationWorker(
             self.current_engine, self.ebook)
         self.preparation_worker.close.connect(self.done)
@@ -745,14 +791,20 @@ class AdvancedTranslation(QDialog):
 
         self.batch_translation.connect(
             lambda: batch_translation.setVisible(
-                self.current_engine == ChatgptTranslate))
+                self.current_engine in (ChatgptTranslate, ClaudeTranslate)))
         self.batch_translation.emit()
 
         def start_batch_translation():
             translator = get_translator(self.current_engine)
             translator.set_source_lang(self.ebook.source_lang)
             translator.set_target_lang(self.ebook.target_lang)
-            batch_translator = ChatgptBatchTranslate(translator)
+            if self.current_engine == ClaudeTranslate:
+                batch_translator = ClaudeBatchTranslate(translator)
+            else:
+                batch_translator = ChatgptBatchTranslate(translator)
+            # Allow the background poller to convert the book once the
+            # batch translation has been applied.
+            self.cache.set_info('batch_ebook', self.ebook.to_json())
             batch = ChatgptBatchTranslationManager(
                 batch_translator, self.cache, self.table, self)
             batch.exec_()
@@ -880,10 +932,11 @@ class AdvancedTranslation(QDialog):
         layout.addWidget(title_group, 1)
         layout.addWidget(output_group)
 
-        source_lang.currentTextChanged.connect(
-            self.trans_worker.set_source_lang)
-        target_lang.currentTextChanged.connect(
-            self.trans_worker.set_target_lang)
+        for trans_worker in (self.trans_worker, self.prefetch_worker):
+            source_lang.currentTextChanged.connect(
+                trans_worker.set_source_lang)
+            target_lang.currentTextChanged.connect(
+                trans_worker.set_target_lang)
 
         def refresh_languages():
             source_lang.refresh.emit(
@@ -900,6 +953,7 @@ class AdvancedTranslation(QDialog):
             engine_name = engine_list.itemData(index)
             self.current_engine = get_engine_class(engine_name)
             self.trans_worker.set_engine_class(self.current_engine)
+            self.prefetch_worker.set_engine_class(self.current_engine)
             self.batch_translation.emit()
             refresh_languages()
         engine_list.currentIndexChanged.connect(choose_engine)
@@ -1083,11 +1137,32 @@ class AdvancedTranslation(QDialog):
         layout_button.setChecked(is_horizontal)
         layout_button.toggled.connect(self.toggle_review_layout)
 
+        prefetch_button = QPushButton(_('Prefetch'))
+        prefetch_button.setCheckable(True)
+        prefetch_button.setToolTip(_(
+            'Translate the paragraphs around the current one in the '
+            'background.'))
+
+        def pause_prefetch():
+            if self.prefetch_worker.on_working:
+                self.prefetch_worker.set_canceled(True)
+
+        def toggle_prefetch(checked):
+            self.ui_settings.setValue('review/prefetch', checked)
+            self.prefetch_enabled = checked
+            if checked:
+                self.schedule_prefetch()
+            else:
+                self.prefetch_timer.stop()
+                pause_prefetch()
+        prefetch_button.toggled.connect(toggle_prefetch)
+
         status_indicator = TranslationStatus()
 
         control_layout.addWidget(status_indicator)
         control_layout.addWidget(word_wrap_button)
         control_layout.addWidget(layout_button)
+        control_layout.addWidget(prefetch_button)
         control_layout.addStretch(1)
         control_layout.addWidget(save_status)
         control_layout.addWidget(save_button)
@@ -1114,6 +1189,8 @@ class AdvancedTranslation(QDialog):
 
         def change_selected_item():
             if self.trans_worker.on_working:
+                # Translate the selected paragraphs first.
+                self.trans_worker.prioritize(self.table.get_selected_rows())
                 return
             paragraph = self.table.current_paragraph()
             if paragraph is None:
@@ -1133,6 +1210,31 @@ class AdvancedTranslation(QDialog):
 
         self.trans_worker.callback.connect(translation_callback)
 
+        def prefetch_callback(paragraph):
+            self.table.row.emit(paragraph.row)
+            if self.cache is not None:
+                self.cache.update_paragraph(paragraph)
+            # Show the translation unless the user is editing it.
+            if paragraph is self.table.current_paragraph() and \
+                    not save_button.isEnabled():
+                self.paragraph_sig.emit(paragraph)
+        self.prefetch_worker.callback.connect(prefetch_callback)
+
+        def prefetch_finished():
+            # Start over if it was canceled for other rows or a translation.
+            if self.prefetch_worker.cancel_request():
+                self.prefetch_worker.set_canceled(False)
+                self.schedule_prefetch()
+        self.prefetch_worker.finished.connect(prefetch_finished)
+
+        self.trans_worker.start.connect(pause_prefetch)
+        self.trans_worker.finished.connect(self.schedule_prefetch)
+        self.table.itemSelectionChanged.connect(self.schedule_prefetch)
+        self.table.verticalScrollBar().valueChanged.connect(
+            lambda value: self.schedule_prefetch())
+        prefetch_button.setChecked(self.ui_settings.value(
+            'review/prefetch', False, type=bool))
+
         def streaming_translation(data):
             if data == '':
                 translation_text.clear()
@@ -1213,6 +1315,25 @@ class AdvancedTranslation(QDialog):
 
         return widget
 
+    def schedule_prefetch(self):
+        if self.prefetch_enabled:
+            self.prefetch_timer.start()
+
+    def prefetch_paragraphs(self):
+        """Translate the untranslated paragraphs around the current row in
+        the background. A prefetch of other rows in progress is canceled, and
+        it starts over once stopped. Prefetching pauses while a translation
+        started by the user is running.
+        """
+        if not self.prefetch_enabled or self.trans_worker.on_working:
+            return
+        if self.prefetch_worker.on_working:
+            self.prefetch_worker.set_canceled(True)
+            return
+        paragraphs = self.table.get_nearby_paragraphs(self.prefetch_rows)
+        if len(paragraphs) > 0:
+            self.prefetch_worker.translate.emit(paragraphs, False)
+
     def get_progress_step(self, total):
         return int(round(100.0 / (total or 1), 100) * 1000000)
 
@@ -1285,6 +1406,10 @@ class AdvancedTranslation(QDialog):
         self.preparation_thread.wait()
         self.trans_thread.quit()
         self.trans_thread.wait()
+        self.prefetch_enabled = False
+        self.prefetch_worker.set_canceled(True)
+        self.prefetch_thread.quit()
+        self.prefetch_thread.wait()
         self.editor_thread.quit()
         self.editor_thread.wait()
         if self.cache is not None:
@@ -3,7 +3,8 @@ import os.path
 
 from qt.core import (  # type: ignore
     QDialog, QWidget, QPushButton, QHeaderView, QVBoxLayout, QTableWidget,
-    QTableWidgetItem, Qt, QComboBox, QHBoxLayout, QApplication)
+    QTableWidgetItem, Qt, QComboBox, QHBoxLayout, QApplication, QLabel,
+    QSpinBox, QTimer)
 
 from calibre.utils.localization import _  # type: ignore
 
@@ -186,6 +187,67 @@ class BatchTranslation(QDialog):
 
         layout.addWidget(table)
 
+        # Scheduler
+        scheduler_widget = QWidget()
+        scheduler_layout = QHBoxLayout(scheduler_widget)
+        scheduler_layout.setContentsMargins(0, 0, 0, 0)
+        cpu_jobs = QSpinBox()
+        cpu_jobs.setRange(0, 999)
+        cpu_jobs.setSpecialValueText(_('Auto'))
+        cpu_jobs.setValue(self.config.get('cpu_jobs', 0))
+        cpu_jobs.setToolTip(_(
+            'The number of ebooks parsed or written at the same time. It '
+            'defaults to the number of CPU cores.'))
+        translating_jobs = QSpinBox()
+        translating_jobs.setRange(0, 999)
+        translating_jobs.setSpecialValueText(_('Off'))
+        translating_jobs.setValue(self.config.get('translating_jobs', 0))
+        translating_jobs.setToolTip(_(
+            'The number of ebooks translated at the same time by all jobs. '
+            'Their requests share the limits of the translation engine. It is '
+            'off by default, so every job translates as soon as its ebook is '
+            'parsed.'))
+        warm_workers = QSpinBox()
+        warm_workers.setRange(0, 999)
+        warm_workers.setSpecialValueText(_('Off'))
+        warm_workers.setValue(self.config.get('warm_workers', 0))
+        warm_workers.setToolTip(_(
+            'Split the ebooks in turn among the number of jobs, each of which '
+            'translates its ebooks one after another, so that the startup of '
+            'a job is not repeated for every ebook, e.g. short subtitles.'))
+        queue_state = QLabel()
+        scheduler_layout.addWidget(QLabel(_('Parsing/writing jobs')))
+        scheduler_layout.addWidget(cpu_jobs)
+        scheduler_layout.addWidget(QLabel(_('Translating jobs')))
+        scheduler_layout.addWidget(translating_jobs)
+        scheduler_layout.addWidget(QLabel(_('Warm workers')))
+        scheduler_layout.addWidget(warm_workers)
+        scheduler_layout.addStretch(1)
+        scheduler_layout.addWidget(queue_state)
+        layout.addWidget(scheduler_widget)
+
+        cpu_jobs.valueChanged.connect(
+            lambda value: self.config.save(cpu_jobs=value))
+        translating_jobs.valueChanged.connect(
+            lambda value: self.config.save(translating_jobs=value))
+        warm_workers.valueChanged.connect(
+            lambda value: self.config.save(warm_workers=value))
+
+        queue_state.setToolTip(_('The running/waiting jobs of each stage.'))
+        stage_labels = {
+            'parsing': _('Parsing'), 'translating': _('Translating'),
+            'writing': _('Writing')}
+
+        def refresh_queue_state():
+            queue_state.setText(' · '.join(
+                '%s: %s/%s' % (stage_labels[stage], running, waiting)
+                for stage, (waiting, running)
+                in self.worker.queue_state().items()))
+        refresh_queue_state()
+        self.queue_timer = QTimer(self)
+        self.queue_timer.timeout.connect(refresh_queue_state)
+        self.queue_timer.start(2000)
+
         start_button = QPushButton(_('Translate'))
 
         btn_text_color = 'royalblue'
@@ -211,7 +273,6 @@ class BatchTranslation(QDialog):
             self.alert.pop(
                 _('The specified path does not exist.'), 'warning')
             return
-        for ebook in self.ebooks:
-            self.worker.translate_ebook(ebook, is_batch=True)
+        self.worker.translate_ebooks(self.ebooks, is_batch=True)
         self.ebooks.clear()
         self.done(0)
@@ -10,6 +10,7 @@ import hashlib
 import logging
 import argparse
 import traceback
+import threading
 import copy
 from types import ModuleType
 from typing import Generator, Any
@@ -18,18 +19,18 @@ from contextlib import contextmanager
 from html import unescape
 from xml.sax.saxutils import escape as xml_escape
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+from http.client import HTTPConnection, HTTPSConnection, HTTPException, RemoteDisconnected
 
 # --- THIRD PARTY IMPORTS ---
 try:
     import ebooklib
     from ebooklib import epub
     from lxml import etree
-    from mechanize import Browser, Request, HTTPError
-    from mechanize._response import response_seek_wrapper as Response
     from cssselect import GenericTranslator, SelectorError
 except ImportError as e:
     print(f"Error: Missing dependency '{e.name}'.")
-    print("Please install requirements: pip install ebooklib lxml mechanize cssselect PySocks")
+    print("Please install requirements: pip install ebooklib lxml cssselect PySocks")
     sys.exit(1)
 
 # Optional SOCKS support
@@ -82,23 +83,86 @@ def create_xpath(selectors):
     if not rules: return ".//*" 
     return './/*[%s]' % ' or '.join(rules)
 
+class HttpError(Exception):
+    def __init__(self, status, reason, headers, body):
+        self.status, self.reason, self.headers, self.body = status, reason, headers, body
+        super().__init__(f"HTTP Error {status}: {reason}\n\n{body}")
+
+class Response:
+    """A fully read response, so that its connection can be reused while the
+    caller still reads the body."""
+    def __init__(self, resp, body):
+        self.status = self.code = resp.status
+        self.reason = self.msg = resp.reason
+        self.headers = resp.headers
+        self.body = body
+
+    def read(self): return self.body
+    def info(self): return self.headers
+
+class Session:
+    """Thread-safe pool of keep-alive connections shared by all worker threads."""
+    def __init__(self, size=8):
+        self.size = size
+        self.idle = {}
+        self.lock = threading.Lock()
+        self.ctx = ssl._create_unverified_context(cert_reqs=ssl.CERT_NONE)
+
+    def acquire(self, key, timeout, proxy_uri):
+        with self.lock:
+            conns = self.idle.get(key) or []
+            while conns:
+                conn = conns.pop()
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                    return conn, True
+        scheme, host, port = key
+        if proxy_uri:
+            p = urlsplit(proxy_uri if '://' in proxy_uri else 'http://' + proxy_uri)
+            if scheme == 'https':
+                conn = HTTPSConnection(p.hostname, p.port or 80, timeout=timeout, context=self.ctx)
+                conn.set_tunnel(host, port)
+                return conn, False
+            return HTTPConnection(p.hostname, p.port or 80, timeout=timeout), False
+        if scheme == 'https': return HTTPSConnection(host, port, timeout=timeout, context=self.ctx), False
+        return HTTPConnection(host, port, timeout=timeout), False
+
+    def release(self, key, conn):
+        with self.lock:
+            conns = self.idle.setdefault(key, [])
+            if len(conns) < self.size: return conns.append(conn)
+        conn.close()
+
+    def request(self, url, data=None, headers={}, method='GET', timeout=60, proxy_uri=None, raw_object=False):
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80))
+        selector = url if proxy_uri and parts.scheme == 'http' else (parts.path or '/') + ('?' + parts.query if parts.query else '')
+        if isinstance(data, str): data = data.encode('utf-8')
+        while True:
+            conn, reused = self.acquire(key, timeout, proxy_uri)
+            try:
+                conn.request(method, selector, data, headers)
+                resp = conn.getresponse()
+                body = resp.read()
+                break
+            except (RemoteDisconnected, ConnectionError, HTTPException):
+                conn.close()
+                if not reused: raise
+            except Exception:
+                conn.close()
+                raise
+        if resp.will_close: conn.close()
+        else: self.release(key, conn)
+        if resp.status >= 400:
+            raise HttpError(resp.status, resp.reason, resp.headers, body.decode('utf-8', 'replace'))
+        if raw_object: return Response(resp, body)
+        return body.decode('utf-8').strip()
+
+session = Session()
+
 def request(url, data=None, headers={}, method='GET', timeout=60, proxy_uri=None, raw_object=False):
-    br = Browser()
-    br.set_handle_robots(False)
-    try:
-        ctx = ssl._create_unverified_context(cert_reqs=ssl.CERT_NONE)
-        br.set_ca_data(context=ctx)
-    except: pass
-    if proxy_uri:
-        br.set_proxies({'http': proxy_uri, 'https': proxy_uri})
-    if data is not None and isinstance(data, str):
-        data = data.encode('utf-8')
     try:
-        req = Request(url, data, headers=headers, timeout=timeout, method=method)
-        br.open(req)
-        resp = br.response()
-        if resp is None or raw_object: return resp
-        return resp.read().decode('utf-8').strip()
+        return session.request(url, data, headers, method, timeout, proxy_uri, raw_object)
     except Exception as e:
         raise Exception(f"Request failed: {e}")
 
@@ -248,7 +312,8 @@ Processo: Identifica il tipo di testo (es. un saggio di fisica quantistica vs un
                 if s != -1 and e != -1: clean_json = clean_json[s:e+1]
             
             translated_data = json.loads(clean_json)
-            return [str(translated_data.get(str(i), "")).strip() for i in range(len(segments))]
+            # Missing IDs (e.g. a truncated response) are returned as None
+            return [str(translated_data[str(i)]).strip() if str(i) in translated_data else None for i in range(len(segments))]
         except Exception as e:
             log.error(f"Batch failed: {e}")
             return None
@@ -330,13 +395,69 @@ class ElementHandler:
             if content in trans_map:
                 el.add_translation(trans_map[content])
 
+# --- SECTION: BATCHING ---
+class BatchPacker:
+    """Fill each batch up to max_items and a budget of characters. The budget
+    is reduced when a batch comes back truncated or incomplete."""
+    def __init__(self, max_items=20, max_chars=8000):
+        self.max_items = max_items
+        self.budget = max_chars
+        self.lock = threading.Lock()
+
+    def pack(self, texts):
+        batches, current, length = [], [], 0
+        for text in texts:
+            if current and (len(current) >= self.max_items or length + len(text) > self.budget):
+                batches.append(current)
+                current, length = [], 0
+            current.append(text)
+            length += len(text)
+        if current: batches.append(current)
+        return batches
+
+    def reduce(self, length):
+        with self.lock:
+            budget = max(1, min(self.budget, length // 2))
+            if budget < self.budget:
+                self.budget = budget
+                log.warning(f"Incomplete batch, reducing the batch budget to {budget} characters")
+
+    def translate(self, engine, texts):
+        """Translate the texts in batches, keeping the items of an incomplete
+        batch that came back and retrying only the missing ones."""
+        results = []
+        for batch in self.pack(texts):
+            length = sum(len(t) for t in batch)
+            # Split the batches packed before the budget was reduced
+            if len(batch) > 1 and length > self.budget:
+                results.extend(self.translate(engine, batch))
+                continue
+            res = engine.translate_batch(batch) if len(batch) > 1 else None
+            if not res or len(res) != len(batch): res = [None] * len(batch)
+            missing = [i for i, r in enumerate(res) if not r]
+            if missing and len(batch) == 1:
+                log.warning(f"Batch failed for '{batch[0][:20]}...', fallback...")
+                res[0] = engine.translate(batch[0])
+            elif len(missing) == len(batch):
+                # Nothing came back: bisect to isolate the failing items
+                self.reduce(length)
+                mid = len(batch) // 2
+                res = self.translate(engine, batch[:mid]) + self.translate(engine, batch[mid:])
+            elif missing:
+                self.reduce(length)
+                for i, r in zip(missing, self.translate(engine, [batch[i] for i in missing])):
+                    res[i] = r
+            results.extend(res)
+        return results
+
 # --- SECTION: MAIN ENGINE ---
-def process_epub(input_path, use_opr=False, model=None, threads=8):
+def process_epub(input_path, use_opr=False, model=None, threads=8, batch_size=20, batch_chars=8000):
     if not os.path.exists(input_path): return log.error("File not found.")
     output_path = input_path.rsplit('.', 1)[0] + '_ITALIANO.epub'
     
     book = epub.read_epub(input_path)
     engine = OpenRouter(model=model) if use_opr else GoogleFreeTranslateNew()
+    session.size = max(session.size, threads)
     
     wrapped_pages = []
     for item in book.get_items_of_type(ebooklib.ITEM_DOCUMENT):
@@ -357,16 +478,16 @@ def process_epub(input_path, use_opr=False, model=None, threads=8):
     final_results = []
     start_time = time.time()
     
+    packer = BatchPacker(batch_size, batch_chars)
     if use_opr and hasattr(engine, 'translate_batch'):
-        batches = [valid_items[i:i+20] for i in range(0, len(valid_items), 20)]
-        
+        texts = [item[3] for item in valid_items]
+        batches = packer.pack(texts)
+        log.info(f"Packed {len(texts)} segments into {len(batches)} batches")
+
         def run_batch(b_info):
             idx, b = b_info
-            res = engine.translate_batch([item[3] for item in b])
-            if not res: 
-                log.warning(f"Batch {idx} failed, fallback...")
-                res = [engine.translate(item[3]) for item in b]
-            return [(item[3], r) for item, r in zip(b, res)]
+            res = packer.translate(engine, b)
+            return list(zip(b, res))
 
         with ThreadPoolExecutor(max_workers=threads) as exec:
             futs = {exec.submit(run_batch, (i, b)): i for i, b in enumerate(batches)}
@@ -410,16 +531,7 @@ def process_epub(input_path, use_opr=False, model=None, threads=8):
         titles = [it.title for it in toc_items]
         translated_titles = []
         if use_opr and hasattr(engine, 'translate_batch'):
-            for i in range(0, len(titles), 20):
-                batch = titles[i:i+20]
-                res = engine.translate_batch(batch)
-                if not res: 
-                    log.warning(f"TOC Batch {i//20} failed, fallback...")
-                    res = []
-                    for t in batch:
-                        try: res.append(engine.translate(t))
-                        except: res.append(t)
-                translated_titles.extend(res)
+            translated_titles = packer.translate(engine, titles)
         else:
             translated_titles = [engine.translate(t) for t in titles]
             
@@ -435,5 +547,7 @@ if __name__ == '__main__':
     p.add_argument('-OPR', action='store_true')
     p.add_argument('--model')
     p.add_argument('--threads', type=int, default=8)
+    p.add_argument('--batch-size', type=int, default=20, help='Max segments per batch')
+    p.add_argument('--batch-chars', type=int, default=8000, help='Max characters per batch, reduced automatically on incomplete batches')
     args = p.parse_args()
-    process_epub(args.input, args.OPR, args.model, args.threads)
+    process_epub(args.input, args.OPR, args.model, args.threads, args.batch_size, args.batch_chars)
@@ -72,11 +72,16 @@ class ChatgptBatchTranslationWorker(QObject):
     def create_batch(self):
         self.process_tip.emit(_('processing...'))
         self.stack_index.emit(1)
-        if self._file_id is None:
-            self._file_id = self._batch_translator.upload(self._paragraphs)
-            log.debug('A new file was uploaded: %s' % self._file_id)
-            self.save_file_id.emit(self._file_id)
-        self._batch_id = self._batch_translator.create(self._file_id)
+        if not self._batch_translator.upload_file:
+            # The original content is sent along with the batch requests.
+            self._batch_id = self._batch_translator.create(self._paragraphs)
+        else:
+            if self._file_id is None:
+                self._file_id = self._batch_translator.upload(
+                    self._paragraphs)
+                log.debug('A new file was uploaded: %s' % self._file_id)
+                self.save_file_id.emit(self._file_id)
+            self._batch_id = self._batch_translator.create(self._file_id)
         log.debug('A batch translation was created: %s' % self._batch_id)
         self.save_batch_id.emit(self._batch_id)
         self.check.emit()
@@ -102,7 +107,8 @@ class ChatgptBatchTranslationWorker(QObject):
         if self._batch_info.get('status') not in (
                 'cancelling', 'cancelled', 'completed', 'failed'):
             self._batch_translator.cancel(self._batch_id)
-            self._batch_translator.delete(self._file_id)
+            if self._file_id is not None:
+                self._batch_translator.delete(self._file_id)
         self.remove_batch.emit()
         self.finished.emit()
 
@@ -130,11 +136,13 @@ class ChatgptBatchTranslationManager(QDialog):
 
     def __init__(self, translator, cache, table, parent=None):
         QDialog.__init__(self, parent=parent)
-        self.setWindowTitle(_('ChatGPT Batch Translation'))
+        self.setWindowTitle(
+            _('{} Batch Translation').format(translator.translator.name))
         self.setMinimumWidth(500)
         self.setMinimumHeight(300)
         # self.setModal(True)
 
+        self.batch_translator = translator
         self.cache = cache
         self.table = table
 
@@ -154,8 +162,10 @@ class ChatgptBatchTranslationManager(QDialog):
 
         self.batch_worker.stack_index.connect(self.stack.setCurrentIndex)
 
-        self.batch_id = self.cache.get_info('chatgpt_batch_id')
-        self.file_id = self.cache.get_info('chatgpt_file_id')
+        self.batch_id_key = '%s_batch_id' % translator.cache_prefix
+        self.file_id_key = '%s_file_id' % translator.cache_prefix
+        self.batch_id = self.cache.get_info(self.batch_id_key)
+        self.file_id = self.cache.get_info(self.file_id_key)
 
         log.debug('Initialized batch id: %s' % self.batch_id)
         log.debug('Initialized file id: %s' % self.file_id)
@@ -167,20 +177,20 @@ class ChatgptBatchTranslationManager(QDialog):
 
         def set_batch_id(batch_id):
             self.batch_id = batch_id
-            self.cache.set_info('chatgpt_batch_id', batch_id)
+            self.cache.set_info(self.batch_id_key, batch_id)
             log.debug('A new batch id was stored: %s' % batch_id)
         self.batch_worker.save_batch_id.connect(set_batch_id)
 
         def set_file_id(file_id):
             self.file_id = file_id
-            self.cache.set_info('chatgpt_file_id', file_id)
+            self.cache.set_info(self.file_id_key, file_id)
             log.debug('A new file id was stored: %s' % file_id)
         self.batch_worker.save_file_id.connect(set_file_id)
 
         def remove_batch():
             self.file_id = None
-            self.cache.del_info('chatgpt_batch_id')
-            self.cache.del_info('chatgpt_file_id')
+            self.cache.del_info(self.batch_id_key)
+            self.cache.del_info(self.file_id_key)
             log.debug('The batch information was deleted.')
         self.batch_worker.remove_batch.connect(remove_batch)
 
@@ -197,12 +207,20 @@ class ChatgptBatchTranslationManager(QDialog):
     def layout_create(self):
         title = QLabel(_('Create a new batch translation'))
         title.setStyleSheet('font-size:16px;font-weight:bold;')
-        message = QLabel(_(
-            'All original content must be uploaded to OpenAI for batch '
-            'translation, and you will need to wait up to 24 hours to '
-            'continue the translation process.'
-            '<a href="https://cookbook.openai.com/examples/batch_processing">'
-            'more details</a>'))
+        if self.batch_translator.upload_file:
+            message = QLabel(_(
+                'All original content must be uploaded to OpenAI for batch '
+                'translation, and you will need to wait up to 24 hours to '
+                'continue the translation process.'
+                '<a href="https://cookbook.openai.com/examples/'
+                'batch_processing">more details</a>'))
+        else:
+            message = QLabel(_(
+                'All original content must be sent to Anthropic for batch '
+                'translation, and you will need to wait up to 24 hours to '
+                'continue the translation process.'
+                '<a href="https://docs.anthropic.com/en/docs/build-with-'
+                'claude/batch-processing">more details</a>'))
         message.setWordWrap(True)
         message.setOpenExternalLinks(True)
         button = QPushButton('Create Batch Translation')
@@ -55,6 +55,9 @@ class EngineWorker(QObject):
     check = pyqtSignal()
     usage = pyqtSignal(object)
 
+    # The interval in seconds between the updates of the streaming text.
+    stream_interval = 0.04
+
     def __init__(self, translator):
         QObject.__init__(self)
         self.translator = translator
@@ -69,12 +72,22 @@ class EngineWorker(QObject):
             translation = self.translator.translate(text)
             if isinstance(translation, GeneratorType):
                 clear = True
+                chunk = ''
+                updated = 0.0
                 for text in translation:
                     if clear:
                         self.clear.emit()
                         clear = False
-                    self.result.emit(text)
-                    time.sleep(0.05)
+                    chunk += text
+                    # Coalesce the chunks into updates at the frame rate of
+                    # the UI.
+                    now = time.monotonic()
+                    if now - updated >= self.stream_interval:
+                        self.result.emit(chunk)
+                        chunk = ''
+                        updated = now
+                if chunk:
+                    self.result.emit(chunk)
             else:
                 self.clear.emit()
                 self.result.emit(translation)
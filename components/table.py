@@ -226,6 +226,30 @@ class AdvancedTranslationTable(QTableWidget):
             items.append(paragraph)
         return items
 
+    def get_nearby_paragraphs(self, count=0):
+        """Get the untranslated paragraphs in the visible rows and in the
+        count of rows from the current one, the nearest to it first. The
+        failed paragraphs are left to the user.
+        """
+        top = self.rowAt(0)
+        if top < 0:
+            return []
+        bottom = self.rowAt(self.viewport().height() - 1)
+        if bottom < 0:
+            bottom = self.rowCount() - 1
+        selected_rows = self.get_selected_rows()
+        current = selected_rows[0] if len(selected_rows) > 0 else top
+        rows = set(range(top, bottom + 1))
+        rows.update(range(current, min(current + count, self.rowCount())))
+        items = []
+        for row in sorted(rows, key=lambda row: (abs(row - current), row)):
+            paragraph = self.paragraph(row)
+            if self.isRowHidden(row) or paragraph.translation \
+                    or paragraph.error is not None:
+                continue
+            items.append(paragraph)
+        return items
+
     def hide_by_paragraphs(self, paragraphs):
         for paragraph in paragraphs:
             self.hideRow(paragraph.row)
@@ -30,6 +30,8 @@ class ClaudeTranslate(GenAI):
     concurrency_limit = 1
     request_interval = 12.0
     request_timeout = 30.0
+    # The output is limited to 4096 tokens (max_tokens) for each request.
+    batch_characters = 4000
 
     prompt = (
         'You are a meticulous translator who translates any given content. '
@@ -132,10 +134,21 @@ class ClaudeTranslate(GenAI):
 
         return json.dumps(body)
 
+    def get_batch_body(self, segments):
+        body = json.loads(self.get_body(self.get_batch_content(segments)))
+        body.update(stream=False)
+        body['system'] += ' ' + self.batch_prompt
+        return json.dumps(body)
+
+    def get_batch_text(self, response):
+        return self._parse_response(response)
+
     def get_result(self, response: Response | str) -> str:
         if self.stream:
             return self._parse_stream(response)
+        return self._parse_response(response)
 
+    def _parse_response(self, response: str) -> str:
         response_json = json.loads(response)
         response_content_text: str = response_json['content'][0]['text']
         return response_content_text
@@ -173,10 +186,133 @@ class ClaudeTranslate(GenAI):
 
 
 class ClaudeBatchTranslate:
-    """TODO: use the message batches api (currently only the streaming api can
-    be used). The message batches api allows sending any number of batches of
-    up to 100,000 messages per batch. Batches are processed asynchronously with
-    results returned as soon as the batch is complete and cost 50% less than
-    standard API calls (more info here:
-    https://docs.anthropic.com/en/docs/build-with-claude/message-batches)
+    """The message batches API processes batches of up to 100,000 requests
+    asynchronously within 24 hours, at 50% of the cost of the standard API.
+    The original content is sent with the requests instead of being uploaded
+    as a file, and a selection beyond the limits of a single batch is split
+    into several batches, whose IDs are joined by commas. More info here:
+    https://docs.anthropic.com/en/docs/build-with-claude/batch-processing
     """
+    upload_file = False
+    cache_prefix = 'claude'
+    max_requests = 100000
+    # The size of a batch is limited to 256 MB.
+    max_bytes = 256 * 1024 * 1024
+
+    def __init__(self, translator):
+        self.translator = translator
+        self.translator.stream = False
+        self.batch_endpoint = '%s/batches' % translator.endpoint.rstrip('/')
+
+    def _request(self, url, data=None, method='GET', raw_object=False):
+        return request(
+            url, data, self.translator.get_headers(), method,
+            raw_object=raw_object, proxy_uri=self.translator.proxy_uri,
+            session=self.translator.session)
+
+    def chunk(self, paragraphs):
+        """Split the requests into batches within the API limits."""
+        batches: list[list[str]] = [[]]
+        size = 0
+        for paragraph in paragraphs:
+            params = json.loads(self.translator.get_body(paragraph.original))
+            params.pop('stream', None)
+            item = json.dumps({'custom_id': paragraph.md5, 'params': params})
+            item_size = len(item.encode('utf-8')) + 1
+            if batches[-1] and (len(batches[-1]) >= self.max_requests
+                                or size + item_size > self.max_bytes):
+                batches.append([])
+                size = 0
+            batches[-1].append(item)
+            size += item_size
+        return ['{"requests": [%s]}' % ','.join(batch)
+                for batch in batches if batch]
+
+    def create(self, paragraphs):
+        """https://docs.anthropic.com/en/api/creating-message-batches"""
+        batch_ids = []
+        for body in self.chunk(paragraphs):
+            response = self._request(self.batch_endpoint, body, 'POST')
+            batch_ids.append(json.loads(response).get('id'))
+        return ','.join(batch_ids)
+
+    def check(self, batch_id):
+        """Combine the states of the batches in the format of the OpenAI
+        batch object, which the batch translation manager displays.
+        https://docs.anthropic.com/en/api/retrieving-message-batches
+        """
+        batches = []
+        request_counts: dict[str, int] = {}
+        for item_id in batch_id.split(','):
+            batch = json.loads(
+                self._request('%s/%s' % (self.batch_endpoint, item_id)))
+            batches.append(batch)
+            for name, count in batch.get('request_counts', {}).items():
+                request_counts[name] = request_counts.get(name, 0) + count
+        statuses = [batch.get('processing_status') for batch in batches]
+        if 'in_progress' in statuses:
+            status = 'in_progress'
+        elif 'canceling' in statuses:
+            status = 'cancelling'
+        elif request_counts.get('succeeded', 0) > 0:
+            status = 'completed'
+        elif request_counts.get('canceled', 0) > 0:
+            status = 'cancelled'
+        else:
+            status = 'failed'
+        errors = None
+        if request_counts.get('errored', 0) or request_counts.get('expired'):
+            errors = {name: request_counts.get(name, 0)
+                      for name in ('errored', 'expired')}
+        return {
+            'id': batch_id,
+            'status': status,
+            'output_file_id': batch_id if status == 'completed' else None,
+            'request_counts': request_counts,
+            'errors': errors,
+            'batches': batches}
+
+    def retrieve(self, output_file_id):
+        return dict(self.results(output_file_id))
+
+    def results(self, output_file_id):
+        """Generate the custom IDs along with the translations.
+        https://docs.anthropic.com/en/api/retrieving-message-batch-results
+        """
+        for item_id in output_file_id.split(','):
+            response = self._request(
+                '%s/%s/results' % (self.batch_endpoint, item_id),
+                raw_object=True)
+            assert response is not None
+            for line in iter(response.readline, b''):
+                if not line.strip():
+                    continue
+                result = json.loads(line)
+                item = result.get('result', {})
+                if item.get('type') == 'succeeded':
+                    content = item['message']['content']
+                    yield result.get('custom_id'), ''.join(
+                        block.get('text', '') for block in content
+                        if block.get('type') == 'text')
+
+    def cancel(self, batch_id):
+        """https://docs.anthropic.com/en/api/canceling-message-batches"""
+        statuses = []
+        for item_id in batch_id.split(','):
+            response = self._request(
+                '%s/%s/cancel' % (self.batch_endpoint, item_id),
+                method='POST')
+            statuses.append(json.loads(response).get('processing_status'))
+        return all(status in ('canceling', 'ended') for status in statuses)
+
+    def delete(self, batch_id):
+        """Only the batches that have ended can be deleted.
+        https://docs.anthropic.com/en/api/deleting-message-batches
+        """
+        deleted = []
+        for item_id in batch_id.split(','):
+            response = self._request(
+                '%s/%s' % (self.batch_endpoint, item_id), method='DELETE')
+            deleted.append(
+                json.loads(response).get('type') == 'message_batch_deleted')
+        return all(deleted)
@@ -22,6 +22,11 @@ class BaiduTranslate(Base):
     api_key_pattern = r'^[^\s:\|]+?[:\|][^\s:\|]+$'
     api_key_errors = ['54004']
 
+    # The query is limited to 6000 bytes, and it is translated line by line.
+    support_batch = True
+    batch_size = 50
+    batch_characters = 2000
+
     def get_headers(self):
         return {'Content-Type': 'application/x-www-form-urlencoded'}
 
@@ -46,3 +51,22 @@ class BaiduTranslate(Base):
 
     def get_result(self, response):
         return json.loads(response)['trans_result'][0]['dst']
+
+    def get_batch_body(self, segments):
+        return self.get_body('\n'.join(segments))
+
+    def get_batch_result(self, response, segments):
+        """Reassemble the translated lines, which exclude the empty lines,
+        into the segments.
+        """
+        lines = [item['dst'] for item in json.loads(response)['trans_result']]
+        if len(lines) != sum(
+                1 for segment in segments
+                for line in segment.split('\n') if line.strip()):
+            return None
+        results = []
+        for segment in segments:
+            results.append('\n'.join(
+                lines.pop(0) if line.strip() else ''
+                for line in segment.split('\n')))
+        return results
@@ -1,3 +1,4 @@
+import sys
 import socket
 import os.path
 from typing import Any
@@ -7,6 +8,7 @@ from mechanize import HTTPError
 from calibre.utils.localization import _, lang_as_iso639_1  # type: ignore
 
 from ..lib.utils import log, traceback_error, request, socks_proxy
+from ..lib.session import get_session, get_async_session, AsyncSession
 from ..lib.exception import UnexpectedResult
 
 from .languages import lang_directionality
@@ -33,14 +35,39 @@ class Base:
     api_key_errors = ['401']
     separator = '\n\n'
     support_html = False
+    # The hooks building the request run on the event loop, so an engine
+    # whose hooks block on I/O must not support it.
+    support_async = True
+    # Translate multiple segments within a single request. The segments are
+    # translated independently by the services, so batching is used whenever
+    # it is supported, unless it needs to be opted in.
+    support_batch = False
+    batch_opt_in = False
+    # Pack the paragraphs of each page into their own batches.
+    batch_by_page = False
     placeholder = ('{{{{id_{}}}}}', r'({{\s*)+id\s*_\s*{}\s*(\s*}})+')
     using_tip = None
 
     concurrency_limit: int = 0
+    adaptive_concurrency: bool = False
+    min_concurrency: int = 1
+    max_concurrency: int = 16
     request_interval: float = 0.0
+    requests_per_minute: int = 0
+    tokens_per_minute: int = 0
     request_attempt: int = 3
     request_timeout: float = 10.0
     max_error_count: int = 10
+    pool_size: int = 0
+    # Send a duplicate of a request which is slower than the percentile of
+    # the observed latencies, within the budget (percent of the requests).
+    hedge_requests: bool = False
+    hedge_percentile: int = 95
+    hedge_budget: int = 10
+    # The limits of the online batching.
+    batch_size: int = 20
+    batch_characters: int = 8000
+    batch_timeout: float = 0.0
 
     def __init__(self):
         self.source_lang: str
@@ -59,9 +86,24 @@ class Base:
         concurrency_limit = self.config.get('concurrency_limit')
         if concurrency_limit is not None:
             self.concurrency_limit = int(concurrency_limit)
+        adaptive_concurrency = self.config.get('adaptive_concurrency')
+        if adaptive_concurrency is not None:
+            self.adaptive_concurrency = adaptive_concurrency
+        min_concurrency = self.config.get('min_concurrency')
+        if min_concurrency is not None:
+            self.min_concurrency = int(min_concurrency)
+        max_concurrency = self.config.get('max_concurrency')
+        if max_concurrency is not None:
+            self.max_concurrency = int(max_concurrency)
         request_interval = self.config.get('request_interval')
         if request_interval is not None:
             self.request_interval = request_interval
+        requests_per_minute = self.config.get('requests_per_minute')
+        if requests_per_minute is not None:
+            self.requests_per_minute = int(requests_per_minute)
+        tokens_per_minute = self.config.get('tokens_per_minute')
+        if tokens_per_minute is not None:
+            self.tokens_per_minute = int(tokens_per_minute)
         request_attempt = self.config.get('request_attempt')
         if request_attempt is not None:
             self.request_attempt = int(request_attempt)
@@ -71,6 +113,24 @@ class Base:
         max_error_count = self.config.get('max_error_count')
         if max_error_count is not None:
             self.max_error_count = max_error_count
+        pool_size = self.config.get('pool_size')
+        if pool_size is not None:
+            self.pool_size = int(pool_size)
+        hedge_requests = self.config.get('hedge_requests')
+        if hedge_requests is not None:
+            self.hedge_requests = hedge_requests
+        hedge_percentile = self.config.get('hedge_percentile')
+        if hedge_percentile is not None:
+            self.hedge_percentile = int(hedge_percentile)
+        hedge_budget = self.config.get('hedge_budget')
+        if hedge_budget is not None:
+            self.hedge_budget = int(hedge_budget)
+        batch_size = self.config.get('batch_size')
+        if batch_size is not None:
+            self.batch_size = int(batch_size)
+        batch_characters = self.config.get('batch_characters')
+        if batch_characters is not None:
+            self.batch_characters = int(batch_characters)
 
     @classmethod
     def load_lang_codes(cls, codes):
@@ -171,6 +231,27 @@ class Base:
             uri = f'http://{uri}'
         return uri
 
+    def _session_key(self):
+        return (self.name, self.proxy_type, self.proxy_host, self.proxy_port)
+
+    def _session_proxy_uri(self):
+        return self.proxy_uri if self.proxy_type == 'http' else None
+
+    @property
+    def session(self):
+        """The connection pool shared by all instances of the engine that use
+        the same proxy. Its size follows the concurrency limit by default.
+        """
+        return get_session(
+            self._session_key(), self.pool_size or self.concurrency_limit,
+            self._session_proxy_uri())
+
+    @property
+    def async_session(self):
+        return get_async_session(
+            self._session_key(), self.pool_size or self.concurrency_limit,
+            self._session_proxy_uri())
+
     def set_concurrency_limit(self, limit):
         self.concurrency_limit = limit
 
@@ -192,33 +273,36 @@ class Base:
     def _is_auto_lang(self):
         return self._get_source_code() == 'auto'
 
+    def _request(self, url, data, headers, method, timeout, raw_object=False):
+        params = {
+            'url': url,
+            'data': data,
+            'headers': headers,
+            'method': method,
+            'proxy_uri': None,
+            'timeout': timeout,
+            'raw_object': raw_object,
+            'session': self.session,
+        }
+        if self.proxy_type == 'socks5' and self.proxy_host is not None \
+                and self.proxy_port is not None:
+            with socks_proxy(self.proxy_host, self.proxy_port):
+                log.debug('Used socket: ', id(socket.socket))
+                return request(**params)
+        if self.proxy_type == 'http':
+            params['proxy_uri'] = self.proxy_uri
+        return request(**params)
+
     def translate(self, content):
         response = None
         try:
-            params = {
-                'url': self.get_endpoint(),
-                'data': self.get_body(content),
-                'headers': self.get_headers(),
-                'method': self.method,
-                'proxy_uri': None,
-                'timeout': int(self.request_timeout),
-                'raw_object': self.stream
-            }
-            if self.proxy_type == 'socks5' and self.proxy_host is not None \
-                    and self.proxy_port is not None:
-                with socks_proxy(self.proxy_host, self.proxy_port):
-                    log.debug('Used socket: ', id(socket.socket))
-                    response = request(**params)
-            else:
-                if self.proxy_type == 'http':
-                    params['proxy_uri'] = self.proxy_uri
-                response = request(**params)
+            response = self._request(
+                self.get_endpoint(), self.get_body(content),
+                self.get_headers(), self.method, int(self.request_timeout),
+                self.stream)
             return self.get_result(response)
-        except Exception as e:
-            # Combine the error messages for investigation.
-            error_message = traceback_error() + '\n\n' + str(e)
-            if not self.stream and isinstance(response, str):
-                error_message += '\n\n' + response
+        except Exception:
+            error_message = self._combine_error_message(response)
             # Swap a valid API key if necessary.
             if self.need_swap_api_key(error_message) and self.swap_api_key():
                 return self.translate(content)
@@ -226,6 +310,33 @@ class Base:
                 _('Can not parse returned response. Raw data: {}')
                 .format('\n\n' + error_message))
 
+    async def translate_async(self, content):
+        """The counterpart of translate which waits for the response without
+        occupying a thread. It is only used if allow_async returns True.
+        """
+        response = None
+        try:
+            response = await self.async_session.request(
+                self.get_endpoint(), self.get_body(content),
+                self.get_headers(), self.method, int(self.request_timeout),
+                self.stream)
+            return self.get_result(response)
+        except Exception:
+            error_message = self._combine_error_message(response)
+            if self.need_swap_api_key(error_message) and self.swap_api_key():
+                return await self.translate_async(content)
+            raise UnexpectedResult(
+                _('Can not parse returned response. Raw data: {}')
+                .format('\n\n' + error_message))
+
+    def _combine_error_message(self, response):
+        """Combine the error messages for investigation."""
+        error_type, error, _traceback = sys.exc_info()
+        error_message = traceback_error() + '\n\n' + str(error)
+        if not self.stream and isinstance(response, str):
+            error_message += '\n\n' + response
+        return error_message
+
     def get_endpoint(self):
         return self.endpoint
 
@@ -241,8 +352,53 @@ class Base:
     def get_usage(self):
         return None
 
+    def get_batch_endpoint(self):
+        return self.get_endpoint()
+
+    def get_batch_headers(self):
+        return self.get_headers()
+
+    def get_batch_body(self, segments: list[str]):
+        raise NotImplementedError()
+
+    def get_batch_result(self, response, segments: list[str]) -> list | None:
+        raise NotImplementedError()
+
+    def translate_batch(self, segments: list[str]) -> list | None:
+        """Translate the segments within a single request. The translation of
+        a missing segment is None, and None is returned if the response cannot
+        be parsed. The request errors are propagated so that they can be
+        retried according to the response status and headers.
+        """
+        response = self._request(
+            self.get_batch_endpoint(), self.get_batch_body(segments),
+            self.get_batch_headers(), self.method,
+            int(max(self.request_timeout, self.batch_timeout)))
+        return self.get_batch_result(response, segments)
+
+    def estimate_tokens(self, text) -> int:
+        """Estimate the cost of translating the text against the tokens per
+        minute budget. Most translation services count the characters.
+        """
+        return len(text)
+
     def allow_raw(self) -> bool:
         """Allow raw content translation only if the engine supports HTML and
         merge translation is disabled.
         """
         return self.support_html and not self.merge_enabled
+
+    def allow_batch(self) -> bool:
+        """Allow online batching only if the engine can translate multiple
+        paragraphs within a single request.
+        """
+        return self.support_batch
+
+    def allow_async(self) -> bool:
+        """Allow asynchronous translation only if the engine supports it and
+        does not customize the translate method. The SOCKS5 proxy relies on
+        patching the socket module, so it is only available synchronously.
+        """
+        return self.support_async and self.proxy_type != 'socks5' \
+            and type(self).translate is Base.translate \
+            and AsyncSession.is_available(self._session_proxy_uri())
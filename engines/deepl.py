@@ -1,8 +1,16 @@
+import re
 import json
 import time
+import uuid
 import random
+from html import escape
 
-from ..lib.utils import request
+from lxml import etree
+
+from ..lib.utils import log, request, traceback_error
+from ..lib.cancel import sleep
+from ..lib.exception import (
+    UnexpectedResult, RequestCanceled, TranslationCanceled)
 
 from .base import Base
 from .languages import deepl
@@ -21,6 +29,12 @@ class DeeplTranslate(Base):
     placeholder = ('<m id={} />', r'<m\s+id={}\s+/>')
     api_key_errors = ['403', '456']
 
+    # https://developers.deepl.com/docs/api-reference/translate
+    support_batch = True
+    batch_size = 50
+    # The size of a request is limited to 128 KiB.
+    batch_characters = 30000
+
     def get_usage(self):
         # See: https://www.deepl.com/docs-api/general/get-usage/
         headers = {'Authorization': 'DeepL-Auth-Key %s' % self.api_key}
@@ -52,12 +66,187 @@ class DeeplTranslate(Base):
     def get_result(self, response):
         return json.loads(response)['translations'][0]['text']
 
+    def get_batch_headers(self):
+        headers = self.get_headers()
+        headers.update({'Content-Type': 'application/json'})
+        return headers
+
+    def get_batch_body(self, segments):
+        body = self.get_body('')
+        body.update(text=segments)
+        return json.dumps(body)
+
+    def get_batch_result(self, response, segments):
+        translations = json.loads(response)['translations']
+        if len(translations) != len(segments):
+            return None
+        return [translation['text'] for translation in translations]
+
 
 class DeeplProTranslate(DeeplTranslate):
+    """In the document mode, the paragraphs of each page are translated as an
+    HTML document with the document API, and the paragraphs are mapped back
+    by position. The paragraphs of a document that fails are translated with
+    the text API instead.
+    https://developers.deepl.com/docs/api-reference/document
+    """
     name = 'DeepL(Pro)'
     alias = 'DeepL (Pro)'
     endpoint = 'https://api.deepl.com/v2/translate'
     usage_endpoint = 'https://api.deepl.com/v2/usage'
+    boundary = uuid.uuid4().hex
+
+    document_mode = False
+    document_size = 10000
+    document_characters = 1000000
+    document_interval = 1.0
+    document_timeout = 1800.0
+
+    def __init__(self):
+        super().__init__()
+        document_mode = self.config.get('document_mode')
+        if document_mode is not None:
+            self.document_mode = document_mode
+        if self.document_mode:
+            self.batch_by_page = True
+            self.batch_size = self.document_size
+            self.batch_characters = self.document_characters
+
+    def get_document_endpoint(self):
+        return '%s/document' % self.endpoint.rsplit('/', 1)[0]
+
+    def get_document(self, segments):
+        paragraphs = []
+        for segment in segments:
+            content = escape(segment, False)
+            # Keep the placeholders and line breaks as markups.
+            content = re.sub(
+                r'&lt;m\s+id=(\d+)\s+/&gt;', r'<m id="\1"></m>', content)
+            paragraphs.append('<p>%s</p>' % content.replace('\n', '<br/>'))
+        return '<!DOCTYPE html><html><head><meta charset="utf-8"/></head>' \
+            '<body>%s</body></html>' % ''.join(paragraphs)
+
+    def _get_text(self, element):
+        text = element.text or ''
+        for child in element:
+            if child.tag == 'm':
+                text += self.placeholder[0].format(child.get('id'))
+            elif child.tag == 'br':
+                text += '\n'
+            elif isinstance(child.tag, str):
+                text += self._get_text(child)
+            text += child.tail or ''
+        return text
+
+    def get_document_result(self, document, segments):
+        root = etree.HTML(document.encode('utf-8'))
+        paragraphs = [] if root is None else root.xpath('//body//p')
+        if len(paragraphs) != len(segments):
+            return None
+        return [self._get_text(paragraph) for paragraph in paragraphs]
+
+    def _create_multipart_form_data(self, fields, document):
+        """https://www.rfc-editor.org/rfc/rfc2046#section-5.1"""
+        data = []
+        for name, value in fields.items():
+            data.append('--%s' % self.boundary)
+            data.append('Content-Disposition: form-data; name="%s"' % name)
+            data.append('')
+            data.append(value)
+        data.append('--%s' % self.boundary)
+        data.append(
+            'Content-Disposition: form-data; name="file"; '
+            'filename="document.html"')
+        data.append('Content-Type: text/html')
+        data.append('')
+        data.append(document)
+        data.append('--%s--' % self.boundary)
+        return '\r\n'.join(data).encode('utf-8')
+
+    def upload_document(self, document):
+        fields = {'target_lang': self._get_target_code()}
+        if not self._is_auto_lang():
+            fields.update(source_lang=self._get_source_code())
+        headers = self.get_headers()
+        headers.update({
+            'Content-Type':
+            'multipart/form-data; boundary="%s"' % self.boundary})
+        response = self._request(
+            self.get_document_endpoint(),
+            self._create_multipart_form_data(fields, document), headers,
+            'POST', int(self.request_timeout))
+        data = json.loads(response)
+        return data['document_id'], data['document_key']
+
+    def _document_request(self, url, document_key):
+        headers = self.get_batch_headers()
+        body = json.dumps({'document_key': document_key})
+        return self._request(
+            url, body, headers, 'POST', int(self.request_timeout))
+
+    def check_document(self, document_id, document_key):
+        url = '%s/%s' % (self.get_document_endpoint(), document_id)
+        return json.loads(self._document_request(url, document_key))
+
+    def download_document(self, document_id, document_key):
+        url = '%s/%s/result' % (self.get_document_endpoint(), document_id)
+        return self._document_request(url, document_key)
+
+    def translate_document(self, segments):
+        document_id, document_key = self.upload_document(
+            self.get_document(segments))
+        deadline = time.monotonic() + self.document_timeout
+        while True:
+            status = self.check_document(document_id, document_key)
+            if status.get('status') == 'done':
+                break
+            if status.get('status') == 'error':
+                raise UnexpectedResult(status.get('error_message'))
+            if time.monotonic() > deadline:
+                raise UnexpectedResult(
+                    _('Timed out waiting for the document {}.')
+                    .format(document_id))
+            # The estimated remaining time is not always available.
+            if not sleep(max(self.document_interval, min(
+                    status.get('seconds_remaining') or 0, 60))):
+                raise RequestCanceled()
+        return self.get_document_result(
+            self.download_document(document_id, document_key), segments)
+
+    def _translate_texts(self, segments):
+        """Translate the segments with the text API in chunks within its
+        limits.
+        """
+        results: list = []
+        start = 0
+        while start < len(segments):
+            end, length = start, 0
+            while end < len(segments) and \
+                    end - start < DeeplTranslate.batch_size and (
+                        end == start or length + len(segments[end])
+                        <= DeeplTranslate.batch_characters):
+                length += len(segments[end])
+                end += 1
+            chunk = segments[start:end]
+            translations = super().translate_batch(chunk)
+            results.extend(translations or [None] * len(chunk))
+            start = end
+        return results
+
+    def translate_batch(self, segments):
+        if not self.document_mode:
+            return super().translate_batch(segments)
+        try:
+            results = self.translate_document(segments)
+            if results is not None:
+                return results
+            log.warn('The translated document does not match the original.')
+        except (RequestCanceled, TranslationCanceled):
+            raise
+        except Exception:
+            log.warn(
+                'Failed to translate the document: %s' % traceback_error())
+        return self._translate_texts(segments)
 
 
 class DeeplFreeTranslate(Base):
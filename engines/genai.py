@@ -1,5 +1,9 @@
+import re
+import json
 from abc import ABC, abstractmethod
 
+from ..lib.utils import log
+
 from .base import Base
 
 
@@ -15,6 +19,73 @@ class GenAI(Base, ABC):
     top_p: float
     top_k: int
 
+    # The segments are combined in a prompt, which affects the translation.
+    support_batch = True
+    batch_opt_in = True
+    # Whether the API can be asked to return a JSON object.
+    json_mode = False
+    # A batch takes much longer than a single paragraph to be generated.
+    batch_timeout: float = 180.0
+    batch_prompt = (
+        'The content is a JSON object whose values are the paragraphs to be '
+        'translated. Return a JSON object with the same keys, where each '
+        'value is the translation of the corresponding paragraph. Return '
+        'ONLY the JSON object. Example: {"0": "translation 1", "1": '
+        '"translation 2"}')
+
+    def estimate_tokens(self, text) -> int:
+        """Count the prompt, the text and a translation of about the same
+        length, assuming about three UTF-8 bytes per token, which is on the
+        safe side for most languages.
+        """
+        prompt = getattr(self, 'prompt', '') or ''
+        size = len(prompt.encode('utf-8')) + len(text.encode('utf-8')) * 2
+        return size // 3 + 1
+
     @abstractmethod
     def get_models(self) -> list[str]:
         """Automatically get the models for the engine."""
+
+    def get_batch_content(self, segments: list[str]) -> str:
+        return json.dumps(
+            {str(index): segment for index, segment in enumerate(segments)},
+            ensure_ascii=False)
+
+    @abstractmethod
+    def get_batch_body(self, segments: list[str]) -> str:
+        """Build a non-streaming request with the batch prompt appended to the
+        instructions and the ID-keyed segments as the content.
+        """
+
+    @abstractmethod
+    def get_batch_text(self, response) -> str:
+        """Extract the generated text from a non-streaming response."""
+
+    def get_batch_result(self, response, segments):
+        return self.parse_batch_result(
+            self.get_batch_text(response), len(segments))
+
+    def parse_batch_result(self, text: str, count: int) -> list | None:
+        if not text:
+            return None
+        # Strip the Markdown code fence or any text around the JSON object.
+        match = re.search(r'```(?:json)?\s*(.*?)```', text, re.S)
+        if match is not None:
+            text = match.group(1)
+        start, end = text.find('{'), text.rfind('}')
+        if start != -1 and end != -1:
+            text = text[start:end + 1]
+        try:
+            translations = json.loads(text)
+        except Exception as e:
+            # Usually the response was truncated by the output limit.
+            log.error(f'Failed to parse JSON batch response: {e}')
+            return None
+        if not isinstance(translations, dict):
+            return None
+        results = []
+        for index in range(count):
+            translation = translations.get(str(index))
+            results.append(
+                None if translation is None else str(translation).strip())
+        return results
@@ -2,7 +2,8 @@ import os
 import sys
 import time
 import json
-from html import unescape
+from html import escape, unescape
+from urllib.parse import urlencode
 from subprocess import Popen, PIPE
 from http.client import IncompleteRead
 
@@ -61,6 +62,12 @@ class GoogleFreeTranslateHtml(Base):
     endpoint = 'https://translate-pa.googleapis.com/v1/translateHtml'
     need_api_key = False
     support_html = True
+    # The service translates a list of HTML fragments like a web page, so
+    # the paragraphs of a page are sent within as few requests as possible.
+    support_batch = True
+    batch_by_page = True
+    batch_size = 1000
+    batch_characters = 30000
 
     def get_headers(self):
         return {
@@ -75,17 +82,27 @@ class GoogleFreeTranslateHtml(Base):
         }
 
     def get_body(self, text):
+        return self.get_batch_body([text])
+
+    def get_result(self, response):
+        return unescape(json.loads(response)[0][0])
+
+    def get_batch_body(self, segments):
+        # The text is escaped to be parsed as the content of the HTML.
         return json.dumps([
             [
-                [text],
+                [escape(segment, False) for segment in segments],
                 self._get_source_code(),
                 self._get_target_code()
             ],
             "wt_lib"
         ])
 
-    def get_result(self, response):
-        return json.loads(response)[0][0]
+    def get_batch_result(self, response, segments):
+        translations = json.loads(response)[0]
+        if len(translations) != len(segments):
+            return None
+        return [unescape(translation) for translation in translations]
 
 
 class GoogleFreeTranslate(Base):
@@ -127,6 +144,12 @@ class GoogleFreeTranslate(Base):
 
 class GoogleTranslate(Base):
     api_key_errors = ['429']
+    support_batch = True
+    # https://cloud.google.com/translate/quotas
+    batch_size = 128
+    batch_characters = 5000
+    # The headers depend on the gcloud CLI, which blocks while running.
+    support_async = False
     api_key_cache: tuple[float, str | None] = (0.0, None)
     gcloud = None
     project_id = None
@@ -250,6 +273,17 @@ class GoogleBasicTranslateADC(GoogleTranslate):
         translations = json.loads(response)['data']['translations']
         return ''.join(unescape(i['translatedText']) for i in translations)
 
+    def get_batch_body(self, segments):
+        body = json.loads(self.get_body(''))
+        body.update(q=segments)
+        return json.dumps(body)
+
+    def get_batch_result(self, response, segments):
+        translations = json.loads(response)['data']['translations']
+        if len(translations) != len(segments):
+            return None
+        return [unescape(i['translatedText']) for i in translations]
+
 
 class GoogleBasicTranslate(GoogleTranslate):
     name = 'Google(Basic)'
@@ -279,6 +313,18 @@ class GoogleBasicTranslate(GoogleTranslate):
         translations = json.loads(response)['data']['translations']
         return ''.join(unescape(i['translatedText']) for i in translations)
 
+    def get_batch_body(self, segments):
+        body = self.get_body('')
+        body.update(q=segments)
+        # Repeat the q parameter for each segment.
+        return urlencode(body, doseq=True)
+
+    def get_batch_result(self, response, segments):
+        translations = json.loads(response)['data']['translations']
+        if len(translations) != len(segments):
+            return None
+        return [unescape(i['translatedText']) for i in translations]
+
 
 class GoogleAdvancedTranslate(GoogleTranslate):
 
@@ -288,6 +334,8 @@ class GoogleAdvancedTranslate(GoogleTranslate):
     endpoint = 'https://translation.googleapis.com/v3/projects/{}'
     api_key_hint = 'PROJECT_ID'
     need_api_key = False
+    batch_size = 1024
+    batch_characters = 30000
 
     def get_endpoint(self):
         if self.endpoint is not None:
@@ -315,6 +363,17 @@ class GoogleAdvancedTranslate(GoogleTranslate):
         translations = json.loads(response)['translations']
         return ''.join(i['translatedText'] for i in translations)
 
+    def get_batch_body(self, segments):
+        body = json.loads(self.get_body(''))
+        body.update(contents=segments)
+        return json.dumps(body)
+
+    def get_batch_result(self, response, segments):
+        translations = json.loads(response)['translations']
+        if len(translations) != len(segments):
+            return None
+        return [i['translatedText'] for i in translations]
+
 
 class GeminiTranslate(GenAI):
     name = 'Gemini'
@@ -358,7 +417,7 @@ class GeminiTranslate(GenAI):
         self.stream = self.config.get('stream', self.stream)
         self.model = self.config.get('model', self.model)
 
-    def _prompt(self, text):
+    def _prompt(self, text, batch=False):
         prompt = self.prompt.replace('<tlang>', self.target_lang)
         if self._is_auto_lang():
             prompt = prompt.replace('<slang>', 'detected language')
@@ -369,6 +428,8 @@ class GeminiTranslate(GenAI):
             prompt += (
                 ' Ensure that placeholders matching the pattern {{id_\\d+}} '
                 'in the content are retained.')
+        if batch:
+            prompt += ' ' + self.batch_prompt
         return prompt + ' Start translating: ' + text
 
     def get_models(self):
@@ -391,16 +452,31 @@ class GeminiTranslate(GenAI):
             return f'{self.endpoint}/{self.model}:streamGenerateContent?' \
                 f'alt=sse&key={self.api_key}'
         else:
-            return f'{self.endpoint}/{self.model}:generateContent?' \
-                f'key={self.api_key}'
+            return self.get_batch_endpoint()
+
+    def get_batch_endpoint(self):
+        return f'{self.endpoint}/{self.model}:generateContent?' \
+            f'key={self.api_key}'
 
     def get_headers(self):
         return {'Content-Type': 'application/json'}
 
+    def get_batch_body(self, segments):
+        body = self._get_body(
+            self._prompt(self.get_batch_content(segments), batch=True))
+        body['generationConfig']['responseMimeType'] = 'application/json'
+        return json.dumps(body)
+
+    def get_batch_text(self, response):
+        return self._parse_response(response)
+
     def get_body(self, text):
-        return json.dumps({
+        return json.dumps(self._get_body(self._prompt(text)))
+
+    def _get_body(self, prompt):
+        return {
             "contents": [
-                {"role": "user", "parts": [{"text": self._prompt(text)}]},
+                {"role": "user", "parts": [{"text": prompt}]},
             ],
             "generationConfig": {
                 # "stopSequences": ["Test"],
@@ -427,11 +503,14 @@ class GeminiTranslate(GenAI):
                     "threshold": "BLOCK_NONE"
                 },
             ],
-        })
+        }
 
     def get_result(self, response):
         if self.stream:
             return self._parse_stream(response)
+        return self._parse_response(response)
+
+    def _parse_response(self, response):
         parts = json.loads(response)['candidates'][0]['content']['parts']
         return ''.join([part['text'] for part in parts])
 
@@ -23,6 +23,13 @@ class MicrosoftEdgeTranslate(Base):
     endpoint = 'https://api-edge.cognitive.microsofttranslator.com/translate'
     need_api_key = False
     access_info = None
+    # The headers fetch the token of the service, which blocks.
+    support_async = False
+
+    # https://learn.microsoft.com/azure/ai-services/translator/reference/v3-0-translate
+    support_batch = True
+    batch_size = 1000
+    batch_characters = 50000
 
     def _parse_jwt(self, token):
         parts = token.split(".")
@@ -69,6 +76,15 @@ class MicrosoftEdgeTranslate(Base):
     def get_result(self, response):
         return json.loads(response)[0]['translations'][0]['text']
 
+    def get_batch_body(self, segments):
+        return json.dumps([{'text': segment} for segment in segments])
+
+    def get_batch_result(self, response, segments):
+        items = json.loads(response)
+        if len(items) != len(segments):
+            return None
+        return [item['translations'][0]['text'] for item in items]
+
 
 class AzureChatgptTranslate(ChatgptTranslate):
     name = 'ChatGPT(Azure)'
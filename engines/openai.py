@@ -1,15 +1,16 @@
-import io
 import json
 import uuid
+import tempfile
 from typing import Any
+from concurrent.futures import (
+    Future, ThreadPoolExecutor, FIRST_COMPLETED, wait)
 from urllib.parse import urlsplit
 from http.client import IncompleteRead
 
-from mechanize._response import response_seek_wrapper as Response
 from calibre.utils.localization import _  # type: ignore
 
 from .. import EbookTranslator
-from ..lib.utils import request
+from ..lib.utils import log, request
 from ..lib.exception import UnsupportedModel
 
 from .genai import GenAI
@@ -48,6 +49,7 @@ class ChatgptTranslate(GenAI):
     temperature = 1.0
     top_p = 1.0
     stream = True
+    json_mode = True
 
     models: list[str] = []
     # TODO: Handle the default model more appropriately.
@@ -104,9 +106,23 @@ class ChatgptTranslate(GenAI):
         body.update({self.sampling: sampling_value})
         return json.dumps(body)
 
+    def get_batch_body(self, segments):
+        body = json.loads(self.get_body(self.get_batch_content(segments)))
+        body.pop('stream', None)
+        body['messages'][0]['content'] += ' ' + self.batch_prompt
+        if self.json_mode:
+            body.update(response_format={'type': 'json_object'})
+        return json.dumps(body)
+
+    def get_batch_text(self, response):
+        return self._parse_response(response)
+
     def get_result(self, response):
         if self.stream:
             return self._parse_stream(response)
+        return self._parse_response(response)
+
+    def _parse_response(self, response):
         # Parse JSON response with robust schema handling
         try:
             data = json.loads(response)
@@ -181,9 +197,72 @@ class ChatgptTranslate(GenAI):
                     continue
 
 
+class MultipartFile:
+    """Read a multipart form data body whose file part is read from disk
+    block by block, instead of building the whole body in memory.
+    https://www.rfc-editor.org/rfc/rfc2046#section-5.1
+    """
+    def __init__(self, boundary, file):
+        self.file = file
+        self.head = '\r\n'.join([
+            '--%s' % boundary,
+            'Content-Disposition: form-data; name="purpose"',
+            '',
+            'batch',
+            '--%s' % boundary,
+            'Content-Disposition: form-data; name="file"; '
+            'filename="original.jsonl"',
+            'Content-Type: application/json',
+            '', '']).encode('utf-8')
+        self.tail = ('\r\n--%s--' % boundary).encode('utf-8')
+        self.file.seek(0, 2)
+        self.size = len(self.head) + self.file.tell() + len(self.tail)
+        self.seek(0)
+
+    def __len__(self):
+        return self.size
+
+    def seek(self, offset):
+        """Rewind the body, e.g. to send it again with a new connection."""
+        assert offset == 0
+        self.file.seek(0)
+        self.parts = [self.head, self.file, self.tail]
+
+    def read(self, size=-1):
+        data = b''
+        while self.parts and (size < 0 or len(data) < size):
+            part = self.parts[0]
+            if isinstance(part, bytes):
+                length = len(part) if size < 0 else size - len(data)
+                data += part[:length]
+                if length < len(part):
+                    self.parts[0] = part[length:]
+                    break
+                self.parts.pop(0)
+                continue
+            chunk = part.read(-1 if size < 0 else size - len(data))
+            if not chunk:
+                self.parts.pop(0)
+            data += chunk
+        return data
+
+    def close(self):
+        self.file.close()
+
+
 class ChatgptBatchTranslate:
-    """https://cookbook.openai.com/examples/batch_processing"""
+    """https://cookbook.openai.com/examples/batch_processing
+
+    A selection beyond the limits of a single batch is split into several
+    files and batches, whose IDs are joined by commas.
+    """
     boundary = uuid.uuid4().hex
+    upload_file = True
+    cache_prefix = 'chatgpt'
+    # https://platform.openai.com/docs/api-reference/batch/create
+    max_requests = 50000
+    max_bytes = 200 * 1024 * 1024
+    upload_concurrency = 4
 
     def __init__(self, translator):
         self.translator = translator
@@ -194,22 +273,8 @@ class ChatgptBatchTranslate:
         self.file_endpoint = '%s/v1/files' % domain_name
         self.batch_endpoint = '%s/v1/batches' % domain_name
 
-    def _create_multipart_form_data(self, body):
-        """https://www.rfc-editor.org/rfc/rfc2046#section-5.1"""
-        data = []
-        data.append('--%s' % self.boundary)
-        data.append('Content-Disposition: form-data; name="purpose"')
-        data.append('')
-        data.append('batch')
-        data.append('--%s' % self.boundary)
-        data.append(
-            'Content-Disposition: form-data; name="file"; '
-            'filename="original.jsonl"')
-        data.append('Content-Type: application/json')
-        data.append('')
-        data.append(body)
-        data.append('--%s--' % self.boundary)
-        return '\r\n'.join(data).encode('utf-8')
+    def _create_multipart_form_data(self, file):
+        return MultipartFile(self.boundary, file)
 
     def supported_models(self):
         return self.translator.get_models()
@@ -219,6 +284,38 @@ class ChatgptBatchTranslate:
         headers.update(extra_headers)
         return headers
 
+    def chunk(self, paragraphs):
+        """Generate the JSONL files one by one, each of which is within the
+        limits of a batch. The content is written to temporary files, which
+        are deleted once closed.
+        """
+        file = None
+        count = size = 0
+        for paragraph in paragraphs:
+            data = self.translator.get_body(paragraph.original)
+            line = json.dumps({
+                "custom_id": paragraph.md5,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": json.loads(data)}).encode('utf-8')
+            line_size = len(line) + 1
+            if file is not None and (count >= self.max_requests
+                                     or size + line_size > self.max_bytes):
+                file.seek(0)
+                yield file
+                file = None
+            if file is None:
+                file = tempfile.TemporaryFile()
+                count = size = 0
+            else:
+                file.write(b'\n')
+            file.write(line)
+            count += 1
+            size += line_size
+        if file is not None:
+            file.seek(0)
+            yield file
+
     def upload(self, paragraphs):
         """Upload the original content and retrieve the file id.
         https://platform.openai.com/docs/api-reference/files/create
@@ -227,74 +324,164 @@ class ChatgptBatchTranslate:
             raise UnsupportedModel(
                 'The model "{}" does not support batch functionality.'
                 .format(self.translator.model))
-        body = io.StringIO()
-        for paragraph in paragraphs:
-            data = self.translator.get_body(paragraph.original)
-            body.write(json.dumps({
-                "custom_id": paragraph.md5,
-                "method": "POST",
-                "url": "/v1/chat/completions",
-                "body": json.loads(data)}))
-            if paragraph != paragraphs[-1]:
-                body.write('\n')
+        futures: list[Future] = []
+        try:
+            with ThreadPoolExecutor(self.upload_concurrency) as executor:
+                for file in self.chunk(paragraphs):
+                    # Only generate the next file when an upload slot is
+                    # free, and stop at the first failed upload.
+                    pending = [
+                        future for future in futures if not future.done()]
+                    if len(pending) >= self.upload_concurrency:
+                        wait(pending, return_when=FIRST_COMPLETED)
+                    for future in futures:
+                        if future.done() and future.exception() is not None:
+                            file.close()
+                            raise future.exception()  # type: ignore
+                    futures.append(executor.submit(self._upload, file))
+            return ','.join(future.result() for future in futures)
+        except Exception:
+            # Do not leave the files uploaded already on the account.
+            file_ids = [
+                future.result() for future in futures if future.done()
+                and future.exception() is None and future.result()]
+            if file_ids:
+                try:
+                    self.delete(','.join(file_ids))
+                except Exception as e:
+                    log.warn('Failed to delete the files: %s' % e)
+            raise
+
+    def _upload(self, file):
         content_type = 'multipart/form-data; boundary="%s"' % self.boundary
-        headers = self.headers({'Content-Type': content_type})
-        body = self._create_multipart_form_data(body.getvalue())
-        response = request(
-            self.file_endpoint, body, headers, 'POST',
-            proxy_uri=self.translator.proxy_uri)
+        body = self._create_multipart_form_data(file)
+        headers = self.headers({
+            'Content-Type': content_type, 'Content-Length': str(len(body))})
+        try:
+            response = request(
+                self.file_endpoint, body, headers, 'POST',
+                proxy_uri=self.translator.proxy_uri,
+                session=self.translator.session)
+        finally:
+            body.close()
         return json.loads(response).get('id')
 
     def delete(self, file_id):
         headers = self.translator.get_headers()
         del headers['Content-Type']
-        response = request(
-            '%s/%s' % (self.file_endpoint, file_id), headers=headers,
-            method='DELETE', proxy_uri=self.translator.proxy_uri)
-        return json.loads(response).get('deleted')
+        deleted = []
+        for item_id in file_id.split(','):
+            response = request(
+                '%s/%s' % (self.file_endpoint, item_id), headers=headers,
+                method='DELETE', proxy_uri=self.translator.proxy_uri,
+                session=self.translator.session)
+            deleted.append(json.loads(response).get('deleted'))
+        return all(deleted)
 
     def retrieve(self, output_file_id):
+        return dict(self.results(output_file_id))
+
+    def results(self, output_file_id):
+        """Generate the custom IDs along with the translations."""
         headers = self.translator.get_headers()
         del headers['Content-Type']
-        response = request(
-            '%s/%s/content' % (self.file_endpoint, output_file_id),
-            headers=headers, raw_object=True,
-            proxy_uri=self.translator.proxy_uri)
-        assert isinstance(response, Response)
-
-        translations = {}
-        for line in io.BytesIO(response.read()):
-            result = json.loads(line)
-            response_item = result['response']
-            if response_item.get('status_code') == 200:
-                content = response_item[
-                    'body']['choices'][0]['message']['content']
-                translations[result.get('custom_id')] = content
-        return translations
+        for item_id in output_file_id.split(','):
+            response = request(
+                '%s/%s/content' % (self.file_endpoint, item_id),
+                headers=headers, raw_object=True,
+                proxy_uri=self.translator.proxy_uri,
+                session=self.translator.session)
+            assert response is not None
+            # Parse the output file line by line instead of loading it whole.
+            for line in iter(response.readline, b''):
+                if not line.strip():
+                    continue
+                result = json.loads(line)
+                response_item = result['response']
+                if response_item.get('status_code') == 200:
+                    content = response_item[
+                        'body']['choices'][0]['message']['content']
+                    yield result.get('custom_id'), content
 
     def create(self, file_id):
         headers = self.translator.get_headers()
-        body = json.dumps({
-            'input_file_id': file_id,
-            'endpoint': '/v1/chat/completions',
-            'completion_window': '24h'})
-        response = request(
-            self.batch_endpoint, body, headers, 'POST',
-            proxy_uri=self.translator.proxy_uri)
-        return json.loads(response).get('id')
+        batch_ids = []
+        try:
+            for item_id in file_id.split(','):
+                body = json.dumps({
+                    'input_file_id': item_id,
+                    'endpoint': '/v1/chat/completions',
+                    'completion_window': '24h'})
+                response = request(
+                    self.batch_endpoint, body, headers, 'POST',
+                    proxy_uri=self.translator.proxy_uri,
+                    session=self.translator.session)
+                batch_ids.append(json.loads(response).get('id'))
+        except Exception:
+            # Do not leave the batches created already running.
+            if batch_ids:
+                try:
+                    self.cancel(','.join(batch_ids))
+                except Exception as e:
+                    log.warn('Failed to cancel the batches: %s' % e)
+            raise
+        return ','.join(batch_ids)
 
-    def check(self, batch_id):
+    def _check(self, batch_id):
         response = request(
             '%s/%s' % (self.batch_endpoint, batch_id),
             headers=self.translator.get_headers(),
-            proxy_uri=self.translator.proxy_uri)
+            proxy_uri=self.translator.proxy_uri,
+            session=self.translator.session)
         return json.loads(response)
 
+    def check(self, batch_id):
+        """Return the batch object, or a combination of the batch objects if
+        the translation was split into several batches.
+        """
+        batches = [self._check(item_id) for item_id in batch_id.split(',')]
+        if len(batches) == 1:
+            return batches[0]
+        statuses = [batch.get('status') for batch in batches]
+        if any(status in ('validating', 'in_progress', 'finalizing')
+               for status in statuses):
+            status = 'in_progress'
+        elif 'cancelling' in statuses:
+            status = 'cancelling'
+        elif 'completed' in statuses:
+            status = 'completed'
+        else:
+            status = statuses[0]
+        request_counts: dict[str, int] = {}
+        for batch in batches:
+            for name, count in (batch.get('request_counts') or {}).items():
+                request_counts[name] = request_counts.get(name, 0) + count
+        errors = [batch['errors'] for batch in batches if batch.get('errors')]
+        output_file_ids = [batch['output_file_id'] for batch in batches
+                           if batch.get('output_file_id')]
+        return {
+            'id': batch_id,
+            'status': status,
+            'output_file_id': ','.join(output_file_ids) or None,
+            'request_counts': request_counts,
+            'errors': errors or None,
+            'batches': batches}
+
     def cancel(self, batch_id):
         headers = self.translator.get_headers()
-        response = request(
-            '%s/%s/cancel' % (self.batch_endpoint, batch_id),
-            headers=headers, method='POST',
-            proxy_uri=self.translator.proxy_uri)
-        return json.loads(response).get('status') in (
-            'cancelling', 'cancelled')
+        item_ids = batch_id.split(',')
+        cancelled = []
+        for item_id in item_ids:
+            # Some of the batches may have finished already.
+            if len(item_ids) > 1 and self._check(item_id).get('status') in (
+                    'cancelling', 'cancelled', 'completed', 'failed',
+                    'expired'):
+                continue
+            response = request(
+                '%s/%s/cancel' % (self.batch_endpoint, item_id),
+                headers=headers, method='POST',
+                proxy_uri=self.translator.proxy_uri,
+                session=self.translator.session)
+            cancelled.append(json.loads(response).get('status') in (
+                'cancelling', 'cancelled'))
+        return all(cancelled)
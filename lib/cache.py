@@ -35,6 +35,7 @@ class Paragraph:
         self.row = -1
         self.is_cache = False
         self.error = None
+        self.retry = 0
         self.aligned = True
 
     def get_attributes(self) -> dict:
@@ -246,6 +247,18 @@ class TranslationCache:
             tuple(list(kwargs.values()) + ids))
         self.connection.commit()
 
+    def update_translations(self, translations, engine_name, target_lang):
+        """Update the translations matched by MD5 within a single transaction
+        while consuming the (md5, translation) pairs.
+        """
+        self.cursor.executemany(
+            'UPDATE cache SET translation=?, engine_name=?, target_lang=? '
+            'WHERE md5=?',
+            ((translation, engine_name, target_lang, md5)
+             for md5, translation in translations))
+        self.connection.commit()
+        return self.cursor.rowcount
+
     def ignore(self, ids):
         self.update(ids, ignored=True)
 
@@ -0,0 +1,74 @@
+import time
+import socket
+import threading
+from contextvars import ContextVar
+
+
+class CancelScope:
+    """Abort the requests made within the scope from another thread. The
+    connections used by the requests are tracked, and their sockets are shut
+    down on cancellation, which unblocks the threads waiting for responses.
+    The sleeps within the scope are interrupted as well.
+    """
+    def __init__(self):
+        self.connections: set = set()
+        self.event = threading.Event()
+        self.lock = threading.Lock()
+
+    @property
+    def canceled(self):
+        return self.event.is_set()
+
+    def add(self, connection):
+        with self.lock:
+            if not self.canceled:
+                self.connections.add(connection)
+                return
+        shutdown(connection)
+
+    def discard(self, connection):
+        with self.lock:
+            self.connections.discard(connection)
+
+    def cancel(self):
+        with self.lock:
+            self.event.set()
+            connections = list(self.connections)
+            self.connections.clear()
+        for connection in connections:
+            shutdown(connection)
+
+
+def shutdown(connection):
+    sock = getattr(connection, 'sock', None)
+    if sock is None:
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+current_scope: ContextVar[CancelScope | None] = ContextVar(
+    'cancel_scope', default=None)
+
+
+def get_scope() -> CancelScope | None:
+    return current_scope.get()
+
+
+def is_canceled() -> bool:
+    scope = current_scope.get()
+    return scope is not None and scope.canceled
+
+
+def sleep(seconds, default=time.sleep):
+    """Sleep like time.sleep, but wake up at once if the current scope is
+    canceled. Return False in that case. Outside of a scope, the default
+    function sleeps.
+    """
+    scope = current_scope.get()
+    if scope is None:
+        default(seconds)
+        return True
+    return not scope.event.wait(seconds)
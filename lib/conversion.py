@@ -18,12 +18,13 @@ from calibre.ebooks.metadata.meta import (  # type: ignore
 from .. import EbookTranslator
 
 from .config import get_config
-from .utils import log, sep, uid, open_path, open_file
+from .utils import log, sep, uid, open_path, open_file, traceback_error
 from .cache import get_cache
 from .element import (
     get_element_handler, get_srt_elements, get_toc_elements, get_page_elements,
     get_metadata_elements, get_pgn_elements)
 from .translation import get_translator, get_translation
+from .scheduler import StageScheduler, get_queue_state
 from .exception import ConversionAbort
 
 
@@ -49,7 +50,7 @@ class PrepareStream:
 
 def convert_book(
         input_path, output_path, translation, element_handler, cache,
-        debug_info, encoding, notification) -> None:
+        debug_info, encoding, notification, scheduler) -> None:
     """Process ebooks that Calibre supported."""
     plumber = Plumber(
         input_path, output_path, log=log, report_progress=notification)
@@ -71,6 +72,7 @@ def convert_book(
         cache.save(original_group)
 
         paragraphs = cache.all_paragraphs()
+        scheduler.enter('translating')
         translation.handle(paragraphs)
         element_handler.add_translations(paragraphs)
 
@@ -81,15 +83,17 @@ def convert_book(
         self.report_progress = CompositeProgressReporter(
             backup_progress, 1, notification)
         self.report_progress(0., _('Outputting ebook file...'))
+        scheduler.enter('writing')
         _convert(oeb, output_path, input_plugin, opts, log)
 
     plumber.output_plugin.convert = MethodType(convert, plumber.output_plugin)
+    scheduler.enter('parsing')
     plumber.run()
 
 
 def convert_srt(
         input_path, output_path, translation, element_handler, cache,
-        debug_info, encoding, notification) -> None:
+        debug_info, encoding, notification, scheduler) -> None:
     log.info('Translating subtitles content... (this will take a while)')
     log.info(debug_info)
 
@@ -99,6 +103,7 @@ def convert_srt(
 
     paragraphs = cache.all_paragraphs()
     translation.set_progress(notification)
+    scheduler.enter('translating')
     translation.handle(paragraphs)
     element_handler.add_translations(paragraphs)
 
@@ -106,6 +111,7 @@ def convert_srt(
     log.info(_('Starting to output subtitles file...'))
     log.info(sep())
 
+    scheduler.enter('writing')
     with open(output_path, 'w') as file:
         file.write('\n\n'.join([e.get_translation() for e in elements]))
 
@@ -114,7 +120,7 @@ def convert_srt(
 
 def convert_pgn(
         input_path, output_path, translation, element_handler, cache,
-        debug_info, encoding, notification) -> None:
+        debug_info, encoding, notification, scheduler) -> None:
     log.info('Translating PGN content... (this may be take a while)')
     log.info(debug_info)
 
@@ -124,6 +130,7 @@ def convert_pgn(
 
     paragraphs = cache.all_paragraphs()
     translation.set_progress(notification)
+    scheduler.enter('translating')
     translation.handle(paragraphs)
     element_handler.add_translations(paragraphs)
 
@@ -131,6 +138,7 @@ def convert_pgn(
     log.info(_('Starting to output PGN file...'))
     log.info(sep())
 
+    scheduler.enter('writing')
     pgn_content = open_file(input_path, encoding)
     for element in elements:
         pgn_content = pgn_content.replace(
@@ -232,20 +240,54 @@ def convert_item(
     debug_info += '| Cache Enabled: %s\n' % cache.is_persistence()
     debug_info += '| Merging Length: %s\n' % element_handler.merge_length
     debug_info += '| Concurrent requests: %s\n' % translator.concurrency_limit
+    if translator.adaptive_concurrency:
+        debug_info += '| Adaptive Concurrency: %s-%s\n' % (
+            translator.min_concurrency, translator.max_concurrency)
     debug_info += '| Request Interval: %s\n' % translator.request_interval
+    debug_info += '| Requests per Minute: %s\n' % translator.requests_per_minute
+    debug_info += '| Tokens per Minute: %s\n' % translator.tokens_per_minute
     debug_info += '| Request Attempt: %s\n' % translator.request_attempt
     debug_info += '| Request Timeout: %s\n' % translator.request_timeout
     debug_info += '| Input Path: %s\n' % input_path
     debug_info += '| Output Path: %s' % output_path
 
+    config = get_config()
+    scheduler = StageScheduler(
+        ebook_title, config.get('cpu_jobs'),
+        0 if cache_only else config.get('translating_jobs') or 0)
     handler: dict[str, Callable] | None = extra_formats.get(format)
     convertor = convert_book if handler is None else handler['convertor']
-    convertor(
-        input_path, output_path, translation, element_handler, cache,
-        debug_info, encoding, notification)
+    try:
+        convertor(
+            input_path, output_path, translation, element_handler, cache,
+            debug_info, encoding, notification, scheduler)
+    finally:
+        scheduler.finish()
     cache.done()
 
 
+def convert_items(items, notification):
+    """Translate several ebooks one after another within a single job. The
+    job process keeps the imported modules and the pooled connections of the
+    engines between the ebooks, which saves the startup of a worker for each
+    ebook. The translator, the glossary and the cache are still created for
+    each ebook, as its languages may differ. The error of an ebook does not
+    stop the others, so the errors are returned in the order of the ebooks.
+    """
+    errors = []
+    for index, args in enumerate(items):
+        progress = CompositeProgressReporter(
+            index / len(items), (index + 1) / len(items), notification)
+        try:
+            convert_item(*args, progress)
+            errors.append(None)
+        except Exception:
+            error = traceback_error()
+            log.error(error)
+            errors.append(error)
+    return errors
+
+
 class ConversionWorker:
     def __init__(self, gui, icon):
         self.gui = gui
@@ -255,32 +297,84 @@ class ConversionWorker:
         self.api = self.db.new_api
         self.working_jobs = self.gui.bookfere_ebook_translator.jobs
 
-    def translate_ebook(self, ebook, cache_only=False, is_batch=False):
-        input_path = ebook.get_input_path()
+    def _get_output_path(self, ebook):
         if not self.config.get('to_library'):
             filename = sanitize_file_name(ebook.title[:200])
             output_path = self.config.get('output_path')
             if output_path is None or not os.path.isdir(output_path):
                 raise Exception(
                     _('Please set a valid output path.'))
-            output_path = os.path.join(
+            return os.path.join(
                 output_path, f'{filename}.{ebook.output_format}')
-        else:
-            output_path = PersistentTemporaryFile(
-                suffix='.' + ebook.output_format).name
+        return PersistentTemporaryFile(suffix='.' + ebook.output_format).name
+
+    def _get_job_args(self, ebook, output_path, cache_only, is_batch):
+        return (
+            ebook.title, ebook.get_input_path(), output_path,
+            ebook.source_lang, ebook.target_lang, cache_only, is_batch,
+            ebook.input_format, ebook.encoding, ebook.target_direction)
+
+    def translate_ebooks(self, ebooks, cache_only=False, is_batch=True):
+        """Translate the ebooks with a job for each one, or split them in
+        turn among the number of warm workers, each of which is a single job
+        translating its ebooks one after another. The ebooks are assigned
+        when the jobs start rather than taken from a shared queue, so a
+        worker with longer ebooks may finish later than the others.
+        """
+        ebooks = list(ebooks)
+        workers = int(self.config.get('warm_workers') or 0)
+        if workers < 1 or len(ebooks) < 2:
+            for ebook in ebooks:
+                self.translate_ebook(ebook, cache_only, is_batch)
+            return
+        groups = [ebooks[index::workers] for index in range(workers)]
+        for group in filter(None, groups):
+            items = [(ebook, self._get_output_path(ebook)) for ebook in group]
+            job = self.gui.job_manager.run_job(
+                Dispatcher(self.translate_group_done),
+                'arbitrary_n',
+                args=(
+                    'calibre_plugins.ebook_translator.lib.conversion',
+                    'convert_items',
+                    ([self._get_job_args(ebook, output_path, cache_only,
+                                         is_batch)
+                      for ebook, output_path in items],)),
+                description=_('Translating {} ebooks').format(len(items)))
+            self.working_jobs[job] = items
+
+    def translate_ebook(self, ebook, cache_only=False, is_batch=False):
+        output_path = self._get_output_path(ebook)
         job = self.gui.job_manager.run_job(
             Dispatcher(self.translate_done),
             'arbitrary_n',
             args=(
                 'calibre_plugins.ebook_translator.lib.conversion',
                 'convert_item',
-                (ebook.title, input_path, output_path, ebook.source_lang,
-                 ebook.target_lang, cache_only, is_batch, ebook.input_format,
-                 ebook.encoding, ebook.target_direction)),
+                self._get_job_args(ebook, output_path, cache_only, is_batch)),
             description=(_('[{} > {}] Translating "{}"').format(
                 ebook.source_lang, ebook.target_lang, ebook.title)))
         self.working_jobs[job] = (ebook, output_path)
 
+    def queue_state(self):
+        """The number of the jobs waiting for and running each stage."""
+        return get_queue_state()
+
+    def translate_group_done(self, job):
+        items = self.working_jobs.pop(job)
+
+        if job.failed:
+            if not DEBUG:
+                self.gui.job_exception(
+                    job, dialog_title=_('Translation job failed'))
+            return
+
+        for (ebook, output_path), error in zip(items, job.result):
+            if error is not None:
+                self.gui.status_bar.show_message(
+                    _('Failed to translate "{}".').format(ebook.title), 5000)
+                continue
+            self.output_ebook(job, ebook, output_path)
+
     def translate_done(self, job):
         ebook, output_path = self.working_jobs.pop(job)
 
@@ -290,6 +384,9 @@ class ConversionWorker:
                     job, dialog_title=_('Translation job failed'))
             return
 
+        self.output_ebook(job, ebook, output_path)
+
+    def output_ebook(self, job, ebook, output_path):
         # TODO: Try to use the calibre generated metadata file.
         ebook_metadata_config = self.config.get('ebook_metadata') or {}
         if not ebook.is_extra_format():
@@ -1,3 +1,4 @@
+import json
 from typing import Iterator, Iterable
 
 
@@ -49,6 +50,19 @@ class Ebook:
     def is_extra_format(self):
         return self.input_format in self.extra_formats
 
+    def to_json(self):
+        return json.dumps(self.__dict__)
+
+    @classmethod
+    def from_json(cls, data):
+        data = json.loads(data)
+        ebook = cls(
+            data.pop('id'), data.pop('title'), data.pop('files'),
+            data.pop('input_format'), data.pop('source_lang'),
+            data.pop('extra_formats'))
+        ebook.__dict__.update(data)
+        return ebook
+
 
 class Ebooks(Iterable):
 
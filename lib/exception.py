@@ -18,6 +18,17 @@ class TranslationCanceled(Exception):
     pass
 
 
+class RequestCanceled(Exception):
+    pass
+
+
+class TranslationRetry(Exception):
+    def __init__(self, message, delay, items=None):
+        self.delay = delay
+        self.items = items
+        Exception.__init__(self, message)
+
+
 class BadApiKeyFormat(TranslationCanceled):
     pass
 
@@ -28,3 +39,14 @@ class NoAvailableApiKey(TranslationCanceled):
 
 class UnsupportedModel(Exception):
     pass
+
+
+class HttpError(Exception):
+    def __init__(self, url, status, reason, headers, body):
+        self.url = url
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+        Exception.__init__(
+            self, 'HTTP Error %s: %s\n\n%s' % (status, reason, body))
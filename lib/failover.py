@@ -0,0 +1,174 @@
+import time
+import threading
+
+from calibre.utils.localization import _  # type: ignore
+
+from .utils import dummy
+from .keys import create_limits
+
+
+load_translations()  # type: ignore
+
+
+class CircuitBreaker:
+    """Stop sending requests to an engine after consecutive failures. The
+    circuit is closed normally, and it opens once the failures reach the
+    threshold. After the cooldown, it is half-open and lets a single probe
+    through: a successful probe closes it, and a failed one opens it again
+    with a doubled cooldown.
+    """
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+    def __init__(self, threshold=5, cooldown=60.0, max_cooldown=900.0):
+        self.threshold = max(1, int(threshold))
+        self.base_cooldown = float(cooldown)
+        self.max_cooldown = max(self.base_cooldown, float(max_cooldown))
+
+        self.state = self.CLOSED
+        self.failures = 0
+        self.cooldown = self.base_cooldown
+        self.opened_at = 0.0
+        self.probing = False
+        self.lock = threading.Lock()
+
+    def _cooled_down(self, now):
+        return now - self.opened_at >= self.cooldown
+
+    def is_available(self, now=None) -> bool:
+        """Check whether a request could be sent without taking the probe."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                return self._cooled_down(now)
+            return not self.probing
+
+    def allow(self, now=None) -> bool:
+        """Check whether a request can be sent, and take the probe if the
+        circuit is half-open.
+        """
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            if self.state == self.OPEN and self._cooled_down(now):
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN:
+                if self.probing:
+                    return False
+                self.probing = True
+            return self.state != self.OPEN
+
+    def succeed(self) -> bool:
+        """Record a success, and return True if the circuit was closed."""
+        with self.lock:
+            self.failures = 0
+            self.probing = False
+            if self.state == self.CLOSED:
+                return False
+            self.state = self.CLOSED
+            self.cooldown = self.base_cooldown
+            return True
+
+    def fail(self, now=None) -> bool:
+        """Record a failure, and return True if the circuit was opened."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN:
+                self.probing = False
+                self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+            elif self.state == self.OPEN or self.failures < self.threshold:
+                return False
+            self.state = self.OPEN
+            self.opened_at = now
+            return True
+
+    def cancel(self):
+        """Give the probe back if the request was canceled."""
+        with self.lock:
+            self.probing = False
+
+    def trip(self, now=None) -> bool:
+        """Open the circuit at once, e.g. if the API key is rejected."""
+        with self.lock:
+            self.failures = max(self.failures, self.threshold - 1)
+        return self.fail(now)
+
+
+class Route:
+    """An engine of the failover chain with its own circuit breaker and
+    budgets. The budgets of the primary engine belong to the translation.
+    """
+    def __init__(self, translator, breaker, rate_limiter=None, slots=None):
+        self.translator = translator
+        self.breaker = breaker
+        self.rate_limiter = rate_limiter
+        self.slots = slots
+
+
+class Failover:
+    """Route the requests to the first engine of the chain whose circuit is
+    not open, so that the translation keeps moving if the primary engine
+    degrades. The primary engine is probed periodically, and the requests
+    return to it once it recovers. A request that keeps failing on an engine
+    moves on to the next one.
+    """
+    def __init__(self, translators, threshold=5, cooldown=60.0, log=dummy):
+        self.log = log
+        self.routes: list[Route] = []
+        for index, translator in enumerate(translators):
+            limits = (None, None) if index == 0 else create_limits(
+                translator, translator.concurrency_limit)
+            self.routes.append(Route(
+                translator, CircuitBreaker(threshold, cooldown), *limits))
+
+    def __len__(self):
+        return len(self.routes)
+
+    def _candidates(self, offset):
+        offset = min(offset, len(self.routes) - 1)
+        return self.routes[offset:] + self.routes[:offset]
+
+    def peek(self, offset=0) -> Route:
+        """Get the route that a request would take, without probing."""
+        now = time.monotonic()
+        for route in self._candidates(offset):
+            if route.breaker.is_available(now):
+                return route
+        return self.routes[0]
+
+    def select(self, offset=0) -> Route:
+        """Select the route of a request. The offset skips the engines that
+        a request already failed on. If all circuits are open, the primary
+        engine is used anyway.
+        """
+        now = time.monotonic()
+        for route in self._candidates(offset):
+            if route.breaker.allow(now):
+                return route
+        return self.routes[0]
+
+    def available(self, route=None) -> bool:
+        """Check whether an engine other than the route can be used."""
+        now = time.monotonic()
+        return any(
+            other.breaker.is_available(now) for other in self.routes
+            if other is not route)
+
+    def cancel(self, route):
+        route.breaker.cancel()
+
+    def release(self, route, error=None):
+        name = route.translator.name
+        if error is None:
+            if route.breaker.succeed():
+                self.log(_('The engine {} has recovered.').format(name))
+            return
+        if route.translator.match_error(str(error)):
+            opened = route.breaker.trip()
+        else:
+            opened = route.breaker.fail()
+        if opened:
+            self.log(_('The engine {} is unavailable. Retry it after {} '
+                       'seconds.').format(name, round(route.breaker.cooldown)),
+                     True)
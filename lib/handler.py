@@ -1,44 +1,353 @@
+import re
 import sys
+import time
+import random
 import asyncio
+import threading
+import contextvars
 import concurrent.futures
+from collections import deque
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
 
-from .utils import log, traceback_error
-from .exception import TranslationCanceled
+from calibre.utils.localization import _  # type: ignore
+
+from .utils import dummy, traceback_error
+from .cancel import CancelScope, current_scope
+from .priority import PriorityQueue
+from .exception import TranslationCanceled, TranslationRetry
+
+
+load_translations()  # type: ignore
+
+
+def is_overloaded(error):
+    """Check whether the error indicates that the service is overloaded,
+    i.e. rate limiting (429), server errors (5xx) or timeouts. The original
+    error is looked up through the chained exceptions because the engines
+    wrap it with UnexpectedResult.
+    """
+    while error is not None:
+        if isinstance(error, (TimeoutError, asyncio.TimeoutError)):
+            return True
+        status = getattr(error, 'status', None) or getattr(error, 'code', None)
+        if isinstance(status, int) and (status == 429 or 500 <= status < 600):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def is_rate_limited(error):
+    """Check whether the error is a rate limiting (429) response, which is
+    looked up through the chained exceptions.
+    """
+    while error is not None:
+        status = getattr(error, 'status', None) or getattr(error, 'code', None)
+        if status == 429:
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def _get_header(headers, name):
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _parse_seconds(value):
+    """Parse the values of rate limit headers, which can be seconds (3), a
+    duration (1m30s, 250ms), an HTTP date or an RFC 3339 timestamp.
+    """
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    units = {'h': 3600, 'm': 60, 's': 1, 'ms': 0.001}
+    parts = re.findall(r'(\d+(?:\.\d+)?)(ms|h|m|s)', value)
+    if parts and ''.join(n + u for n, u in parts) == value:
+        return sum(float(n) * units[u] for n, u in parts)
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        try:
+            date = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return (date - datetime.now(timezone.utc)).total_seconds()
+
+
+def get_retry_after(error):
+    """Get the number of seconds the service asks to wait before retrying
+    from the headers of the HTTP error, which is looked up through the
+    chained exceptions.
+    """
+    while error is not None:
+        headers = getattr(error, 'headers', None) or \
+            getattr(error, 'hdrs', None)
+        if headers is not None and hasattr(headers, 'items'):
+            value = _get_header(headers, 'retry-after-ms')
+            if value is not None:
+                seconds = _parse_seconds(value)
+                if seconds is not None:
+                    return max(0.0, seconds / 1000)
+            value = _get_header(headers, 'retry-after')
+            if value is not None:
+                seconds = _parse_seconds(value)
+                if seconds is not None:
+                    return max(0.0, seconds)
+            resets = []
+            for key, value in headers.items():
+                key = key.lower()
+                if key.startswith(('x-ratelimit-reset', 'ratelimit-reset')) \
+                        or (key.startswith('anthropic-ratelimit-')
+                            and key.endswith('-reset')):
+                    seconds = _parse_seconds(value)
+                    if seconds is not None:
+                        resets.append(seconds)
+            if resets:
+                return max(0.0, max(resets))
+        error = error.__cause__ or error.__context__
+    return None
+
+
+def get_retry_delay(error, retry, base=2.0, maximum=120.0):
+    """Calculate the delay before the given retry: honor the delay that the
+    service asks for if any, otherwise back off exponentially. Both come with
+    a random jitter to spread the retries of concurrent requests.
+    """
+    retry_after = get_retry_after(error)
+    if retry_after is not None:
+        return retry_after + random.uniform(0, 1)
+    delay = min(maximum, base * 2 ** retry)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class ConcurrencyController:
+    """Adjust the number of concurrent requests with the AIMD algorithm: the
+    limit grows additively (about one per round of requests) while responses
+    succeed without a latency degradation, and it is halved on rate limiting,
+    server errors or timeouts. The limit stays within the given bounds.
+    """
+    increase = 1.0
+    decrease = 0.5
+    # A latency is unhealthy if it exceeds the baseline by this factor.
+    latency_tolerance = 2.0
+    smoothing = 0.2
+
+    def __init__(self, limit, minimum=1, maximum=0, log=dummy):
+        self.minimum = max(1, int(minimum))
+        self.maximum = max(self.minimum, int(maximum or limit or 1))
+        self.limit = float(min(max(limit, self.minimum), self.maximum))
+        self.log = log
+
+        self.active = 0
+        self.latency: float | None = None
+        self.decreased_at = 0.0
+        self.lock = threading.Lock()
+        self.condition: asyncio.Condition | None = None
+
+    @property
+    def current(self) -> int:
+        return int(self.limit)
+
+    def _get_condition(self):
+        if self.condition is None:
+            self.condition = asyncio.Condition()
+        return self.condition
+
+    async def acquire(self):
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.active < self.current)
+            self.active += 1
+
+    async def release(self):
+        condition = self._get_condition()
+        async with condition:
+            self.active -= 1
+            condition.notify_all()
+
+    def _update(self, limit):
+        previous = self.current
+        self.limit = min(max(limit, self.minimum), self.maximum)
+        if self.current != previous:
+            self.log(_('Concurrency limit: {} -> {}').format(
+                previous, self.current))
+
+    def record_success(self, latency):
+        with self.lock:
+            baseline = self.latency
+            self.latency = latency if baseline is None else \
+                baseline + self.smoothing * (latency - baseline)
+            if baseline is None or \
+                    latency <= baseline * self.latency_tolerance:
+                self._update(self.limit + self.increase / self.limit)
+
+    def record_failure(self, started, error):
+        if not is_overloaded(error):
+            return
+        with self.lock:
+            # Requests sent before the last decrease reflect the old limit.
+            if started < self.decreased_at:
+                return
+            self.decreased_at = time.monotonic()
+            self._update(self.limit * self.decrease)
+
+    @contextmanager
+    def measure(self):
+        started = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            self.record_failure(started, e)
+            raise
+        self.record_success(time.monotonic() - started)
+
+
+class Hedging:
+    """Decide when to send a duplicate of a slow request. The threshold is a
+    percentile of the latencies observed recently, and the duplicates are
+    limited to the budget, a share of the requests, to bound the cost.
+    """
+    window = 200
+    min_samples = 20
+    min_delay = 1.0
+
+    def __init__(self, percentile=95, budget=10):
+        self.percentile = min(max(percentile, 0), 100) / 100.0
+        self.budget = max(budget, 0) / 100.0
+        self.latencies: deque = deque(maxlen=self.window)
+        self.requests = 0
+        self.hedges = 0
+        self.lock = threading.Lock()
+
+    def record(self, latency):
+        with self.lock:
+            self.latencies.append(latency)
+
+    def threshold(self) -> float | None:
+        """The number of seconds after which a request is slow, or None if
+        there are not enough latencies to tell.
+        """
+        with self.lock:
+            if len(self.latencies) < self.min_samples:
+                return None
+            latencies = sorted(self.latencies)
+        index = round(self.percentile * (len(latencies) - 1))
+        return max(self.min_delay, latencies[index])
+
+    def start(self):
+        with self.lock:
+            self.requests += 1
+
+    def acquire(self) -> bool:
+        """Take a duplicate from the budget if any is left."""
+        with self.lock:
+            if self.hedges + 1 > self.budget * self.requests:
+                return False
+            self.hedges += 1
+            return True
 
 
 class Handler:
+    # The interval of checking whether the translation was canceled.
+    cancel_interval = 0.1
+
     def __init__(self, paragraphs, concurrency_limit, translate_paragraph,
-                 process_translation, request_interval):
-        self.queue = asyncio.Queue()
+                 process_translation, translate_paragraph_async=None,
+                 concurrency=None, cancel_request=None, priority=None):
+        # The paragraphs are taken in the order of the priority policy.
+        self.queue = PriorityQueue(priority)
         self.done_queue = asyncio.Queue()
 
         for paragraph in paragraphs:
             self.queue.put_nowait(paragraph)
 
+        self.concurrency = concurrency
+        if concurrency is not None:
+            # Spawn enough workers; the controller decides how many can run.
+            concurrency_limit = min(concurrency.maximum, self.queue.qsize())
         self.concurrency_limit = concurrency_limit or self.queue.qsize()
         self.translate_paragraph = translate_paragraph
         self.process_translation = process_translation
-        self.request_interval = request_interval
+        self.translate_paragraph_async = translate_paragraph_async
+        self.pending_retries: set[asyncio.TimerHandle] = set()
+        self.cancel_request = cancel_request or dummy
+        self.scope = CancelScope()
+        self.stopped: asyncio.Event | None = None
+        self.loop: asyncio.AbstractEventLoop | None = None
+
+    def reprioritize(self, policy=None):
+        """Reorder the paragraphs waiting to be translated. It can be called
+        from any thread, e.g. when the user selects rows during translation.
+        """
+        loop = self.loop
+        if loop is None:
+            self.queue.reprioritize(policy)
+            return
+        try:
+            loop.call_soon_threadsafe(self.queue.reprioritize, policy)
+        except RuntimeError:
+            pass  # The loop has been closed.
 
     async def translation_worker(self):
         while True:
             paragraph = await self.queue.get()
             try:
-                await asyncio.get_running_loop().run_in_executor(
-                    None, self.translate_paragraph, paragraph)
+                if self.concurrency is not None:
+                    await self.concurrency.acquire()
+                try:
+                    await self._translate(paragraph)
+                finally:
+                    if self.concurrency is not None:
+                        await self.concurrency.release()
                 paragraph.error = None
-                if self.queue.qsize() > 0 and not paragraph.is_cache:
-                    await asyncio.sleep(self.request_interval)
                 self.done_queue.put_nowait(paragraph)
                 self.queue.task_done()
+            except TranslationRetry as e:
+                items = e.items
+                if items is None:
+                    paragraph.retry += 1
+                    items = [paragraph]
+                self.retry_later(items, e.delay)
             except TranslationCanceled:
-                await self.cancel_tasks()
+                self.stopped.set()
                 break
             except Exception:
                 paragraph.error = traceback_error()
                 self.done_queue.put_nowait(paragraph)
                 self.queue.task_done()
 
+    async def _translate(self, paragraph):
+        if self.translate_paragraph_async is not None:
+            # No thread is occupied while waiting for the response.
+            await self.translate_paragraph_async(paragraph)
+        else:
+            # Keep the cancel scope in the thread.
+            await asyncio.get_running_loop().run_in_executor(
+                None, contextvars.copy_context().run,
+                self.translate_paragraph, paragraph)
+
+    def retry_later(self, items, delay):
+        """Put the items back to the queue after the delay, so that the worker
+        can go on with other items meanwhile. The items may replace the failed
+        one, e.g. the smaller parts of a batch. The failed item is not marked
+        as done before that, which keeps the queue unfinished.
+        """
+        def retry():
+            self.pending_retries.discard(handle)
+            for item in items:
+                self.queue.put_nowait(item)
+            self.queue.task_done()
+        handle = asyncio.get_running_loop().call_later(delay, retry)
+        self.pending_retries.add(handle)
+
     async def processing_worker(self):
         while True:
             paragraph = await self.done_queue.get()
@@ -47,33 +356,55 @@ class Handler:
                     pool, self.process_translation, paragraph)
             self.done_queue.task_done()
 
-    async def cancel_tasks(self):
-        self.queue.task_done()
-        while not self.queue.empty():
-            await self.queue.get()
-            self.queue.task_done()
-        while not self.done_queue.empty():
-            await self.done_queue.get()
-            self.done_queue.task_done()
+    async def watch_cancellation(self):
+        """Abort the requests in flight at once if the translation is canceled
+        by the user or a worker, instead of waiting for them to finish.
+        """
+        while not self.cancel_request():
+            try:
+                await asyncio.wait_for(
+                    self.stopped.wait(), self.cancel_interval)
+                break
+            except asyncio.TimeoutError:
+                pass
+        self.scope.cancel()
+
+    def cancel_tasks(self, tasks):
+        """Cancel the workers with their requests and the pending retries.
+        The translations which are done are still processed.
+        """
+        for task in tasks:
+            task.cancel()
+        for handle in self.pending_retries:
+            handle.cancel()
+        self.pending_retries.clear()
 
     async def create_tasks(self):
         tasks = []
-        for _ in range(self.concurrency_limit):
+        for index in range(self.concurrency_limit):
             tasks.append(asyncio.create_task(self.translation_worker()))
-        tasks.append(asyncio.create_task(self.processing_worker()))
         return tasks
 
     async def process_tasks(self):
+        # The tasks and threads of the workers inherit the cancel scope.
+        current_scope.set(self.scope)
+        self.stopped = asyncio.Event()
+        self.loop = asyncio.get_running_loop()
         tasks = await self.create_tasks()
-        await self.queue.join()
+        processing = asyncio.create_task(self.processing_worker())
+        watching = asyncio.create_task(self.watch_cancellation())
+        joining = asyncio.create_task(self.queue.join())
+        await asyncio.wait(
+            (joining, watching), return_when=asyncio.FIRST_COMPLETED)
+        if self.scope.canceled:
+            self.cancel_tasks(tasks)
         await self.done_queue.join()
         # Terminate infinitive loop worker.
+        tasks.extend((processing, watching, joining))
         for task in tasks:
             task.cancel()
-        try:
-            await asyncio.gather(*tasks)
-        except asyncio.CancelledError:
-            pass
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.loop = None
 
     def handle(self):
         if sys.platform == 'win32':
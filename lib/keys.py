@@ -0,0 +1,133 @@
+import copy
+import time
+import threading
+
+from .utils import uid
+from .config import get_config
+from .handler import is_rate_limited, get_retry_delay
+from .limiter import (
+    RateLimiter, SharedRateLimiter, SharedSemaphore, is_locking_available)
+
+
+class ApiKey:
+    """An API key with its own translator, budgets and health."""
+    def __init__(self, translator, rate_limiter=None, slots=None):
+        self.translator = translator
+        self.rate_limiter = rate_limiter
+        self.slots = slots
+
+        self.in_flight = 0
+        self.failures = 0
+        self.quarantined_until = 0.0
+
+    def is_healthy(self, now):
+        return self.quarantined_until <= now
+
+
+def is_shared():
+    """Check whether more than one job may translate at once, in which case
+    the budgets are shared among the processes. Only a single translating
+    job, or a single warm worker translating the whole batch, keeps them in
+    the process, where the file locks would only slow down the requests.
+    """
+    config = get_config()
+    return is_locking_available() and \
+        config.get('translating_jobs') != 1 and \
+        config.get('warm_workers') != 1
+
+
+def create_limits(translator, concurrency_limit):
+    """Create the rate limiter and the request slots of the API key used by
+    the translator. They are shared by the translation jobs running in other
+    processes with the same engine and API key.
+    """
+    limiter_args = (
+        translator.requests_per_minute, translator.tokens_per_minute,
+        translator.request_interval)
+    if not is_shared():
+        rate_limiter = RateLimiter(*limiter_args)
+        return rate_limiter if rate_limiter.is_enabled() else None, None
+    key = uid(translator.name or '', translator.api_key or '')
+    rate_limiter = SharedRateLimiter(key, *limiter_args)
+    slots = SharedSemaphore(key, concurrency_limit) \
+        if concurrency_limit > 0 else None
+    return rate_limiter if rate_limiter.is_enabled() else None, slots
+
+
+class ApiKeyPool:
+    """Spread the requests among all the API keys of the engine at once,
+    instead of using them one after another. Each key has its own budgets.
+    A key is quarantined for the delay the service asks for if it is rate
+    limited, and for much longer if it is rejected. The engine's own key
+    swapping is disabled for the keys in the pool.
+    """
+    quarantine = 3600.0
+
+    def __init__(self, translator, concurrency_limit=0):
+        self.lock = threading.Lock()
+        self.turn = 0
+        self.keys: list[ApiKey] = []
+        for api_key in [translator.api_key] + translator.api_keys:
+            if api_key is None or api_key in (
+                    key.translator.api_key for key in self.keys):
+                continue
+            clone = copy.copy(translator)
+            clone.api_key = api_key
+            clone.api_keys = []
+            clone.bad_api_keys = []
+            self.keys.append(
+                ApiKey(clone, *create_limits(clone, concurrency_limit)))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def available(self) -> bool:
+        now = time.monotonic()
+        return any(key.is_healthy(now) for key in self.keys)
+
+    def select(self) -> ApiKey:
+        """Select the healthy key with the fewest requests in flight, taking
+        turns among the equal ones. If all keys are quarantined, the one
+        released first is used.
+        """
+        with self.lock:
+            now = time.monotonic()
+            count = len(self.keys)
+            keys = [key for key in self.keys if key.is_healthy(now)]
+            if keys:
+                key = min(keys, key=lambda key: (
+                    key.in_flight,
+                    (self.keys.index(key) - self.turn) % count))
+            else:
+                key = min(self.keys, key=lambda key: key.quarantined_until)
+            self.turn = (self.keys.index(key) + 1) % count
+            key.in_flight += 1
+            return key
+
+    def cancel(self, key: ApiKey):
+        """Release the key of a canceled request, which says nothing about
+        its health.
+        """
+        with self.lock:
+            key.in_flight -= 1
+
+    def release(self, key: ApiKey, error=None) -> bool:
+        """Update the health of the key with the result of the request, and
+        return True if the key was quarantined.
+        """
+        with self.lock:
+            key.in_flight -= 1
+            if error is None:
+                key.failures = 0
+                key.quarantined_until = 0.0
+                return False
+            key.failures += 1
+            now = time.monotonic()
+            if is_rate_limited(error):
+                key.quarantined_until = now + get_retry_delay(
+                    error, key.failures)
+                return True
+            if key.translator.match_error(str(error)):
+                key.quarantined_until = now + self.quarantine
+                return True
+            return False
@@ -0,0 +1,257 @@
+import os
+import json
+import time
+import asyncio
+import tempfile
+import threading
+from contextlib import contextmanager, asynccontextmanager
+
+from .cancel import sleep
+from .exception import RequestCanceled
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # type: ignore
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None  # type: ignore
+
+
+def is_locking_available():
+    return fcntl is not None or msvcrt is not None
+
+
+def shared_path(name='limiter'):
+    """The directory of the states shared by all calibre processes."""
+    path = os.path.join(
+        tempfile.gettempdir(), 'com.bookfere.Calibre.EbookTranslator', name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def try_lock(file) -> bool:
+    """Lock the file exclusively without blocking. The lock belongs to the
+    open file, so it also excludes the other threads of the same process,
+    and it is released by the system if the process exits.
+    """
+    try:
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+def unlock(file):
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+    else:
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def file_lock(path, interval=0.005):
+    with open(path, 'a+') as file:
+        while not try_lock(file):
+            time.sleep(interval)
+        try:
+            yield file
+        finally:
+            unlock(file)
+
+
+class TokenBucket:
+    """A bucket refilled continuously at the rate (units per second) up to
+    its capacity. A reservation may overdraw the bucket, and the following
+    reservations wait until the debt is paid off, so a cost larger than the
+    capacity is delayed instead of being blocked forever.
+    """
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(capacity))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def reserve(self, cost, now):
+        """Take the cost from the bucket and return the number of seconds to
+        wait before it can be spent.
+        """
+        self._refill(now)
+        needed = min(cost, self.capacity)
+        delay = max(0.0, (needed - self.tokens) / self.rate)
+        self.tokens -= cost
+        return delay
+
+
+class RateLimiter:
+    """Share the requests per minute and tokens per minute budgets among all
+    translation workers, whether they run in threads or in the event loop.
+    """
+    def __init__(self, requests_per_minute=0, tokens_per_minute=0,
+                 min_interval=0.0):
+        self.lock = threading.Lock()
+        self.requests = None
+        if requests_per_minute > 0:
+            rate = requests_per_minute / 60.0
+            self.requests = TokenBucket(rate, rate)
+        elif min_interval > 0:
+            # A bucket that holds a single request spaces them evenly.
+            self.requests = TokenBucket(1.0 / min_interval, 1)
+        self.tokens = None
+        if tokens_per_minute > 0:
+            rate = tokens_per_minute / 60.0
+            self.tokens = TokenBucket(rate, rate)
+
+    def is_enabled(self):
+        return self.requests is not None or self.tokens is not None
+
+    def reserve(self, cost=0):
+        """Reserve a request that costs the given number of tokens, and
+        return the number of seconds to wait before sending it.
+        """
+        with self.lock:
+            now = time.monotonic()
+            delay = 0.0
+            if self.requests is not None:
+                delay = max(delay, self.requests.reserve(1, now))
+            if self.tokens is not None and cost > 0:
+                delay = max(delay, self.tokens.reserve(cost, now))
+            return delay
+
+    def acquire(self, cost=0):
+        delay = self.reserve(cost)
+        if delay > 0 and not sleep(delay, time.sleep):
+            raise RequestCanceled()
+
+    async def acquire_async(self, cost=0):
+        delay = self.reserve(cost)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class SharedRateLimiter(RateLimiter):
+    """A rate limiter whose budgets are shared by all calibre processes, e.g.
+    the jobs translating several ebooks at once. The state of the buckets is
+    stored in a file, which is locked while a request is being reserved.
+    """
+    def __init__(self, key, requests_per_minute=0, tokens_per_minute=0,
+                 min_interval=0.0):
+        super().__init__(requests_per_minute, tokens_per_minute, min_interval)
+        path = shared_path()
+        self.lock_path = os.path.join(path, '%s.lock' % key)
+        self.state_path = os.path.join(path, '%s.json' % key)
+
+    def _buckets(self):
+        return {name: bucket for name, bucket in (
+            ('requests', self.requests), ('tokens', self.tokens))
+            if bucket is not None}
+
+    def _load(self, now):
+        try:
+            with open(self.state_path) as file:
+                state = json.load(file)
+        except Exception:
+            state = {}
+        for name, bucket in self._buckets().items():
+            tokens, updated = state.get(name, (bucket.capacity, now))
+            bucket.tokens = min(bucket.capacity, tokens)
+            # Do not wait for a clock which was turned back.
+            bucket.updated = min(updated, now)
+
+    def _save(self):
+        state = {
+            name: (bucket.tokens, bucket.updated)
+            for name, bucket in self._buckets().items()}
+        with open(self.state_path, 'w') as file:
+            json.dump(state, file)
+
+    def reserve(self, cost=0):
+        with self.lock, file_lock(self.lock_path):
+            # The monotonic clock is not comparable among processes.
+            now = time.time()
+            self._load(now)
+            delay = 0.0
+            if self.requests is not None:
+                delay = max(delay, self.requests.reserve(1, now))
+            if self.tokens is not None and cost > 0:
+                delay = max(delay, self.tokens.reserve(cost, now))
+            self._save()
+            return delay
+
+    async def acquire_async(self, cost=0):
+        # Keep the file lock and the I/O off the event loop.
+        delay = await asyncio.get_running_loop().run_in_executor(
+            None, self.reserve, cost)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class SharedSemaphore:
+    """Limit the number of concurrent requests among all calibre processes.
+    Each slot is a file, which is locked while a request is in flight.
+    """
+    interval = 0.05
+
+    def __init__(self, key, limit, path=None):
+        path = path or shared_path()
+        self.paths = [
+            os.path.join(path, '%s.%d.slot' % (key, index))
+            for index in range(limit)]
+
+    def try_acquire(self):
+        for path in self.paths:
+            file = open(path, 'a+')
+            if try_lock(file):
+                return file
+            file.close()
+        return None
+
+    def acquire(self):
+        file = self.try_acquire()
+        while file is None:
+            if not sleep(self.interval, time.sleep):
+                raise RequestCanceled()
+            file = self.try_acquire()
+        return file
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        file = await loop.run_in_executor(None, self.try_acquire)
+        while file is None:
+            await asyncio.sleep(self.interval)
+            file = await loop.run_in_executor(None, self.try_acquire)
+        return file
+
+    def release(self, file):
+        try:
+            unlock(file)
+        finally:
+            file.close()
+
+    @contextmanager
+    def hold(self):
+        file = self.acquire()
+        try:
+            yield
+        finally:
+            self.release(file)
+
+    @asynccontextmanager
+    async def hold_async(self):
+        file = await self.acquire_async()
+        try:
+            yield
+        finally:
+            self.release(file)
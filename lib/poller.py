@@ -0,0 +1,152 @@
+import os
+import time
+import threading
+from glob import glob
+from typing import Callable
+
+from ..engines.openai import ChatgptTranslate, ChatgptBatchTranslate
+from ..engines.anthropic import ClaudeTranslate, ClaudeBatchTranslate
+
+from .utils import log, traceback_error
+from .cache import TranslationCache
+from .translation import get_engine_class, get_translator
+
+
+batch_translators: dict[str, type] = {
+    batch_translator.cache_prefix: batch_translator
+    for batch_translator in (ChatgptBatchTranslate, ClaudeBatchTranslate)}
+# The engine of a batch is determined by the API rather than by the engine
+# that was last used for the ebook.
+batch_engines: dict[str, type] = {
+    ChatgptBatchTranslate.cache_prefix: ChatgptTranslate,
+    ClaudeBatchTranslate.cache_prefix: ClaudeTranslate}
+
+
+class BatchPoller:
+    """Check the outstanding batch translations stored in the caches in the
+    background, backing off exponentially while they are in progress, and
+    apply the results to the cache once a batch has completed.
+    """
+    min_interval = 60.0
+    max_interval = 1800.0
+
+    def __init__(self, applied: Callable | None = None):
+        """:applied: Called with the cache identity and the number of the
+        applied translations once a batch has been applied.
+        """
+        self.applied = applied
+        self.schedule: dict[tuple, tuple[float, float]] = {}
+        self.stopped = threading.Event()
+        self.thread: threading.Thread | None = None
+
+    def outstanding(self):
+        """Find the batch IDs stored in the persistent caches."""
+        items = []
+        for file_path in glob(
+                os.path.join(TranslationCache.cache_path, '*.db')):
+            identity = os.path.splitext(os.path.basename(file_path))[0]
+            cache = TranslationCache(identity)
+            for prefix in batch_translators:
+                batch_id = cache.get_info('%s_batch_id' % prefix)
+                if batch_id:
+                    items.append((identity, prefix, batch_id))
+            cache.close()
+        return items
+
+    def poll(self, now: float | None = None) -> float:
+        """Check the batches which are due, and return the number of seconds
+        until the next one is due.
+        """
+        now = time.monotonic() if now is None else now
+        keys = set()
+        for identity, prefix, batch_id in self.outstanding():
+            key = (identity, batch_id)
+            keys.add(key)
+            due, interval = self.schedule.get(key, (now, self.min_interval))
+            if due > now:
+                continue
+            try:
+                finished = self.check(identity, prefix, batch_id)
+            except Exception:
+                log.error(
+                    'Failed to check the batch translation %s: %s'
+                    % (batch_id, traceback_error()))
+                finished = False
+            if finished:
+                keys.discard(key)
+                continue
+            self.schedule[key] = (
+                now + interval, min(interval * 2, self.max_interval))
+        # Forget the batches which were applied or canceled elsewhere.
+        for key in set(self.schedule) - keys:
+            del self.schedule[key]
+        if not self.schedule:
+            return self.max_interval
+        return max(0.0, min(due for due, _ in self.schedule.values()) - now)
+
+    def check(self, identity, prefix, batch_id) -> bool:
+        """Return True if the batch does not need to be checked any more."""
+        cache = TranslationCache(identity)
+        try:
+            engine_name = batch_engines[prefix].name
+            translator = get_translator(get_engine_class(engine_name))
+            batch_translator = batch_translators[prefix](translator)
+            details = batch_translator.check(batch_id)
+            status = details.get('status')
+            output_file_id = details.get('output_file_id')
+            if status == 'completed':
+                # No output file is created if all of the requests failed.
+                count = 0 if not output_file_id else \
+                    cache.update_translations(
+                        batch_translator.results(output_file_id),
+                        translator.name, cache.get_info('target_lang'))
+                log.debug(
+                    'Applied %s translations from the batch %s.'
+                    % (count, batch_id))
+            elif status not in ('cancelled', 'failed', 'expired'):
+                return False
+            if batch_translator.upload_file:
+                self.delete_files(
+                    batch_translator, cache.get_info('%s_file_id' % prefix),
+                    output_file_id)
+            cache.del_info('%s_batch_id' % prefix)
+            cache.del_info('%s_file_id' % prefix)
+        finally:
+            cache.close()
+        if status == 'completed' and self.applied is not None:
+            self.applied(identity, count)
+        return True
+
+    def delete_files(self, batch_translator, *file_ids):
+        """Delete the uploaded input files and the output files, which are
+        otherwise kept in the storage of the account.
+        """
+        file_id = ','.join(item for item in file_ids if item)
+        if not file_id:
+            return
+        try:
+            batch_translator.delete(file_id)
+        except Exception as e:
+            log.warn('Failed to delete the batch files %s: %s' % (file_id, e))
+
+    def run(self, stopped):
+        while not stopped.is_set():
+            try:
+                delay = self.poll()
+            except Exception:
+                log.error(traceback_error())
+                delay = self.max_interval
+            stopped.wait(max(1.0, delay))
+
+    def start(self):
+        if self.thread is not None and self.thread.is_alive() \
+                and not self.stopped.is_set():
+            return
+        # A stopping thread keeps its own event, so it still exits.
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(
+            target=self.run, args=(self.stopped,), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
@@ -0,0 +1,81 @@
+import heapq
+import asyncio
+import itertools
+
+
+# The pages of the ebook metadata and the table of contents.
+STRUCTURE_PAGES = ('content.opf', 'toc.ncx')
+
+
+def get_paragraphs(item) -> list:
+    """Get the paragraphs of a work item, which is a paragraph or a batch."""
+    paragraphs = getattr(item, 'paragraphs', None)
+    return paragraphs if isinstance(paragraphs, list) else [item]
+
+
+def structure_first(item):
+    """Translate the metadata and the table of contents first."""
+    return 0 if any(paragraph.page in STRUCTURE_PAGES
+                    for paragraph in get_paragraphs(item)) else 1
+
+
+def longest_first(item):
+    """Translate the longest items first, so that a few giant paragraphs do
+    not start last and hold up the end of the job.
+    """
+    return -sum(len(paragraph.original) for paragraph in get_paragraphs(item))
+
+
+def selected_first(rows):
+    """Translate the items in the rows first, e.g. those selected by the
+    user in advanced mode.
+    """
+    rows = frozenset(rows)
+
+    def policy(item):
+        return 0 if any(paragraph.row in rows
+                        for paragraph in get_paragraphs(item)) else 1
+    return policy
+
+
+def chain(*policies):
+    """Order the items by the policies in turn, each breaking the ties of the
+    previous ones.
+    """
+    def policy(item):
+        return tuple(key(item) for key in policies)
+    return policy
+
+
+class PriorityQueue(asyncio.Queue):
+    """A work queue ordered by the policy, which maps an item to a sortable
+    key; the smaller key comes first. The items with equal keys keep the
+    order they were put in, so without a policy it works as a FIFO queue.
+    """
+    def __init__(self, policy=None):
+        self.policy = policy
+        self.counter = itertools.count()
+        super().__init__()
+
+    def _key(self, item):
+        return 0 if self.policy is None else self.policy(item)
+
+    def _init(self, maxsize):
+        self._queue = []
+
+    def _put(self, item):
+        heapq.heappush(
+            self._queue, (self._key(item), next(self.counter), item))
+
+    def _get(self):
+        return heapq.heappop(self._queue)[-1]
+
+    def reprioritize(self, policy=None):
+        """Reorder the waiting items, optionally with a new policy. It must
+        be called within the event loop of the queue.
+        """
+        if policy is not None:
+            self.policy = policy
+        self._queue[:] = [
+            (self._key(item), count, item) for _, count, item in self._queue]
+        heapq.heapify(self._queue)
@@ -0,0 +1,96 @@
+import os
+import json
+import time
+from glob import glob
+
+from .limiter import SharedSemaphore, shared_path, try_lock, unlock
+
+
+stages = ('parsing', 'translating', 'writing')
+
+
+def jobs_path():
+    return shared_path('jobs')
+
+
+class StageScheduler:
+    """Coordinate the stages of the translation jobs, which run in separate
+    processes. The CPU-bound stages, parsing and writing the ebooks, share a
+    pool sized to the number of cores, and the translation stage has its own
+    pool, so that a book is parsed while another one is being translated.
+    The requests of the translating books share the budgets of the engine.
+    """
+    def __init__(self, title, cpu_slots=0, network_slots=0):
+        """:cpu_slots: 0 means the number of cores.
+        :network_slots: 0 means the translation stage is not limited, e.g.
+        the jobs only use the cached translations.
+        """
+        path = jobs_path()
+        self.cpu = SharedSemaphore(
+            'cpu', cpu_slots or os.cpu_count() or 1, path)
+        self.network = SharedSemaphore('network', network_slots, path) \
+            if network_slots > 0 else None
+        self.title = title
+        self.slot = None
+        identity = str(os.getpid())
+        self.state_path = os.path.join(path, '%s.json' % identity)
+        # The lock is held as long as the job is alive.
+        self.job_lock = open(os.path.join(path, '%s.lock' % identity), 'a+')
+        try_lock(self.job_lock)
+
+    def set_state(self, stage, waiting):
+        with open(self.state_path, 'w') as file:
+            json.dump({
+                'title': self.title, 'stage': stage, 'waiting': waiting,
+                'updated': time.time()}, file)
+
+    def release(self):
+        if self.slot is not None:
+            semaphore, file = self.slot
+            semaphore.release(file)
+            self.slot = None
+
+    def enter(self, stage):
+        """Release the slot of the previous stage and wait for a slot of the
+        stage.
+        """
+        self.release()
+        semaphore = self.network if stage == 'translating' else self.cpu
+        if semaphore is not None:
+            self.set_state(stage, True)
+            self.slot = (semaphore, semaphore.acquire())
+        self.set_state(stage, False)
+
+    def finish(self):
+        self.release()
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
+        unlock(self.job_lock)
+        self.job_lock.close()
+
+
+def get_queue_state():
+    """Count the jobs waiting for or running each stage. The states left by
+    the jobs that exited unexpectedly are removed.
+    """
+    state = {stage: [0, 0] for stage in stages}
+    for state_path in glob(os.path.join(jobs_path(), '*.json')):
+        lock_path = '%s.lock' % os.path.splitext(state_path)[0]
+        try:
+            with open(lock_path, 'a+') as file:
+                if try_lock(file):
+                    unlock(file)
+                    alive = False
+                else:
+                    alive = True
+            if not alive:
+                os.remove(state_path)
+                os.remove(lock_path)
+                continue
+            with open(state_path) as file:
+                job = json.load(file)
+        except Exception:
+            continue
+        if job.get('stage') in state:
+            state[job['stage']][0 if job.get('waiting') else 1] += 1
+    return state
@@ -0,0 +1,521 @@
+import io
+import ssl
+import zlib
+import socket
+import gzip
+import asyncio
+import threading
+from collections import deque
+from urllib.parse import urlsplit, urlencode, urljoin
+from http.client import (
+    HTTPConnection, HTTPSConnection, HTTPException, RemoteDisconnected,
+    parse_headers)
+
+from calibre import get_proxies  # type: ignore
+
+from .cancel import get_scope, is_canceled
+from .exception import HttpError, RequestCanceled
+
+
+def decode_content(data, headers):
+    encoding = (headers.get('Content-Encoding') or '').lower()
+    if encoding == 'gzip':
+        return gzip.decompress(data)
+    if encoding == 'deflate':
+        try:
+            return zlib.decompress(data)
+        except zlib.error:
+            return zlib.decompress(data, -zlib.MAX_WBITS)
+    return data
+
+
+class Response:
+    """A file-like wrapper of the HTTP response. The connection is returned to
+    the pool once the body has been fully consumed or the response is closed.
+    """
+    def __init__(self, session, key, connection, response):
+        self.session = session
+        self.key = key
+        self.connection = connection
+        self.response = response
+
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.headers
+        self.released = False
+
+    def _check(self, data):
+        if not data or self.response.isclosed():
+            self.release()
+        return data
+
+    def read(self, amt=None):
+        if amt is not None:
+            return self._check(self.response.read(amt))
+        return decode_content(self._check(self.response.read()), self.headers)
+
+    def readline(self, limit=-1):
+        return self._check(self.response.readline(limit))
+
+    def __iter__(self):
+        while True:
+            line = self.readline()
+            if not line:
+                break
+            yield line
+
+    def release(self):
+        if self.released:
+            return
+        self.released = True
+        if self.response.isclosed() and not self.response.will_close:
+            self.session.release(self.key, self.connection)
+        else:
+            self.session.discard(self.connection)
+
+    def close(self):
+        self.release()
+
+
+class BaseSession:
+    default_size = 10
+    max_redirects = 5
+
+    def __init__(self, size=0, proxy_uri=None):
+        self.size = size or self.default_size
+        self.proxies = self._get_proxies(proxy_uri)
+        self.ssl_context = self._create_ssl_context()
+
+    def _get_proxies(self, proxy_uri):
+        """Use the proxy settings if available, otherwise read from the
+        environment only once for the lifetime of the session.
+        """
+        proxies: dict = {}
+        if proxy_uri is not None:
+            proxies.update(http=proxy_uri, https=proxy_uri)
+        else:
+            environment = get_proxies(False)
+            http = environment.get('http')
+            if http is not None:
+                proxies.update(http=http, https=http)
+            https = environment.get('https')
+            if https is not None:
+                proxies.update(https=https)
+        return proxies
+
+    def _create_ssl_context(self):
+        try:
+            ssl_context = ssl.create_default_context()
+            ssl_context.check_hostname = True
+            ssl_context.verify_mode = ssl.CERT_REQUIRED
+        except Exception:
+            ssl_context = ssl._create_unverified_context(
+                cert_reqs=ssl.CERT_NONE)
+        return ssl_context
+
+    def set_size(self, size):
+        self.size = size or self.default_size
+
+    def _proxy_address(self, scheme):
+        proxy = self.proxies.get(scheme)
+        if proxy is None:
+            return None
+        if '://' not in proxy:
+            proxy = 'http://%s' % proxy
+        parts = urlsplit(proxy)
+        return parts.hostname, parts.port or 80
+
+    def _prepare(self, url, data, headers, method):
+        if isinstance(data, dict):
+            data = urlencode(data) or None
+            if data is not None and method == 'GET':
+                url += ('&' if '?' in url else '?') + data
+                data = None
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        headers = dict(headers)
+        names = [name.lower() for name in headers.keys()]
+        if data is not None and 'content-type' not in names:
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        # Only gzip and deflate can be decoded without extra dependencies.
+        for name in list(headers.keys()):
+            if name.lower() == 'accept-encoding':
+                headers[name] = 'gzip, deflate'
+        return url, data, headers
+
+    def _parse_url(self, url):
+        parts = urlsplit(url)
+        scheme = parts.scheme or 'http'
+        port = parts.port or (443 if scheme == 'https' else 80)
+        selector = parts.path or '/'
+        if parts.query:
+            selector += '?' + parts.query
+        # Requests to a plain HTTP proxy require the absolute URL.
+        if scheme == 'http' and self._proxy_address(scheme) is not None:
+            selector = url
+        return (scheme, parts.hostname, port), selector
+
+
+class Session(BaseSession):
+    """A thread-safe pool of persistent HTTP connections. Connections are kept
+    alive between requests and grouped by scheme, host and port, so that each
+    request does not need to pay for a new TCP and TLS handshake.
+    """
+    def __init__(self, size=0, proxy_uri=None):
+        BaseSession.__init__(self, size, proxy_uri)
+        self.idle: dict[tuple, deque] = {}
+        self.lock = threading.Lock()
+
+    def _create_connection(self, scheme, host, port, timeout):
+        proxy = self._proxy_address(scheme)
+        if scheme == 'https':
+            if proxy is None:
+                return HTTPSConnection(
+                    host, port, timeout=timeout, context=self.ssl_context)
+            connection = HTTPSConnection(
+                *proxy, timeout=timeout, context=self.ssl_context)
+            connection.set_tunnel(host, port)
+            return connection
+        if proxy is None:
+            return HTTPConnection(host, port, timeout=timeout)
+        return HTTPConnection(*proxy, timeout=timeout)
+
+    def acquire(self, key, timeout):
+        """Return an idle connection for the key or create a new one. The
+        returned flag indicates whether the connection was reused. The
+        connection belongs to the cancel scope of the request if any.
+        """
+        connection, reused = self._acquire(key, timeout)
+        scope = get_scope()
+        if scope is not None:
+            connection.cancel_scope = scope
+            scope.add(connection)
+        return connection, reused
+
+    def _acquire(self, key, timeout):
+        with self.lock:
+            connections = self.idle.get(key)
+            while connections:
+                connection = connections.pop()
+                if connection.sock is not None:
+                    connection.sock.settimeout(timeout)
+                    connection.timeout = timeout
+                    return connection, True
+        return self._create_connection(*key, timeout), False
+
+    def _untrack(self, connection):
+        scope = getattr(connection, 'cancel_scope', None)
+        if scope is not None:
+            scope.discard(connection)
+            connection.cancel_scope = None
+
+    def discard(self, connection):
+        self._untrack(connection)
+        connection.close()
+
+    def release(self, key, connection):
+        self._untrack(connection)
+        with self.lock:
+            connections = self.idle.setdefault(key, deque())
+            if len(connections) < self.size:
+                connections.append(connection)
+                return
+        connection.close()
+
+    def close(self):
+        with self.lock:
+            for connections in self.idle.values():
+                while connections:
+                    connections.pop().close()
+            self.idle.clear()
+
+    def _send(self, url, data, headers, method, timeout):
+        key, selector = self._parse_url(url)
+        while True:
+            if is_canceled():
+                raise RequestCanceled()
+            connection, reused = self.acquire(key, timeout)
+            # A file body is read to the end by a failed attempt.
+            if hasattr(data, 'seek'):
+                data.seek(0)
+            try:
+                connection.request(method, selector, data, headers)
+                # The socket may not exist yet when the scope is canceled.
+                if is_canceled():
+                    raise RequestCanceled()
+                return key, connection, connection.getresponse()
+            except (RemoteDisconnected, ConnectionError, HTTPException):
+                self.discard(connection)
+                # The server may close an idle connection at any time, so
+                # retry with a new connection rather than failing.
+                if not reused or is_canceled():
+                    raise
+            except Exception:
+                self.discard(connection)
+                raise
+
+    def request(
+            self, url, data=None, headers={}, method='GET', timeout=30,
+            raw_object=False) -> Response | str:
+        url, data, headers = self._prepare(url, data, headers, method)
+        for _ in range(self.max_redirects + 1):
+            key, connection, response = self._send(
+                url, data, headers, method, timeout)
+            wrapper = Response(self, key, connection, response)
+            location = response.headers.get('Location')
+            if response.status in (301, 302, 303, 307, 308) and location:
+                wrapper.read()
+                url = urljoin(url, location)
+                if response.status == 303:
+                    method, data = 'GET', None
+                continue
+            if response.status >= 400:
+                raise HttpError(
+                    url, response.status, response.reason, response.headers,
+                    wrapper.read().decode('utf-8', 'replace'))
+            if raw_object:
+                return wrapper
+            return wrapper.read().decode('utf-8').strip()
+        raise HttpError(
+            url, response.status, response.reason, response.headers,
+            'Exceeded the maximum number of redirects.')
+
+
+class AsyncResponse:
+    """The fully received response of an AsyncSession request. It offers the
+    same reading interface as Response, so engines can parse it as usual.
+    """
+    def __init__(self, status, reason, headers, body):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = io.BytesIO(decode_content(body, headers))
+
+    def read(self, amt=None):
+        return self.body.read(-1 if amt is None else amt)
+
+    def readline(self, limit=-1):
+        line = self.body.readline(limit)
+        # Avoid endless loops in stream parsers waiting for more data.
+        if not line:
+            raise EOFError('The response has been fully read.')
+        return line
+
+    def __iter__(self):
+        return iter(self.body)
+
+    def close(self):
+        self.body.close()
+
+
+class AsyncSession(BaseSession):
+    """A pool of persistent HTTP connections based on asyncio streams, which
+    lets many requests wait concurrently without occupying a thread each.
+    """
+    def __init__(self, size=0, proxy_uri=None):
+        BaseSession.__init__(self, size, proxy_uri)
+        self.idle: dict[tuple, deque] = {}
+        self.loop = None
+
+    @classmethod
+    def is_available(cls, proxy_uri=None):
+        # Tunneling through an HTTP proxy requires StreamWriter.start_tls.
+        return proxy_uri is None or hasattr(asyncio.StreamWriter, 'start_tls')
+
+    def _check_loop(self):
+        # Streams are bound to the event loop that created them.
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.close()
+            self.loop = loop
+
+    async def _create_connection(self, scheme, host, port):
+        proxy = self._proxy_address(scheme)
+        ssl_context = self.ssl_context if scheme == 'https' else None
+        if proxy is None:
+            return await asyncio.open_connection(
+                host, port, ssl=ssl_context)
+        reader, writer = await asyncio.open_connection(*proxy)
+        if scheme == 'https':
+            writer.write((
+                'CONNECT {0}:{1} HTTP/1.1\r\nHost: {0}:{1}\r\n\r\n'
+                .format(host, port)).encode('latin-1'))
+            status, _, _ = await self._read_head(reader)
+            if status != 200:
+                writer.close()
+                raise ConnectionError(
+                    'Tunnel connection failed: %s' % status)
+            await writer.start_tls(ssl_context, server_hostname=host)
+        return reader, writer
+
+    async def acquire(self, key):
+        self._check_loop()
+        connections = self.idle.get(key)
+        while connections:
+            reader, writer = connections.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer, True
+        return (*await self._create_connection(*key), False)
+
+    def release(self, key, reader, writer):
+        connections = self.idle.setdefault(key, deque())
+        if len(connections) < self.size:
+            connections.append((reader, writer))
+        else:
+            writer.close()
+
+    def _close_writer(self, writer):
+        try:
+            writer.close()
+        except RuntimeError:
+            # The event loop has been closed, so shut down the socket directly
+            # to let the server know that the connection is over.
+            sock = writer.get_extra_info('socket')
+            if sock is not None:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    def close(self):
+        for connections in self.idle.values():
+            while connections:
+                self._close_writer(connections.pop()[1])
+        self.idle.clear()
+
+    async def _read_head(self, reader):
+        line = await reader.readline()
+        if not line:
+            raise RemoteDisconnected(
+                'Remote end closed connection without response')
+        _, status, reason = (line.decode('latin-1').strip().split(' ', 2)
+                             + [''])[:3]
+        head = b''
+        while True:
+            line = await reader.readline()
+            head += line
+            if line in (b'\r\n', b'\n', b''):
+                break
+        return int(status), reason, parse_headers(io.BytesIO(head))
+
+    async def _read_body(self, reader, headers, method, status):
+        if method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+            return b''
+        if 'chunked' in (headers.get('Transfer-Encoding') or '').lower():
+            body = b''
+            while True:
+                size = await reader.readline()
+                size = int(size.split(b';')[0].strip() or b'0', 16)
+                if size == 0:
+                    # Skip the trailer section.
+                    while await reader.readline() not in (
+                            b'\r\n', b'\n', b''):
+                        pass
+                    return body
+                body += await reader.readexactly(size)
+                await reader.readline()
+        length = headers.get('Content-Length')
+        if length is not None:
+            return await reader.readexactly(int(length))
+        return await reader.read()
+
+    async def _send(self, url, data, headers, method):
+        key, selector = self._parse_url(url)
+        host = key[1] if key[2] in (80, 443) else '%s:%s' % key[1:]
+        lines = ['%s %s HTTP/1.1' % (method, selector), 'Host: %s' % host]
+        names = [name.lower() for name in headers.keys()]
+        if data is not None or method in ('POST', 'PUT', 'PATCH'):
+            lines.append('Content-Length: %d' % len(data or b''))
+        if 'accept-encoding' not in names:
+            lines.append('Accept-Encoding: identity')
+        lines.extend('%s: %s' % item for item in headers.items())
+        payload = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+        payload += data or b''
+        while True:
+            reader, writer, reused = await self.acquire(key)
+            try:
+                writer.write(payload)
+                await writer.drain()
+                status, reason, response_headers = await self._read_head(
+                    reader)
+                body = await self._read_body(
+                    reader, response_headers, method, status)
+            except (RemoteDisconnected, ConnectionError,
+                    asyncio.IncompleteReadError):
+                writer.close()
+                if not reused:
+                    raise
+                continue
+            except BaseException:
+                # Including cancellation, which leaves the stream unusable.
+                writer.close()
+                raise
+            connection = (response_headers.get('Connection') or '').lower()
+            if connection == 'close' or 'Content-Length' not in \
+                    response_headers and 'chunked' not in (
+                        response_headers.get('Transfer-Encoding') or ''):
+                writer.close()
+            else:
+                self.release(key, reader, writer)
+            return AsyncResponse(status, reason, response_headers, body)
+
+    async def request(
+            self, url, data=None, headers={}, method='GET', timeout=30,
+            raw_object=False) -> AsyncResponse | str:
+        url, data, headers = self._prepare(url, data, headers, method)
+        for _ in range(self.max_redirects + 1):
+            response = await asyncio.wait_for(
+                self._send(url, data, headers, method), timeout)
+            location = response.headers.get('Location')
+            if response.status in (301, 302, 303, 307, 308) and location:
+                url = urljoin(url, location)
+                if response.status == 303:
+                    method, data = 'GET', None
+                continue
+            if response.status >= 400:
+                raise HttpError(
+                    url, response.status, response.reason, response.headers,
+                    response.read().decode('utf-8', 'replace'))
+            if raw_object:
+                return response
+            return response.read().decode('utf-8').strip()
+        raise HttpError(
+            url, response.status, response.reason, response.headers,
+            'Exceeded the maximum number of redirects.')
+
+
+sessions: dict[tuple, Session] = {}
+async_sessions: dict[tuple, AsyncSession] = {}
+sessions_lock = threading.Lock()
+
+
+def get_session(key, size=0, proxy_uri=None) -> Session:
+    """Get a long-lived session shared by everything using the same key
+    (normally the engine name and its proxy settings) in the process.
+    """
+    with sessions_lock:
+        session = sessions.get(key)
+        if session is None:
+            session = sessions[key] = Session(size, proxy_uri)
+        elif size:
+            session.set_size(size)
+        return session
+
+
+def get_async_session(key, size=0, proxy_uri=None) -> AsyncSession:
+    """Get the asynchronous counterpart of get_session."""
+    with sessions_lock:
+        session = async_sessions.get(key)
+        if session is None:
+            session = async_sessions[key] = AsyncSession(size, proxy_uri)
+        elif size:
+            session.set_size(size)
+        return session
+
+
+def close_sessions():
+    with sessions_lock:
+        for session in (*sessions.values(), *async_sessions.values()):
+            session.close()
+        sessions.clear()
+        async_sessions.clear()
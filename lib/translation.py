@@ -1,7 +1,9 @@
 import re
 import time
 import json
+import asyncio
 from types import GeneratorType
+from contextlib import nullcontext, contextmanager, asynccontextmanager
 
 from calibre.utils.localization import _  # type: ignore
 
@@ -12,8 +14,14 @@ from ..engines.custom import CustomTranslate
 
 from .utils import log, sep, trim, dummy, traceback_error
 from .config import get_config
-from .exception import TranslationFailed, TranslationCanceled
-from .handler import Handler
+from .exception import (
+    TranslationFailed, TranslationCanceled, TranslationRetry)
+from .handler import (
+    Handler, ConcurrencyController, Hedging, is_rate_limited,
+    get_retry_delay)
+from .keys import ApiKeyPool, create_limits
+from .failover import Failover
+from .priority import chain, structure_first, longest_first, selected_first
 
 
 load_translations()  # type: ignore
@@ -71,7 +79,23 @@ class ProgressBar:
         return self._count
 
 
+class Batch:
+    """A group of paragraphs translated with a single request."""
+    def __init__(self, paragraphs, retry=0):
+        self.paragraphs = paragraphs
+        self.error = None
+        self.retry = retry
+        self.fallback = False
+
+    @property
+    def row(self):
+        return self.paragraphs[0].row
+
+
 class Translation:
+    # The interval in seconds between the updates of the streaming text.
+    stream_interval = 0.04
+
     def __init__(self, translator, glossary):
         self.translator = translator
         self.glossary = glossary
@@ -87,6 +111,20 @@ class Translation:
         self.total = 0
         self.progress_bar = ProgressBar()
         self.abort_count = 0
+        self.concurrency = None
+        self.rate_limiter = None
+        self.request_slots = None
+        self.api_key_pool = None
+        self.fallbacks = []
+        self.breaker_args = ()
+        self.failover = None
+        self.hedging = None
+        # The metadata and the table of contents come first, then the longest
+        # paragraphs, which shortens the total time of the job.
+        self.priority = chain(structure_first, longest_first)
+        self.handler = None
+        self.batch_budget = 0
+        self.batch_by_page = False
 
     def set_fresh(self, fresh):
         self.fresh = fresh
@@ -109,82 +147,329 @@ class Translation:
     def set_cancel_request(self, cancel_request):
         self.cancel_request = cancel_request
 
+    def set_priority(self, priority):
+        self.priority = priority
+
+    def prioritize(self, rows):
+        """Move the paragraphs in the rows ahead of the others waiting in the
+        running translation.
+        """
+        if self.handler is not None:
+            self.handler.reprioritize(
+                chain(selected_first(rows), self.priority))
+
+    def set_fallbacks(self, translators, threshold=5, cooldown=60.0):
+        """The engines to translate with if the current one is unavailable,
+        in order of preference.
+        """
+        self.fallbacks = translators
+        self.breaker_args = (threshold, cooldown)
+
+    def set_rate_limiter(self):
+        """All workers draw from the same budgets. Without a requests per
+        minute budget, the request interval spaces the requests evenly. The
+        budgets and the concurrency limit are shared by the translation jobs
+        running in other processes with the same engine and API key. With
+        several API keys, the requests are spread among all of them, each
+        with its own budgets.
+        """
+        limit = self.translator.max_concurrency \
+            if self.translator.adaptive_concurrency \
+            else self.translator.concurrency_limit
+        self.api_key_pool = None
+        if self.translator.need_api_key and len(self.translator.api_keys) > 0:
+            self.api_key_pool = ApiKeyPool(self.translator, limit)
+            self.log(_('Dispatching requests among {} API keys.')
+                     .format(len(self.api_key_pool)))
+            return
+        self.rate_limiter, self.request_slots = create_limits(
+            self.translator, limit)
+
+    def _attempts(self):
+        """The number of requests for a text before it moves on to the next
+        engine of the failover chain.
+        """
+        return self.translator.request_attempt + 1
+
+    def _select_key(self, retry=0):
+        route = None
+        if self.failover is not None:
+            route = self.failover.select(retry // self._attempts())
+            if route.translator is not self.translator:
+                return route, None, route.translator, route.rate_limiter, \
+                    route.slots
+        if self.api_key_pool is None:
+            return route, None, self.translator, self.rate_limiter, \
+                self.request_slots
+        key = self.api_key_pool.select()
+        return route, key, key.translator, key.rate_limiter, key.slots
+
+    def _cancel_key(self, route, key):
+        if route is not None:
+            self.failover.cancel(route)
+        if key is not None:
+            self.api_key_pool.cancel(key)
+
+    def _release_key(self, route, key, error=None):
+        if route is not None:
+            self.failover.release(route, error)
+        if key is None or not self.api_key_pool.release(key, error):
+            return
+        self.log(_('API key #{} is suspended for {} seconds.').format(
+            self.api_key_pool.keys.index(key) + 1, round(
+                key.quarantined_until - time.monotonic(), 1)), True)
+
+    @contextmanager
+    def _dispatch(self, *texts, retry=0):
+        """Wait for the budgets of the engine and the API key selected for
+        the request of the texts, and yield the translator that uses them.
+        """
+        route, key, translator, rate_limiter, slots = self._select_key(retry)
+        try:
+            if rate_limiter is not None:
+                rate_limiter.acquire(self._estimate_tokens(texts))
+            with self._occupy(slots), self._measure():
+                yield translator
+        except Exception as error:
+            self._release_key(route, key, error)
+            # Let the error handler know which engine failed.
+            error.route = route
+            raise
+        self._release_key(route, key)
+
+    @asynccontextmanager
+    async def _dispatch_async(self, *texts, retry=0):
+        route, key, translator, rate_limiter, slots = self._select_key(retry)
+        try:
+            if rate_limiter is not None:
+                await rate_limiter.acquire_async(self._estimate_tokens(texts))
+            async with self._occupy_async(slots):
+                with self._measure():
+                    yield translator
+        except asyncio.CancelledError:
+            self._cancel_key(route, key)
+            raise
+        except Exception as error:
+            self._release_key(route, key, error)
+            error.route = route
+            raise
+        self._release_key(route, key)
+
+    def _estimate_tokens(self, texts):
+        return sum(self.translator.estimate_tokens(text) for text in texts)
+
+    def _occupy(self, slots=None):
+        if slots is None:
+            return nullcontext()
+        return slots.hold()
+
+    def _occupy_async(self, slots=None):
+        if slots is None:
+            return nullcontext()
+        return slots.hold_async()
+
     def need_stop(self):
         # Cancel the request if there are more than max continuous errors.
         return self.translator.max_error_count > 0 and \
             self.abort_count >= self.translator.max_error_count
 
-    def translate_text(self, row, text, retry=0, interval=0):
-        """Translation engine service error code documentation:
+    def translate_text(self, row, text, retry=0):
+        """Translate the text with a single request. Failed requests raise
+        TranslationRetry so that the handler can retry them later without
+        blocking a worker. Translation engine service error code
+        documentation:
         * https://cloud.google.com/apis/design/errors
         * https://www.deepl.com/docs-api/api-access/error-handling/
         * https://platform.openai.com/docs/guides/error-codes/api-errors
         * https://ai.youdao.com/DOCSIRMA/html/trans/api/wbfy/index.html
         * https://api.fanyi.baidu.com/doc/21
         """
+        return self._translate_text(row, text, retry)[1]
+
+    def _translate_text(self, row, text, retry=0):
+        """Translate the text, and return the translator used with the
+        translation.
+        """
+        if self.cancel_request():
+            raise TranslationCanceled(_('Translation canceled.'))
+        try:
+            with self._dispatch(text, retry=retry) as translator:
+                translation = translator.translate(text)
+            self.abort_count = 0
+            return translator, translation
+        except Exception as e:
+            self._handle_text_error(row, text, e, retry)
+
+    async def translate_text_async(self, row, text, retry=0):
+        """The asynchronous counterpart of translate_text."""
+        return (await self._translate_text_async(row, text, retry))[1]
+
+    async def _translate_text_async(self, row, text, retry=0):
         if self.cancel_request():
             raise TranslationCanceled(_('Translation canceled.'))
         try:
-            translation = self.translator.translate(text)
+            if self.hedging is None:
+                result = await self._request_async(text, retry)
+            else:
+                result = await self._hedge_async(text, retry)
             self.abort_count = 0
-            return translation
+            return result
         except Exception as e:
-            if self.cancel_request() or self.need_stop():
-                raise TranslationCanceled(_('Translation canceled.'))
+            self._handle_text_error(row, text, e, retry)
+
+    async def _request_async(self, text, retry=0):
+        async with self._dispatch_async(text, retry=retry) as translator:
+            # The fallback engines may not support asynchronous requests.
+            if translator is self.translator or translator.allow_async():
+                translation = await translator.translate_async(text)
+            else:
+                translation = await asyncio.get_running_loop() \
+                    .run_in_executor(None, translator.translate, text)
+        return translator, translation
+
+    async def _hedge_async(self, text, retry=0):
+        """Send a duplicate of the request if it is slow, and take the first
+        successful answer. The duplicate goes to the next engine of the
+        failover chain if any, otherwise to the least busy API key. The
+        request left behind is canceled.
+        """
+        started = time.monotonic()
+        self.hedging.start()
+        tasks = {asyncio.ensure_future(self._request_async(text, retry))}
+        threshold = self.hedging.threshold()
+        try:
+            if threshold is not None:
+                done, pending = await asyncio.wait(tasks, timeout=threshold)
+                if not done and self.hedging.acquire():
+                    self.log(_('Sending a duplicate of the request slower '
+                               'than {} seconds.').format(round(threshold, 1)))
+                    if self.failover is not None:
+                        retry += self._attempts()
+                    tasks.add(asyncio.ensure_future(
+                        self._request_async(text, retry)))
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(
+                    tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self.hedging.record(time.monotonic() - started)
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _measure(self):
+        if self.concurrency is None:
+            return nullcontext()
+        return self.concurrency.measure()
+
+    def _handle_text_error(self, row, text, error, retry):
+        if self.cancel_request() or self.need_stop():
+            raise TranslationCanceled(_('Translation canceled.'))
+        # The errors do not count while another engine can take over.
+        failover = self.failover is not None and self.failover.available(
+            getattr(error, 'route', None))
+        if not failover:
             self.abort_count += 1
-            message = _('Failed to retrieve data from translate engine API.')
-            if retry >= self.translator.request_attempt:
-                raise TranslationFailed('{}\n{}'.format(message, str(e)))
-            retry += 1
-            interval += 5
-            # Logging any errors that occur during translation.
-            logged_text = text[:200] + '...' if len(text) > 200 else text
-            error_messages = [
-                sep(), _('Original: {}').format(logged_text), sep('┈'),
-                _('Status: Failed {} times / Sleeping for {} seconds')
-                .format(retry, interval), sep('┈'), _('Error: {}')
-                .format(traceback_error())]
-            if row >= 0:
-                error_messages.insert(1, _('Row: {}').format(row))
-            self.log('\n'.join(error_messages), True)
-            if self.translator.match_error(str(e)):
-                raise TranslationCanceled(_('Translation canceled.'))
-            time.sleep(interval)
-            return self.translate_text(row, text, retry, interval)
+        message = _('Failed to retrieve data from translate engine API.')
+        engines = 1 if self.failover is None else len(self.failover)
+        if retry + 1 >= self._attempts() * engines:
+            raise TranslationFailed('{}\n{}'.format(message, str(error)))
+        retry += 1
+        # Retry at once with another API key or engine if the key failed or
+        # the text moves on to the next engine.
+        switch_key = self.api_key_pool is not None and \
+            self.api_key_pool.available() and (
+                is_rate_limited(error)
+                or self.translator.match_error(str(error)))
+        switch_engine = failover and retry % self._attempts() == 0
+        delay = 0.0 if switch_key or switch_engine \
+            else get_retry_delay(error, retry)
+        # Logging any errors that occur during translation.
+        logged_text = text[:200] + '...' if len(text) > 200 else text
+        error_messages = [
+            sep(), _('Original: {}').format(logged_text), sep('┈'),
+            _('Status: Failed {} times / Sleeping for {} seconds')
+            .format(retry, round(delay, 1)), sep('┈'), _('Error: {}')
+            .format(traceback_error())]
+        if row >= 0:
+            error_messages.insert(1, _('Row: {}').format(row))
+        self.log('\n'.join(error_messages), True)
+        if self.translator.match_error(str(error)) and not switch_key \
+                and not failover:
+            raise TranslationCanceled(_('Translation canceled.'))
+        raise TranslationRetry(message, delay) from error
 
     def translate_paragraph(self, paragraph):
+        text = self._prepare_paragraph(paragraph)
+        if text is None:
+            return
+        translator, translation = self._translate_text(
+            paragraph.row, text, paragraph.retry)
+        self._apply_translation(paragraph, translation, translator)
+
+    async def translate_paragraph_async(self, paragraph):
+        text = self._prepare_paragraph(paragraph)
+        if text is None:
+            return
+        translator, translation = await self._translate_text_async(
+            paragraph.row, text, paragraph.retry)
+        self._apply_translation(paragraph, translation, translator)
+
+    def _prepare_paragraph(self, paragraph):
         if self.cancel_request():
             raise TranslationCanceled(_('Translation canceled.'))
         if paragraph.translation and not self.fresh:
             paragraph.is_cache = True
-            return
+            return None
         self.streaming('')
         self.streaming(_('Translating...'))
-        text = self.glossary.replace(paragraph.original)
-        translation = self.translate_text(paragraph.row, text)
+        return self.glossary.replace(paragraph.original)
+
+    def _apply_translation(self, paragraph, translation, translator=None):
+        translator = translator or self.translator
         # Process streaming text
         if isinstance(translation, GeneratorType):
             if self.total == 1:
                 # Only for a single translation.
-                temp = ''
+                temp = chunk = ''
                 clear = True
+                updated = 0.0
                 for char in translation:
+                    if self.cancel_request():
+                        # Stop reading the response, whose socket is shut
+                        # down by the cancel scope of the handler.
+                        translation.close()
+                        raise TranslationCanceled(
+                            _('Translation canceled.'))
                     if clear:
                         self.streaming('')
                         clear = False
-                    self.streaming(char)
-                    time.sleep(0.05)
                     temp += char
+                    chunk += char
+                    # Coalesce the chunks into updates at the frame rate of
+                    # the UI, rather than one cross-thread update per chunk.
+                    now = time.monotonic()
+                    if now - updated >= self.stream_interval:
+                        self.streaming(chunk)
+                        chunk = ''
+                        updated = now
+                if chunk:
+                    self.streaming(chunk)
             else:
                 temp = ''.join([char for char in translation])
             translation = temp
         translation = self.glossary.restore(translation)
         paragraph.translation = translation.strip()
-        # Apply aligment checking and processing.
+        # Apply aligment checking and processing. The text was merged for
+        # the primary engine, even if a fallback engine translated it.
         if self.translator.merge_enabled:
             paragraph.do_aligment(self.translator.separator)
-        paragraph.engine_name = self.translator.name
-        paragraph.target_lang = self.translator.get_target_lang()
+        paragraph.engine_name = translator.name
+        paragraph.target_lang = translator.get_target_lang()
         paragraph.is_cache = False
 
     def process_translation(self, paragraph):
@@ -208,80 +493,205 @@ class Translation:
                 message = _('Translation (Cached): {}')
             self.log(message.format(paragraph.translation.strip()))
             
+    def need_translate(self, paragraph):
+        return not paragraph.translation or self.fresh
+
+    def pack_batches(self, paragraphs, retry=0):
+        """Fill each batch up to the maximum number of items and the budget
+        of characters. A paragraph exceeding the budget makes a batch alone.
+        If batching by page, a batch does not span multiple pages.
+        """
+        batches = []
+        current: list = []
+        length = 0
+        for paragraph in paragraphs:
+            # Cached paragraphs are not sent, so they do not take the budget.
+            size = len(paragraph.original) \
+                if self.need_translate(paragraph) else 0
+            if current and (len(current) >= self.translator.batch_size
+                            or length + size > self.batch_budget
+                            or (self.batch_by_page
+                                and paragraph.page != current[-1].page)):
+                batches.append(Batch(current, retry))
+                current, length = [], 0
+            current.append(paragraph)
+            length += size
+        if current:
+            batches.append(Batch(current, retry))
+        return batches
+
+    def translate_batch(self, batch):
+        if self.cancel_request():
+            raise TranslationCanceled(_('Translation canceled.'))
+        to_translate = []
+        for paragraph in batch.paragraphs:
+            if self.need_translate(paragraph):
+                to_translate.append(paragraph)
+            else:
+                paragraph.is_cache = True
+        if not to_translate:
+            return
+        length = sum(len(p.original) for p in to_translate)
+        # Split the batches packed before the budget was reduced.
+        if len(to_translate) > 1 and length > self.batch_budget:
+            raise TranslationRetry(
+                _('Batch exceeds the budget.'), 0,
+                self.pack_batches(to_translate, batch.retry))
+        # A single paragraph failing in batches falls back to translate().
+        if batch.fallback:
+            paragraph = to_translate[0]
+            text = self.glossary.replace(paragraph.original)
+            translator, translation = self._translate_text(
+                paragraph.row, text, batch.retry)
+            self._apply_translation(paragraph, translation, translator)
+            return
+        if self.failover is not None:
+            self._check_batch_route(to_translate, length, batch.retry)
+        row = batch.row
+        self.log(sep())
+        self.log(_('Translating batch starting at row {} ({} items)...')
+                 .format(row, len(to_translate)))
+        originals = [self.glossary.replace(p.original) for p in to_translate]
+        try:
+            with self._dispatch(*originals, retry=batch.retry) as translator:
+                results = translator.translate_batch(originals)
+        except Exception as e:
+            self._handle_text_error(
+                row, '\n'.join(originals), e, batch.retry)
+        if not results or len(results) != len(originals):
+            results = [None] * len(originals)
+        # Accept the valid results, and translate the missing ones again.
+        missing = []
+        for paragraph, translation in zip(to_translate, results):
+            if not translation:
+                missing.append(paragraph)
+                continue
+            paragraph.translation = self.glossary.restore(translation).strip()
+            paragraph.is_cache = False
+            paragraph.engine_name = translator.name
+            paragraph.target_lang = translator.get_target_lang()
+            if self.translator.merge_enabled:
+                paragraph.do_aligment(self.translator.separator)
+        if len(missing) < len(to_translate):
+            self.abort_count = 0
+        if not missing:
+            return
+        message = _('Incomplete batch result: {}/{} items are missing.') \
+            .format(len(missing), len(to_translate))
+        if len(to_translate) > 1:
+            # A truncated response suggests the batch is too large.
+            self.reduce_batch_budget(length)
+            if len(missing) < len(to_translate):
+                items = self.pack_batches(missing, batch.retry)
+            else:
+                # Halve the batch that keeps failing to isolate bad items.
+                middle = len(missing) // 2
+                items = [Batch(missing[:middle], batch.retry),
+                         Batch(missing[middle:], batch.retry)]
+            raise TranslationRetry(message, 0, items)
+        self.log(message, True)
+        batch.fallback = True
+        raise TranslationRetry(message, 0, [batch])
+
+    def _check_batch_route(self, paragraphs, length, retry):
+        """Fit the batch to the engine of the failover chain that it would
+        be sent to, which may have smaller limits or no batching at all.
+        """
+        translator = self.failover.peek(retry // self._attempts()).translator
+        if translator is self.translator:
+            return
+        if not translator.allow_batch():
+            items = []
+            for paragraph in paragraphs:
+                item = Batch([paragraph], retry)
+                item.fallback = True
+                items.append(item)
+            raise TranslationRetry(
+                _('The engine {} does not translate batches.')
+                .format(translator.name), 0, items)
+        if len(paragraphs) > 1 and (
+                len(paragraphs) > translator.batch_size
+                or length > translator.batch_characters):
+            middle = len(paragraphs) // 2
+            raise TranslationRetry(
+                _('Batch exceeds the limits of the engine {}.')
+                .format(translator.name), 0,
+                [Batch(paragraphs[:middle], retry),
+                 Batch(paragraphs[middle:], retry)])
+
+    def reduce_batch_budget(self, length):
+        budget = max(1, min(self.batch_budget, length // 2))
+        if budget < self.batch_budget:
+            self.batch_budget = budget
+            self.log(_('Incomplete batch result. Reduce the batch size to {} '
+                       'characters.').format(budget), True)
+
+    def process_batch(self, batch):
+        # Process results for UI
+        for paragraph in batch.paragraphs:
+            paragraph.error = batch.error
+            self.process_translation(paragraph)
+
     def handle_batch(self, paragraphs=[]):
         start_time = time.time()
         char_count = sum(len(p.original) for p in paragraphs)
-        
+
         self.log(sep())
         self.log(_('Start to translate ebook content (Online Batching)'))
         self.log(sep('┈'))
         self.log(_('Item count: {}').format(len(paragraphs)))
         self.log(_('Character count: {}').format(char_count))
-        
+
         if len(paragraphs) < 1:
             raise Exception(_('There is no content need to translate.'))
-            
+
         self.progress_bar.load(len(paragraphs))
-        
-        # Determine batch size (default 20 for OpenRouter)
-        batch_size = 20
-        
-        for i in range(0, len(paragraphs), batch_size):
-            if self.cancel_request():
-                raise TranslationCanceled(_('Translation canceled.'))
-                
-            batch = paragraphs[i:i + batch_size]
-            # Only translate untranslated paragraphs unless fresh is True
-            to_translate = [p for p in batch if not p.translation or self.fresh]
-            
-            if to_translate:
-                self.log(sep())
-                self.log(_('Translating batch starting at row {} ({} items)...').format(batch[0].row if batch[0].row >= 0 else i, len(to_translate)))
-                
-                # Perform batch translation with retries
-                results = None
-                retry = 0
-                interval = 5
-                while retry < self.translator.request_attempt:
-                    if self.cancel_request():
-                        raise TranslationCanceled(_('Translation canceled.'))
-                    
-                    try:
-                        results = self.translator.translate_batch([p.original for p in to_translate])
-                        if results and len(results) == len(to_translate):
-                            break
-                        else:
-                            raise Exception("Incomplete batch result")
-                    except Exception as e:
-                        retry += 1
-                        self.log(_('Batch failed ({}): {}').format(retry, str(e)), True)
-                        if retry >= self.translator.request_attempt:
-                            raise TranslationFailed(_('Batch translation failed after {} attempts').format(retry))
-                        time.sleep(interval)
-                        interval += 5
-                
-                # Apply results
-                if results:
-                    for p, trans in zip(to_translate, results):
-                        p.translation = trans
-                        p.is_cache = False
-                        p.engine_name = self.translator.name
-                        p.target_lang = self.translator.get_target_lang()
-                        if self.translator.merge_enabled:
-                            p.do_aligment(self.translator.separator)
-            
-            # Process results for UI
-            for p in batch:
-                self.process_translation(p)
-                if self.cancel_request():
-                    raise TranslationCanceled(_('Translation canceled.'))
+
+        self.batch_budget = self.translator.batch_characters
+        self.batch_by_page = self.translator.batch_by_page
+        batches = self.pack_batches(paragraphs)
+        self.log(_('Batch count: {}').format(len(batches)))
+        # The batches are dispatched concurrently like single paragraphs.
+        self.create_handler(batches, self.translate_batch, self.process_batch) \
+            .handle()
 
         self.log(sep())
+        if self.batch and self.need_stop():
+            raise Exception(_('Translation failed.'))
         consuming = round((time.time() - start_time) / 60, 2)
         self.log(_('Time consuming: {} minutes').format(consuming))
         self.log(_('Translation completed.'))
         self.progress(1, _('Translation completed.'))
 
+    def create_handler(
+            self, items, translate, process, translate_async=None):
+        self.set_rate_limiter()
+        if self.fallbacks:
+            self.failover = Failover(
+                [self.translator] + self.fallbacks, *self.breaker_args,
+                log=self.log)
+            self.log(_('Failover engines: {}').format(', '.join(
+                translator.name for translator in self.fallbacks)))
+        if self.translator.hedge_requests:
+            self.hedging = Hedging(
+                self.translator.hedge_percentile,
+                self.translator.hedge_budget)
+        # Each API key has its own concurrency limits.
+        scale = 1 if self.api_key_pool is None else len(self.api_key_pool)
+        if self.translator.adaptive_concurrency:
+            self.concurrency = ConcurrencyController(
+                self.translator.concurrency_limit * scale,
+                self.translator.min_concurrency,
+                self.translator.max_concurrency * scale, self.log)
+            self.log(_('Concurrency limit: {} (adaptive, {}-{})').format(
+                self.concurrency.current, self.concurrency.minimum,
+                self.concurrency.maximum))
+        self.handler = Handler(
+            items, self.translator.concurrency_limit * scale, translate,
+            process, translate_async, self.concurrency, self.cancel_request,
+            self.priority)
+        return self.handler
+
     def handle(self, paragraphs=[]):
         start_time = time.time()
         char_count = 0
@@ -301,13 +711,21 @@ class Translation:
 
         # Check for Online Batching support
         config = get_config()
-        if config.get('online_batching') and hasattr(self.translator, 'translate_batch'):
+        if self.translator.allow_batch() and (
+                config.get('online_batching')
+                or not self.translator.batch_opt_in):
             return self.handle_batch(paragraphs)
 
-        handler = Handler(
-            paragraphs, self.translator.concurrency_limit,
-            self.translate_paragraph, self.process_translation,
-            self.translator.request_interval)
+        # Await the requests natively if possible, except for streaming a
+        # single translation, which needs to display the text gradually.
+        translate_paragraph_async = None
+        if self.translator.allow_async() and not (
+                self.total == 1 and self.translator.stream):
+            translate_paragraph_async = self.translate_paragraph_async
+
+        handler = self.create_handler(
+            paragraphs, self.translate_paragraph, self.process_translation,
+            translate_paragraph_async)
         handler.handle()
 
         self.log(sep())
@@ -329,7 +747,9 @@ def get_engine_class(engine_name=None):
     if engine_name in engines:
         engine_class = engines[engine_name]
     elif engine_name in custom_engines:
-        engine_class = CustomTranslate
+        # The engine data is stored in the class, so each custom engine has
+        # its own class, e.g. several of them in the failover chain.
+        engine_class = type(CustomTranslate.__name__, (CustomTranslate,), {})
         engine_data = json.loads(custom_engines[engine_name])
         engine_class.set_engine_data(engine_data)
     else:
@@ -365,4 +785,48 @@ def get_translation(translator, log=None):
     translation = Translation(translator, glossary)
     if get_config().get('log_translation'):
         translation.set_logging(log)
+    fallbacks = get_fallback_translators(translator)
+    if fallbacks:
+        translation.set_fallbacks(
+            fallbacks, config.get('breaker_threshold'),
+            config.get('breaker_cooldown'))
     return translation
+
+
+def get_fallback_translators(translator):
+    """Create the translators of the failover chain, which support the same
+    languages as the current one. The text is extracted with the placeholder
+    and the separator of the current one, so the engines using others cannot
+    take over.
+    """
+    config = get_config()
+    translators = []
+    names = [translator.name]
+    for engine_name in config.get('fallback_engines') or []:
+        if engine_name in names:
+            continue
+        engine_class = get_engine_class(engine_name)
+        if engine_class.name != engine_name:
+            log.warn('Unknown fallback engine: %s' % engine_name)
+            continue
+        if engine_class.placeholder != translator.placeholder \
+                or engine_class.separator != translator.separator:
+            log.warn(
+                'The fallback engine %s does not use the same placeholder '
+                'and separator.' % engine_name)
+            continue
+        try:
+            if translator.source_lang != _('Auto detect'):
+                engine_class.get_source_code(translator.source_lang)
+            engine_class.get_target_code(translator.target_lang)
+        except KeyError:
+            log.warn(
+                'The fallback engine %s does not support the languages.'
+                % engine_name)
+            continue
+        fallback = get_translator(engine_class)
+        fallback.set_source_lang(translator.source_lang)
+        fallback.set_target_lang(translator.target_lang)
+        translators.append(fallback)
+        names.append(engine_name)
+    return translators
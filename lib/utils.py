@@ -149,7 +149,12 @@ def traceback_error():
 
 def request(
         url, data=None, headers={}, method='GET', timeout=30, proxy_uri=None,
-        raw_object=False) -> Response | str | None:
+        raw_object=False, session=None) -> Response | str | None:
+    """:session: A pooled session which reuses persistent connections. The
+    proxy settings of the session take precedence over the proxy_uri.
+    """
+    if session is not None:
+        return session.request(url, data, headers, method, timeout, raw_object)
     br = Browser()
     br.set_handle_robots(False)
 
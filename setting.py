@@ -17,7 +17,8 @@ from .lib.utils import (
     log, css, is_proxy_available, traceback_error, socks_proxy)
 from .lib.translation import get_engine_class, get_translator
 from .engines import (
-    builtin_engines, GeminiTranslate, ChatgptTranslate, AzureChatgptTranslate)
+    builtin_engines, GeminiTranslate, ChatgptTranslate, AzureChatgptTranslate,
+    DeeplProTranslate)
 from .engines.genai import GenAI
 from .engines.custom import CustomTranslate
 from .components import (
@@ -379,6 +380,29 @@ class TranslationSetting(QDialog):
         notice.toggled.connect(
             lambda checked: self.config.update(show_notification=checked))
 
+        # Batch Translation
+        batch_group = QGroupBox(_('Batch Translation'))
+        batch_layout = QHBoxLayout(batch_group)
+        batch_polling = QCheckBox(
+            _('Check and apply the batch translations in the background'))
+        batch_auto_output = QCheckBox(_('Output the ebook once applied'))
+        batch_layout.addWidget(batch_polling)
+        batch_layout.addWidget(batch_auto_output)
+        batch_layout.addStretch(1)
+        layout.addWidget(batch_group)
+
+        batch_polling.setChecked(self.config.get('batch_polling', False))
+        batch_auto_output.setChecked(
+            self.config.get('batch_auto_output', False))
+        batch_auto_output.setEnabled(batch_polling.isChecked())
+
+        def change_batch_polling(checked):
+            self.config.update(batch_polling=checked)
+            batch_auto_output.setEnabled(checked)
+        batch_polling.toggled.connect(change_batch_polling)
+        batch_auto_output.toggled.connect(
+            lambda checked: self.config.update(batch_auto_output=checked))
+
         # Search path
         path_group = QGroupBox(_('Search Paths'))
         path_layout = QVBoxLayout(path_group)
@@ -459,19 +483,70 @@ class TranslationSetting(QDialog):
         request_group = QGroupBox(_('HTTP Request'))
         concurrency_limit = QSpinBox()
         concurrency_limit.setRange(0, 999999)
+        adaptive_widget = QWidget()
+        adaptive_layout = QHBoxLayout(adaptive_widget)
+        adaptive_layout.setContentsMargins(0, 0, 0, 0)
+        adaptive_concurrency = QCheckBox(_('Enable'))
+        min_concurrency = QSpinBox()
+        min_concurrency.setRange(1, 999999)
+        max_concurrency = QSpinBox()
+        max_concurrency.setRange(1, 999999)
+        adaptive_layout.addWidget(adaptive_concurrency)
+        adaptive_layout.addWidget(QLabel(_('Min')))
+        adaptive_layout.addWidget(min_concurrency, 1)
+        adaptive_layout.addWidget(QLabel(_('Max')))
+        adaptive_layout.addWidget(max_concurrency, 1)
+        adaptive_widget.setToolTip(_(
+            'Increase the number of concurrent requests gradually while the '
+            'requests succeed, and halve it on rate limiting, server errors '
+            'or timeouts.'))
         request_interval = QDoubleSpinBox()
         request_interval.setRange(0, 999999)
         request_interval.setDecimals(1)
+        request_interval.setToolTip(_(
+            'The minimum interval between requests, which applies if the '
+            'requests per minute is unlimited.'))
+        requests_per_minute = QSpinBox()
+        requests_per_minute.setRange(0, 999999999)
+        requests_per_minute.setSpecialValueText(_('Unlimited'))
+        tokens_per_minute = QSpinBox()
+        tokens_per_minute.setRange(0, 999999999)
+        tokens_per_minute.setSpecialValueText(_('Unlimited'))
+        tokens_per_minute.setToolTip(_(
+            'The number of characters for translation services that bill by '
+            'characters, or the estimated tokens for AI models.'))
         request_attempt = QSpinBox()
         request_attempt.setRange(0, 999999)
         request_timeout = QDoubleSpinBox()
         request_timeout.setRange(0, 999999)
         request_timeout.setDecimals(1)
+        hedge_widget = QWidget()
+        hedge_layout = QHBoxLayout(hedge_widget)
+        hedge_layout.setContentsMargins(0, 0, 0, 0)
+        hedge_requests = QCheckBox(_('Enable'))
+        hedge_percentile = QSpinBox()
+        hedge_percentile.setRange(50, 99)
+        hedge_budget = QSpinBox()
+        hedge_budget.setRange(1, 100)
+        hedge_budget.setSuffix('%')
+        hedge_layout.addWidget(hedge_requests)
+        hedge_layout.addWidget(QLabel(_('Percentile')))
+        hedge_layout.addWidget(hedge_percentile, 1)
+        hedge_layout.addWidget(QLabel(_('Budget')))
+        hedge_layout.addWidget(hedge_budget, 1)
+        hedge_widget.setToolTip(_(
+            'Send a duplicate of a request that takes longer than the given '
+            'percentile of the response times, and take the first answer. '
+            'The budget limits the duplicates to a share of the requests.'))
         request_layout = QFormLayout(request_group)
         request_layout.addRow(_('Concurrency limit'), concurrency_limit)
+        request_layout.addRow(_('Adaptive concurrency'), adaptive_widget)
         request_layout.addRow(_('Interval (seconds)'), request_interval)
+        request_layout.addRow(_('Requests per minute'), requests_per_minute)
+        request_layout.addRow(_('Tokens per minute'), tokens_per_minute)
         request_layout.addRow(_('Attempt times'), request_attempt)
         request_layout.addRow(_('Timeout (seconds)'), request_timeout)
+        request_layout.addRow(_('Hedge slow requests'), hedge_widget)
         layout.addWidget(request_group)
 
         # Abort Translation
@@ -487,11 +562,66 @@ class TranslationSetting(QDialog):
 
         self.disable_wheel_event(max_error_count)
 
+        # Engine Failover
+        failover_group = QGroupBox(_('Engine Failover'))
+        failover_layout = QFormLayout(failover_group)
+        self.fallback_engines = QPlainTextEdit()
+        self.fallback_engines.setFixedHeight(80)
+        self.fallback_engines.setPlaceholderText(
+            _('The names of the engines to switch to if the current one is '
+              'unavailable, one per line, in order of preference. The '
+              'engines that mark up the text differently from the current '
+              'one, such as DeepL, are skipped.'))
+        breaker_threshold = QSpinBox()
+        breaker_threshold.setRange(1, 100)
+        breaker_cooldown = QSpinBox()
+        breaker_cooldown.setRange(1, 3600)
+        failover_layout.addRow(_('Fallback engines'), self.fallback_engines)
+        failover_layout.addRow(_('Consecutive failures'), breaker_threshold)
+        failover_layout.addRow(
+            _('Retry the engine after (seconds)'), breaker_cooldown)
+        layout.addWidget(failover_group)
+
+        self.fallback_engines.setPlainText(
+            '\n'.join(self.config.get('fallback_engines') or []))
+        breaker_threshold.setValue(self.config.get('breaker_threshold', 5))
+        breaker_cooldown.setValue(self.config.get('breaker_cooldown', 60))
+        breaker_threshold.valueChanged.connect(
+            lambda value: self.config.update(breaker_threshold=value))
+        breaker_cooldown.valueChanged.connect(
+            lambda value: self.config.update(breaker_cooldown=value))
+
+        self.apply_form_layout_policy(failover_layout)
+        self.disable_wheel_event(breaker_threshold)
+        self.disable_wheel_event(breaker_cooldown)
+
+        # Document Translation
+        document_group = QGroupBox(_('Document Translation'))
+        document_group.setVisible(False)
+        document_layout = QVBoxLayout(document_group)
+        document_mode = QCheckBox(_('Translate each page as a document'))
+        document_mode.setToolTip(_(
+            'Upload the content of each page to the document API instead of '
+            'sending requests for every few paragraphs. Note that DeepL bills '
+            'a minimum number of characters for each document.'))
+        document_layout.addWidget(document_mode)
+        layout.addWidget(document_group)
+
+        document_mode.toggled.connect(
+            lambda checked: self.current_engine.config.update(
+                document_mode=checked))
+
         self.apply_form_layout_policy(request_layout)
         self.disable_wheel_event(concurrency_limit)
+        self.disable_wheel_event(min_concurrency)
+        self.disable_wheel_event(max_concurrency)
         self.disable_wheel_event(request_attempt)
         self.disable_wheel_event(request_interval)
+        self.disable_wheel_event(requests_per_minute)
+        self.disable_wheel_event(tokens_per_minute)
         self.disable_wheel_event(request_timeout)
+        self.disable_wheel_event(hedge_percentile)
+        self.disable_wheel_event(hedge_budget)
 
         # GenAI Setting
         genai_group = QGroupBox(_('Fine-tuning'))
@@ -554,8 +684,26 @@ class TranslationSetting(QDialog):
         self.disable_wheel_event(temperature_value)
         self.disable_wheel_event(top_p_value)
 
+        batching_widget = QWidget()
+        batching_layout = QHBoxLayout(batching_widget)
+        batching_layout.setContentsMargins(0, 0, 0, 0)
         self.online_batching = QCheckBox(_('Enable online batching (High Speed)'))
-        genai_layout.addRow(_('Batching'), self.online_batching)
+        batch_size = QSpinBox()
+        batch_size.setRange(1, 999999)
+        batch_characters = QSpinBox()
+        batch_characters.setRange(1, 999999999)
+        batching_layout.addWidget(self.online_batching)
+        batching_layout.addWidget(QLabel(_('Max items')))
+        batching_layout.addWidget(batch_size, 1)
+        batching_layout.addWidget(QLabel(_('Max characters')))
+        batching_layout.addWidget(batch_characters, 1)
+        batching_widget.setToolTip(_(
+            'Each batch is filled up to the maximum number of items and '
+            'characters. The number of characters is reduced automatically '
+            'if the response of a batch is incomplete.'))
+        genai_layout.addRow(_('Batching'), batching_widget)
+        self.disable_wheel_event(batch_size)
+        self.disable_wheel_event(batch_characters)
         self.stream_enabled = QCheckBox(_('Enable streaming response'))
         genai_layout.addRow(_('Stream'), self.stream_enabled)
 
@@ -709,6 +857,14 @@ class TranslationSetting(QDialog):
             self.online_batching.setChecked(self.config.get('online_batching'))
             self.online_batching.toggled.connect(
                 lambda checked: self.config.update(online_batching=checked))
+            batch_size.setValue(config.get(
+                'batch_size', self.current_engine.batch_size))
+            batch_size.valueChanged.connect(
+                lambda value: config.update(batch_size=value))
+            batch_characters.setValue(config.get(
+                'batch_characters', self.current_engine.batch_characters))
+            batch_characters.valueChanged.connect(
+                lambda value: config.update(batch_characters=value))
             genai_group.setVisible(True)
 
         def choose_default_engine(index):
@@ -738,10 +894,22 @@ class TranslationSetting(QDialog):
             if value is None:
                 value = self.current_engine.concurrency_limit
             concurrency_limit.setValue(value)
+            adaptive_concurrency.setChecked(config.get(
+                'adaptive_concurrency',
+                self.current_engine.adaptive_concurrency))
+            min_concurrency.setValue(config.get(
+                'min_concurrency', self.current_engine.min_concurrency))
+            max_concurrency.setValue(config.get(
+                'max_concurrency', self.current_engine.max_concurrency))
             value = config.get('request_interval')
             if value is None:
                 value = self.current_engine.request_interval
             request_interval.setValue(float(value))
+            requests_per_minute.setValue(config.get(
+                'requests_per_minute',
+                self.current_engine.requests_per_minute))
+            tokens_per_minute.setValue(config.get(
+                'tokens_per_minute', self.current_engine.tokens_per_minute))
             value = config.get('request_attempt')
             if value is None:
                 value = self.current_engine.request_attempt
@@ -750,20 +918,48 @@ class TranslationSetting(QDialog):
             if value is None:
                 value = self.current_engine.request_timeout
             request_timeout.setValue(float(value))
+            hedge_requests.setChecked(config.get(
+                'hedge_requests', self.current_engine.hedge_requests))
+            hedge_percentile.setValue(config.get(
+                'hedge_percentile', self.current_engine.hedge_percentile))
+            hedge_budget.setValue(config.get(
+                'hedge_budget', self.current_engine.hedge_budget))
             value = config.get('max_error_count')
             if value is None:
                 value = self.current_engine.max_error_count
             max_error_count.setValue(value)
             concurrency_limit.valueChanged.connect(
                 lambda value: config.update(concurrency_limit=value))
+            adaptive_concurrency.toggled.connect(
+                lambda checked: config.update(adaptive_concurrency=checked))
+            min_concurrency.valueChanged.connect(
+                lambda value: config.update(min_concurrency=value))
+            max_concurrency.valueChanged.connect(
+                lambda value: config.update(max_concurrency=value))
             request_interval.valueChanged.connect(
                 lambda value: config.update(request_interval=round(value, 1)))
+            requests_per_minute.valueChanged.connect(
+                lambda value: config.update(requests_per_minute=value))
+            tokens_per_minute.valueChanged.connect(
+                lambda value: config.update(tokens_per_minute=value))
             request_attempt.valueChanged.connect(
                 lambda value: config.update(request_attempt=value))
             request_timeout.valueChanged.connect(
                 lambda value: config.update(request_timeout=round(value, 1)))
+            hedge_requests.toggled.connect(
+                lambda checked: config.update(hedge_requests=checked))
+            hedge_percentile.valueChanged.connect(
+                lambda value: config.update(hedge_percentile=value))
+            hedge_budget.valueChanged.connect(
+                lambda value: config.update(hedge_budget=value))
             max_error_count.valueChanged.connect(
                 lambda value: config.update(max_error_count=value))
+            # Show document translation preferences
+            is_deepl_pro = issubclass(self.current_engine, DeeplProTranslate)
+            document_group.setVisible(is_deepl_pro)
+            if is_deepl_pro:
+                document_mode.setChecked(config.get(
+                    'document_mode', self.current_engine.document_mode))
             # Show GenAI preferences
             genai_group.setVisible(False)
             if issubclass(self.current_engine, GenAI):
@@ -1291,6 +1487,9 @@ class TranslationSetting(QDialog):
         self.config.update(search_paths=search_paths)
         self.path_list.setPlainText('\n'.join(search_paths))
 
+        # Batch translation
+        self.plugin.set_batch_polling(self.config.get('batch_polling'))
+
         return True
 
     def get_engine_config(self) -> dict:
@@ -1355,6 +1554,14 @@ class TranslationSetting(QDialog):
                 engine_config.pop(name)
         # Update modified engine preferences
         self.config.update(engine_preferences=engine_config)
+        # Fallback engines
+        fallback_engines = []
+        for name in self.fallback_engines.toPlainText().split('\n'):
+            name = name.strip()
+            if name in engine_names and name not in fallback_engines:
+                fallback_engines.append(name)
+        self.config.update(fallback_engines=fallback_engines)
+        self.fallback_engines.setPlainText('\n'.join(fallback_engines))
         return True
 
     def update_content_config(self):
@@ -44,6 +44,15 @@ class TestFunction(unittest.TestCase):
             'merge_enabled': False,
             'merge_length': 1800,
             'ebook_metadata': {},
+            'online_batching': False,
+            'batch_polling': False,
+            'batch_auto_output': False,
+            'cpu_jobs': 0,
+            'translating_jobs': 0,
+            'warm_workers': 0,
+            'fallback_engines': [],
+            'breaker_threshold': 5,
+            'breaker_cooldown': 60,
             'search_paths': [],
         }
 
@@ -3,7 +3,7 @@ from pathlib import Path
 from typing import Callable
 from unittest.mock import patch, Mock
 
-from ...lib.conversion import ConversionWorker
+from ...lib.conversion import ConversionWorker, convert_items
 from ...lib.ebook import Ebook
 
 
@@ -26,6 +26,68 @@ class TestConversionWorker(unittest.TestCase):
     def test_create_worker(self):
         self.assertIsInstance(self.worker, ConversionWorker)
 
+    @patch(module_name + '.Dispatcher')
+    def test_translate_ebooks(self, mock_dispatcher):
+        self.worker.config = {'warm_workers': 2}
+        self.worker._get_output_path = Mock(
+            side_effect=lambda ebook: '/out/%s' % ebook.title)
+        self.worker._get_job_args = Mock(
+            side_effect=lambda ebook, path, cache_only, is_batch: path)
+        ebooks = [Mock(Ebook, title='book %s' % i) for i in range(5)]
+        self.worker.working_jobs = {}
+        jobs = [Mock(), Mock()]
+        self.gui.job_manager.run_job.side_effect = jobs
+
+        self.worker.translate_ebooks(ebooks)
+
+        self.assertEqual(2, self.gui.job_manager.run_job.call_count)
+        call = self.gui.job_manager.run_job.mock_calls[0]
+        self.assertEqual(
+            ('calibre_plugins.ebook_translator.lib.conversion',
+             'convert_items', (['/out/book 0', '/out/book 2', '/out/book 4'],)),
+            call.kwargs['args'])
+        mock_dispatcher.assert_called_with(self.worker.translate_group_done)
+        self.assertEqual(
+            [(ebooks[1], '/out/book 1'), (ebooks[3], '/out/book 3')],
+            self.worker.working_jobs[jobs[1]])
+
+    def test_translate_ebooks_without_warm_workers(self):
+        self.worker.config = {'warm_workers': 0}
+        self.worker.translate_ebook = Mock()
+        ebooks = [Mock(Ebook), Mock(Ebook)]
+
+        self.worker.translate_ebooks(ebooks, is_batch=True)
+
+        self.assertEqual(2, self.worker.translate_ebook.call_count)
+        self.worker.translate_ebook.assert_called_with(ebooks[1], False, True)
+
+    def test_translate_group_done(self):
+        ebooks = [Mock(Ebook, title='book 0'), Mock(Ebook, title='book 1')]
+        self.worker.working_jobs = {
+            self.job: [(ebooks[0], '/out/0'), (ebooks[1], '/out/1')]}
+        self.job.failed = False
+        self.job.result = ['error', None]
+        self.worker.output_ebook = Mock()
+
+        self.worker.translate_group_done(self.job)
+
+        self.worker.output_ebook.assert_called_once_with(
+            self.job, ebooks[1], '/out/1')
+        self.gui.status_bar.show_message.assert_called_once_with(
+            'Failed to translate "book 0".', 5000)
+
+    @patch(module_name + '.convert_item')
+    def test_convert_items(self, mock_convert_item):
+        mock_convert_item.side_effect = [None, Exception('error'), None]
+        notification = Mock()
+
+        errors = convert_items([('a',), ('b',), ('c',)], notification)
+
+        self.assertEqual([None, None], [errors[0], errors[2]])
+        self.assertIn('error', errors[1])
+        self.assertEqual(3, mock_convert_item.call_count)
+        self.assertEqual('c', mock_convert_item.mock_calls[2].args[0])
+
     def test_translate_done_job_failed_debug(self):
         self.job.failed = True
         with patch(module_name + '.DEBUG', True):
@@ -1,23 +1,32 @@
 import io
 import re
 import json
+import asyncio
+import threading
 import unittest
 from pathlib import Path
 from types import GeneratorType
-from unittest.mock import patch, Mock
+from unittest.mock import patch, Mock, AsyncMock, PropertyMock, ANY
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 
 from mechanize import HTTPError  # type: ignore
 from mechanize._response import (  # type: ignore
     closeable_response as mechanize_response)
 
 from ...lib.cache import Paragraph
+from ...lib.session import close_sessions
 from ...engines.base import Base
-from ...lib.exception import UnexpectedResult, UnsupportedModel
+from ...lib.exception import (
+    UnexpectedResult, UnsupportedModel, RequestCanceled)
 from ...engines.genai import GenAI
-from ...engines.deepl import DeeplTranslate
-from ...engines.openai import ChatgptTranslate, ChatgptBatchTranslate
-from ...engines.microsoft import AzureChatgptTranslate
-from ...engines.anthropic import ClaudeTranslate
+from ...engines.deepl import DeeplTranslate, DeeplProTranslate
+from ...engines.baidu import BaiduTranslate
+from ...engines.google import GoogleFreeTranslateHtml
+from ...engines.openai import (
+    ChatgptTranslate, ChatgptBatchTranslate, MultipartFile)
+from ...engines.microsoft import (
+    MicrosoftEdgeTranslate, AzureChatgptTranslate)
+from ...engines.anthropic import ClaudeTranslate, ClaudeBatchTranslate
 from ...engines.custom import (
     create_engine_template, load_engine_data, CustomTranslate)
 
@@ -62,15 +71,27 @@ class TestBase(unittest.TestCase):
         self.assertIsNone(Base.using_tip)
 
         self.assertEqual(0, Base.concurrency_limit)
+        self.assertFalse(Base.adaptive_concurrency)
+        self.assertEqual(1, Base.min_concurrency)
+        self.assertEqual(16, Base.max_concurrency)
         self.assertEqual(0.0, Base.request_interval)
+        self.assertEqual(0, Base.requests_per_minute)
+        self.assertEqual(0, Base.tokens_per_minute)
         self.assertEqual(3, Base.request_attempt)
         self.assertEqual(10.0, Base.request_timeout)
         self.assertEqual(10, Base.max_error_count)
+        self.assertEqual(20, Base.batch_size)
+        self.assertEqual(8000, Base.batch_characters)
 
     @patch.dict(Base.config, {
         'api_keys': ['a', 'b', 'c'],
         'concurrency_limit': 5,
+        'adaptive_concurrency': True,
+        'min_concurrency': 2,
+        'max_concurrency': 8,
         'request_interval': 10,
+        'requests_per_minute': 60,
+        'tokens_per_minute': 1000,
         'request_attempt': 3,
         'request_timeout': 10,
         'max_error_count': 20})
@@ -91,6 +112,11 @@ class TestBase(unittest.TestCase):
         self.assertEqual('a', translator.api_key)
 
         self.assertEqual(5, translator.concurrency_limit)
+        self.assertTrue(translator.adaptive_concurrency)
+        self.assertEqual(2, translator.min_concurrency)
+        self.assertEqual(8, translator.max_concurrency)
+        self.assertEqual(60, translator.requests_per_minute)
+        self.assertEqual(1000, translator.tokens_per_minute)
         self.assertEqual(10, translator.request_interval)
         self.assertEqual(3, translator.request_attempt)
         self.assertEqual(10, translator.request_timeout)
@@ -201,7 +227,8 @@ class TestBase(unittest.TestCase):
             url='https://example.com/api', data='{"text": "Hello World"}',
             headers={
                 'Authorization': 'Bearer a', 'Content-Type': 'application/json'
-            }, method='POST', timeout=10.0, proxy_uri=None, raw_object=False)
+            }, method='POST', timeout=10.0, proxy_uri=None, raw_object=False,
+            session=self.translator.session)
 
     @patch(module_name + '.base.request')
     def test_translate_with_stream(self, mock_request):
@@ -215,7 +242,8 @@ class TestBase(unittest.TestCase):
             url='https://example.com/api', data='{"text": "Hello World"}',
             headers={
                 'Authorization': 'Bearer a', 'Content-Type': 'application/json'
-            }, method='POST', timeout=10.0, proxy_uri=None, raw_object=True)
+            }, method='POST', timeout=10.0, proxy_uri=None, raw_object=True,
+            session=self.translator.session)
 
     @patch(module_name + '.base.request')
     def test_translate_with_http_error(self, mock_request):
@@ -359,6 +387,53 @@ class TestBase(unittest.TestCase):
                 self.translator.merge_enabled = merge_enabled
                 self.assertEqual(expected, self.translator.allow_raw())
 
+    def test_estimate_tokens(self):
+        self.assertEqual(11, self.translator.estimate_tokens('Hello World'))
+
+    def test_allow_async(self):
+        self.assertTrue(self.translator.allow_async())
+
+        self.translator.set_proxy('socks5', '127.0.0.1', 1080)
+        self.assertFalse(self.translator.allow_async())
+        self.translator.set_proxy('http', '127.0.0.1', 1080)
+        self.assertTrue(self.translator.allow_async())
+
+        self.translator.support_async = False
+        self.assertFalse(self.translator.allow_async())
+
+        class LegacyEngine(MockEngine):
+            def translate(self, content):
+                return content
+
+        self.assertFalse(LegacyEngine().allow_async())
+        # The headers of the engine fetch a token with a blocking request.
+        self.assertFalse(MicrosoftEdgeTranslate().allow_async())
+
+    def test_translate_async(self):
+        mock_session = Mock()
+        mock_session.request = AsyncMock(return_value='{"text": "你好世界"}')
+        with patch.object(
+                MockEngine, 'async_session', PropertyMock(
+                    return_value=mock_session)):
+            self.assertEqual(
+                '{"text": "你好世界"}',
+                asyncio.run(self.translator.translate_async('Hello World')))
+
+        mock_session.request.assert_called_once_with(
+            'https://example.com/api', '{"text": "Hello World"}',
+            {'Authorization': 'Bearer a', 'Content-Type': 'application/json'},
+            'POST', 10, False)
+
+    def test_translate_async_with_error(self):
+        mock_session = Mock()
+        mock_session.request = AsyncMock(side_effect=Exception('any error'))
+        with patch.object(
+                MockEngine, 'async_session', PropertyMock(
+                    return_value=mock_session)):
+            with self.assertRaises(UnexpectedResult) as cm:
+                asyncio.run(self.translator.translate_async('Hello World'))
+        self.assertRegex(str(cm.exception), 'any error')
+
 
 class TestDeepl(unittest.TestCase):
     def setUp(self):
@@ -397,6 +472,208 @@ class TestDeepl(unittest.TestCase):
         with self.assertRaisesRegex(Exception, error):
             self.translator.translate('Hello World!')
 
+    @patch(module_name + '.base.request')
+    def test_translate_batch(self, mock_request):
+        mock_request.return_value = '{"translations":[' \
+            '{"detected_source_language":"EN","text":"你好"},' \
+            '{"detected_source_language":"EN","text":"世界"}]}'
+
+        self.assertEqual(
+            ['你好', '世界'], self.translator.translate_batch(['Hello', 'World']))
+        kwargs = mock_request.call_args.kwargs
+        self.assertEqual(
+            ['Hello', 'World'], json.loads(kwargs['data'])['text'])
+        self.assertEqual(
+            'application/json', kwargs['headers']['Content-Type'])
+
+        mock_request.return_value = '{"translations":[{"text":"你好"}]}'
+        self.assertIsNone(self.translator.translate_batch(['Hello', 'World']))
+
+
+class MockDocumentHandler(BaseHTTPRequestHandler):
+    """A stand-in for the document and text translation APIs of DeepL."""
+    protocol_version = 'HTTP/1.1'
+    documents: dict = {}
+
+    def _send(self, data, content_type='application/json'):
+        content = data.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode('utf-8')
+        if self.path.endswith('/translate'):
+            return self._send(json.dumps({'translations': [
+                {'text': text.upper()} for text in json.loads(body)['text']]}))
+        if self.path.endswith('/document'):
+            document_id = 'doc_%d' % len(self.documents)
+            document = body.split('\r\n\r\n')[-1].rsplit('\r\n', 1)[0]
+            self.documents[document_id] = {
+                'checks': 0, 'content': document.upper().replace(
+                    '<M ID', '<m id').replace('</M>', '</m>')}
+            return self._send(json.dumps({
+                'document_id': document_id, 'document_key': 'key'}))
+        if self.path.endswith('/result'):
+            document = self.documents[self.path.split('/')[-2]]
+            return self._send(document['content'], 'text/html')
+        document = self.documents[self.path.split('/')[-1]]
+        document['checks'] += 1
+        if 'FAIL' in document['content']:
+            status = {'status': 'error', 'error_message': 'Bad document'}
+        elif document['checks'] < 2:
+            status = {'status': 'translating', 'seconds_remaining': 0}
+        else:
+            status = {'status': 'done', 'billed_characters': 10}
+        self._send(json.dumps(status))
+
+    def log_message(self, *args):
+        pass
+
+
+class TestDeeplPro(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(
+            ('127.0.0.1', 0), MockDocumentHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.thread.join()
+
+    @patch('calibre_plugins.ebook_translator.lib.session.get_proxies')
+    def setUp(self, mock_get_proxies):
+        mock_get_proxies.return_value = {}
+        MockDocumentHandler.documents.clear()
+        DeeplProTranslate.set_config(
+            {'api_keys': ['a'], 'document_mode': True})
+        DeeplProTranslate.lang_codes = {
+            'source': {'English': 'EN'}, 'target': {'Chinese': 'ZH'}}
+        self.translator = DeeplProTranslate()
+        self.translator.set_source_lang('English')
+        self.translator.set_target_lang('Chinese')
+        self.translator.endpoint = \
+            'http://127.0.0.1:%s/v2/translate' % self.server.server_port
+        self.translator.document_interval = 0.01
+        # Create the session with the proxies patched.
+        self.translator.session
+
+    def tearDown(self):
+        close_sessions()
+
+    def test_created_engine(self):
+        self.assertTrue(self.translator.batch_by_page)
+        self.assertEqual(10000, self.translator.batch_size)
+        self.assertEqual(1000000, self.translator.batch_characters)
+        self.assertEqual(
+            'http://127.0.0.1:%s/v2/document' % self.server.server_port,
+            self.translator.get_document_endpoint())
+
+    def test_get_document(self):
+        document = self.translator.get_document(
+            ['a < b', 'c<m id=00000 />d\ne'])
+        self.assertIn(
+            '<body><p>a &lt; b</p><p>c<m id="00000"></m>d<br/>e</p></body>',
+            document)
+        self.assertEqual(
+            ['a < b', 'c<m id=00000 />d\ne'],
+            self.translator.get_document_result(
+                document, ['a < b', 'c<m id=00000 />d\ne']))
+        self.assertIsNone(
+            self.translator.get_document_result(document, ['a < b']))
+
+    def test_translate_batch(self):
+        self.assertEqual(
+            ['HELLO', 'WORLD<m id=00000 />!\nFOO'],
+            self.translator.translate_batch(
+                ['Hello', 'World<m id=00000 />!\nFoo']))
+        self.assertEqual(2, MockDocumentHandler.documents['doc_0']['checks'])
+
+    def test_translate_batch_fallback(self):
+        self.assertEqual(
+            ['FAIL', 'WORLD'], self.translator.translate_batch(
+                ['Fail', 'World']))
+        self.assertEqual(1, MockDocumentHandler.documents['doc_0']['checks'])
+
+    @patch(module_name + '.deepl.sleep', return_value=False)
+    def test_translate_batch_canceled(self, mock_sleep):
+        self.translator._translate_texts = Mock()
+
+        with self.assertRaises(RequestCanceled):
+            self.translator.translate_batch(['Hello', 'World'])
+
+        self.assertEqual(1, MockDocumentHandler.documents['doc_0']['checks'])
+        self.translator._translate_texts.assert_not_called()
+
+    @patch(module_name + '.deepl.DeeplTranslate.batch_size', 2)
+    def test_translate_texts(self):
+        self.assertEqual(
+            ['A', 'B', 'C'], self.translator._translate_texts(['a', 'b', 'c']))
+
+    def test_translate_batch_without_document_mode(self):
+        self.translator.document_mode = False
+        self.assertEqual(
+            ['HELLO', 'WORLD'],
+            self.translator.translate_batch(['Hello', 'World']))
+        self.assertEqual({}, MockDocumentHandler.documents)
+
+
+class TestBaidu(unittest.TestCase):
+    def setUp(self):
+        BaiduTranslate.set_config({'api_keys': ['id|key']})
+        BaiduTranslate.lang_codes = {
+            'source': {'English': 'en'}, 'target': {'Chinese': 'zh'}}
+
+        self.translator = BaiduTranslate()
+        self.translator.set_source_lang('English')
+        self.translator.set_target_lang('Chinese')
+
+    @patch(module_name + '.base.request')
+    def test_translate_batch(self, mock_request):
+        mock_request.return_value = json.dumps({'trans_result': [
+            {'src': 'Hello', 'dst': '你好'},
+            {'src': 'World', 'dst': '世界'},
+            {'src': 'Foo', 'dst': '甲'}]})
+
+        self.assertEqual(
+            ['你好', '世界\n\n甲'],
+            self.translator.translate_batch(['Hello', 'World\n\nFoo']))
+        self.assertEqual(
+            'Hello\nWorld\n\nFoo', mock_request.call_args.kwargs['data']['q'])
+
+        self.assertIsNone(self.translator.translate_batch(['Hello', 'World']))
+
+
+class TestGoogleFreeTranslateHtml(unittest.TestCase):
+    def setUp(self):
+        GoogleFreeTranslateHtml.lang_codes = {
+            'source': {'English': 'en'}, 'target': {'Chinese': 'zh-CN'}}
+
+        self.translator = GoogleFreeTranslateHtml()
+        self.translator.set_source_lang('English')
+        self.translator.set_target_lang('Chinese')
+
+    @patch(module_name + '.base.request')
+    def test_translate_batch(self, mock_request):
+        mock_request.return_value = json.dumps(
+            [['你好 &lt;世界&gt;', '我&#39;们'], ['en', 'en']])
+
+        self.assertEqual(
+            ['你好 <世界>', "我'们"],
+            self.translator.translate_batch(['Hello <World>', "We're"]))
+        body = json.loads(mock_request.call_args.kwargs['data'])
+        self.assertEqual(['Hello &lt;World&gt;', "We're"], body[0][0])
+
+        mock_request.return_value = json.dumps([['你好'], ['en']])
+        self.assertIsNone(self.translator.translate_batch(['Hello', 'World']))
+
 
 class TestChatgptTranslate(unittest.TestCase):
     def setUp(self):
@@ -424,6 +701,11 @@ class TestChatgptTranslate(unittest.TestCase):
         self.assertIsInstance(self.translator, Base)
         self.assertIsInstance(self.translator, GenAI)
 
+    def test_estimate_tokens(self):
+        self.translator.prompt = 'Translate to <tlang>.'
+        self.assertEqual(15, self.translator.estimate_tokens('Hello World'))
+        self.assertEqual(16, self.translator.estimate_tokens('你好世界'))
+
     @patch(module_name + '.openai.request')
     def test_get_models(self, mock_request):
         mock_request.return_value = """
@@ -518,7 +800,8 @@ class TestChatgptTranslate(unittest.TestCase):
 
         mock_request.assert_called_with(
             url=url, data=data, headers=headers, method='POST', timeout=60.0,
-            proxy_uri=None, raw_object=True)
+            proxy_uri=None, raw_object=True,
+            session=self.translator.session)
         self.assertIsInstance(result, GeneratorType)
         self.assertEqual('你好世界！', ''.join(result))
 
@@ -531,6 +814,45 @@ class TestChatgptTranslate(unittest.TestCase):
 
         self.assertEqual('你好世界！', result)
 
+    def test_get_batch_body(self):
+        self.assertEqual(
+            self.translator.get_batch_body(['Hello', 'World']),
+            json.dumps({
+                'model': 'gpt-4o',
+                'messages': [
+                    {'role': 'system',
+                     'content': self.prompt + ' ' + GenAI.batch_prompt},
+                    {'role': 'user', 'content': '{"0": "Hello", "1": "World"}'}
+                ],
+                'temperature': 1.0,
+                'response_format': {'type': 'json_object'},
+            }))
+
+    @patch(module_name + '.openai.EbookTranslator')
+    @patch(module_name + '.base.request')
+    def test_translate_batch(self, mock_request, mock_et):
+        mock_et.__version__ = '1.0.0'
+        mock_request.return_value = json.dumps({'choices': [{'message': {
+            'content': '```json\n{"0": "你好", "1": " 世界 "}\n```'}}]})
+        result = self.translator.translate_batch(['Hello', 'World', 'Foo'])
+
+        self.assertEqual(['你好', '世界', None], result)
+        mock_request.assert_called_once_with(
+            url='https://api.openai.com/v1/chat/completions',
+            data=self.translator.get_batch_body(['Hello', 'World', 'Foo']),
+            headers=self.translator.get_headers(), method='POST',
+            timeout=180, proxy_uri=None, raw_object=False,
+            session=self.translator.session)
+
+    def test_parse_batch_result(self):
+        self.assertEqual(
+            ['a', 'b'], self.translator.parse_batch_result(
+                'Sure: {"0": "a", "1": "b"}', 2))
+        self.assertIsNone(self.translator.parse_batch_result('', 2))
+        self.assertIsNone(
+            self.translator.parse_batch_result('{"0": "a", "1": ', 2))
+        self.assertIsNone(self.translator.parse_batch_result('["a"]', 1))
+
 
 class TestChatgptBatchTranslate(unittest.TestCase):
     def setUp(self):
@@ -581,7 +903,11 @@ class TestChatgptBatchTranslate(unittest.TestCase):
     @patch(module_name + '.openai.ChatgptBatchTranslate.supported_models')
     @patch(module_name + '.openai.request')
     def test_upload(self, mock_request, mock_supported_models):
-        mock_request.return_value = """
+        bodies = []
+
+        def upload(url, body, headers, *args, **kwargs):
+            bodies.append(body.read())
+            return """
 {
   "id": "test-file-id",
   "object": "file",
@@ -591,6 +917,7 @@ class TestChatgptBatchTranslate(unittest.TestCase):
   "purpose": "fine-tune"
 }
 """
+        mock_request.side_effect = upload
         model = 'gpt-4o'
         mock_supported_models.return_value = [model]
 
@@ -639,9 +966,13 @@ class TestChatgptBatchTranslate(unittest.TestCase):
             '"content": "some prompt..."}, {"role": "user", '
             '"content": "test content 2"}], "temperature": 1.0}}\r\n'
             '--xxxxxxxxxx--').encode()
+        self.assertEqual([mock_body], bodies)
+        self.assertEqual(
+            str(len(mock_body)), self.mock_headers['Content-Length'])
         mock_request.assert_called_once_with(
-            'https://api.openai.com/v1/files', mock_body, self.mock_headers,
-            'POST', proxy_uri=self.mock_translator.proxy_uri)
+            'https://api.openai.com/v1/files', ANY, self.mock_headers,
+            'POST', proxy_uri=self.mock_translator.proxy_uri,
+            session=self.mock_translator.session)
 
     @patch(module_name + '.openai.request')
     def test_delete(self, mock_request):
@@ -658,7 +989,8 @@ class TestChatgptBatchTranslate(unittest.TestCase):
         mock_request.assert_called_once_with(
             'https://api.openai.com/v1/files/test-file-id',
             headers=headers, method='DELETE',
-            proxy_uri=self.mock_translator.proxy_uri)
+            proxy_uri=self.mock_translator.proxy_uri,
+            session=self.mock_translator.session)
 
     @patch(module_name + '.openai.request')
     def test_retrieve(self, mock_request):
@@ -668,7 +1000,8 @@ class TestChatgptBatchTranslate(unittest.TestCase):
         line_2 = (
             b'{"custom_id":"def","response":{"status_code":200,"body":{'
             b'"choices": [{"message": {"content": "B"}}]}}}')
-        mock_request.return_value.read.return_value = line_1 + b'\n' + line_2
+        mock_request.return_value.readline.side_effect = [
+            line_1 + b'\n', line_2, b'']
         self.mock_translator.get_headers.return_value = {
             'Content-Type': 'application/json',
             'Authorization': 'Bearer abc',
@@ -684,8 +1017,9 @@ class TestChatgptBatchTranslate(unittest.TestCase):
         mock_request.assert_called_once_with(
             'https://api.openai.com/v1/files/test-batch-id/content',
             headers=headers, raw_object=True,
-            proxy_uri=self.mock_translator.proxy_uri)
-        mock_request().read.assert_called_once()
+            proxy_uri=self.mock_translator.proxy_uri,
+            session=self.mock_translator.session)
+        mock_request().read.assert_not_called()
 
     @patch(module_name + '.openai.request')
     def test_create(self, mock_request):
@@ -729,7 +1063,8 @@ class TestChatgptBatchTranslate(unittest.TestCase):
         mock_request.assert_called_once_with(
             'https://api.openai.com/v1/batches',
             body, self.mock_headers, 'POST',
-            proxy_uri=self.mock_translator.proxy_uri)
+            proxy_uri=self.mock_translator.proxy_uri,
+            session=self.mock_translator.session)
 
     @patch(module_name + '.openai.request')
     def test_check(self, mock_request):
@@ -769,7 +1104,8 @@ class TestChatgptBatchTranslate(unittest.TestCase):
         mock_request.assert_called_once_with(
             'https://api.openai.com/v1/batches/test-batch-id',
             headers=self.mock_headers,
-            proxy_uri=self.mock_translator.proxy_uri)
+            proxy_uri=self.mock_translator.proxy_uri,
+            session=self.mock_translator.session)
 
     @patch(module_name + '.openai.request')
     def test_cancel(self, mock_request):
@@ -809,7 +1145,154 @@ class TestChatgptBatchTranslate(unittest.TestCase):
         mock_request.assert_called_once_with(
             'https://api.openai.com/v1/batches/test-batch-id/cancel',
             headers=self.mock_headers, method='POST',
-            proxy_uri=self.mock_translator.proxy_uri)
+            proxy_uri=self.mock_translator.proxy_uri,
+            session=self.mock_translator.session)
+
+
+    def test_chunk(self):
+        self.mock_translator.get_body.side_effect = lambda text: json.dumps(
+            {'messages': [{'role': 'user', 'content': text}]})
+        paragraphs = [
+            Mock(Paragraph, md5='md5_%s' % i, original='text %s' % i)
+            for i in range(5)]
+        self.batch_translator.max_requests = 2
+        files = [
+            file.read() for file in self.batch_translator.chunk(paragraphs)]
+        self.assertEqual(
+            [['md5_0', 'md5_1'], ['md5_2', 'md5_3'], ['md5_4']],
+            [[json.loads(line)['custom_id'] for line in content.split(b'\n')]
+             for content in files])
+
+        self.batch_translator.max_requests = 50000
+        self.batch_translator.max_bytes = len(files[0]) + 2
+        self.assertEqual(
+            3, len(list(self.batch_translator.chunk(paragraphs))))
+
+    @patch(module_name + '.openai.ChatgptBatchTranslate.supported_models')
+    @patch(module_name + '.openai.request')
+    def test_upload_multiple_files(self, mock_request, mock_supported_models):
+        mock_supported_models.return_value = ['gpt-4o']
+        self.mock_translator.model = 'gpt-4o'
+        self.mock_translator.get_body.side_effect = lambda text: json.dumps(
+            {'messages': [{'role': 'user', 'content': text}]})
+
+        def upload(url, body, *args, **kwargs):
+            return json.dumps(
+                {'id': 'file-%s' % body.read().count(b'custom_id')})
+        mock_request.side_effect = upload
+        paragraphs = [
+            Mock(Paragraph, md5='md5_%s' % i, original='text %s' % i)
+            for i in range(5)]
+        self.batch_translator.max_requests = 2
+        self.batch_translator.upload_concurrency = 2
+
+        self.assertEqual(
+            'file-2,file-2,file-1', self.batch_translator.upload(paragraphs))
+        self.assertEqual(3, mock_request.call_count)
+
+    @patch(module_name + '.openai.ChatgptBatchTranslate.delete')
+    @patch(module_name + '.openai.ChatgptBatchTranslate.supported_models')
+    @patch(module_name + '.openai.request')
+    def test_upload_failed(
+            self, mock_request, mock_supported_models, mock_delete):
+        mock_supported_models.return_value = ['gpt-4o']
+        self.mock_translator.model = 'gpt-4o'
+        self.mock_translator.get_body.side_effect = lambda text: json.dumps(
+            {'messages': [{'role': 'user', 'content': text}]})
+        mock_request.side_effect = [
+            json.dumps({'id': 'file-a'}), Exception('any error')]
+        paragraphs = [
+            Mock(Paragraph, md5='md5_%s' % i, original='text %s' % i)
+            for i in range(4)]
+        self.batch_translator.max_requests = 2
+        self.batch_translator.upload_concurrency = 1
+
+        with self.assertRaises(Exception):
+            self.batch_translator.upload(paragraphs)
+        mock_delete.assert_called_once_with('file-a')
+
+    def test_multipart_file(self):
+        body = MultipartFile('xx', io.BytesIO(b'{"a": 1}'))
+        data = body.read()
+        self.assertEqual(len(data), len(body))
+        self.assertTrue(data.startswith(b'--xx\r\n'))
+        self.assertTrue(data.endswith(b'\r\n{"a": 1}\r\n--xx--'))
+
+        body.seek(0)
+        blocks = iter(lambda: body.read(5), b'')
+        self.assertEqual(data, b''.join(blocks))
+
+    @patch(module_name + '.openai.ChatgptBatchTranslate.cancel')
+    @patch(module_name + '.openai.request')
+    def test_create_failed(self, mock_request, mock_cancel):
+        mock_request.side_effect = [
+            json.dumps({'id': 'batch-a'}), Exception('any error')]
+
+        with self.assertRaises(Exception):
+            self.batch_translator.create('file-a,file-b')
+        mock_cancel.assert_called_once_with('batch-a')
+
+    @patch(module_name + '.openai.request')
+    def test_create_multiple_batches(self, mock_request):
+        mock_request.side_effect = [
+            json.dumps({'id': 'batch-a'}), json.dumps({'id': 'batch-b'})]
+
+        self.assertEqual(
+            'batch-a,batch-b', self.batch_translator.create('file-a,file-b'))
+        self.assertEqual(
+            '{"input_file_id": "file-b", "endpoint": "/v1/chat/completions", '
+            '"completion_window": "24h"}', mock_request.call_args.args[1])
+
+    @patch(module_name + '.openai.request')
+    def test_check_multiple_batches(self, mock_request):
+        mock_request.side_effect = [
+            json.dumps({
+                'status': 'completed', 'errors': None,
+                'output_file_id': 'file-x',
+                'request_counts': {'total': 2, 'completed': 2, 'failed': 0}}),
+            json.dumps({
+                'status': 'in_progress', 'errors': None,
+                'output_file_id': None,
+                'request_counts': {'total': 3, 'completed': 1, 'failed': 1}}),
+        ]
+        details = self.batch_translator.check('batch-a,batch-b')
+
+        self.assertEqual('in_progress', details['status'])
+        self.assertEqual(
+            {'total': 5, 'completed': 3, 'failed': 1},
+            details['request_counts'])
+        self.assertEqual('file-x', details['output_file_id'])
+        self.assertIsNone(details['errors'])
+        self.assertEqual(2, len(details['batches']))
+
+    @patch(module_name + '.openai.request')
+    def test_retrieve_multiple_files(self, mock_request):
+        template = (
+            '{"custom_id":"%s","response":{"status_code":%s,"body":{'
+            '"choices": [{"message": {"content": "%s"}}]}}}\n')
+        mock_request.return_value.readline.side_effect = [
+            (template % ('abc', 200, 'A')).encode(), b'',
+            (template % ('def', 500, 'B')).encode(),
+            (template % ('ghi', 200, 'C')).encode(), b'']
+
+        self.assertEqual(
+            {'abc': 'A', 'ghi': 'C'},
+            self.batch_translator.retrieve('file-x,file-y'))
+        self.assertEqual(
+            'https://api.openai.com/v1/files/file-y/content',
+            mock_request.call_args.args[0])
+
+    @patch(module_name + '.openai.request')
+    def test_cancel_multiple_batches(self, mock_request):
+        mock_request.side_effect = [
+            json.dumps({'status': 'completed'}),
+            json.dumps({'status': 'in_progress'}),
+            json.dumps({'status': 'cancelling'})]
+
+        self.assertTrue(self.batch_translator.cancel('batch-a,batch-b'))
+        self.assertEqual(
+            'https://api.openai.com/v1/batches/batch-b/cancel',
+            mock_request.call_args.args[0])
 
 
 class TestAzureChatgptTranslate(unittest.TestCase):
@@ -866,7 +1349,8 @@ class TestAzureChatgptTranslate(unittest.TestCase):
 
         mock_request.assert_called_with(
             url=url, data=data, headers=headers, method='POST', timeout=60.0,
-            proxy_uri=None, raw_object=True)
+            proxy_uri=None, raw_object=True,
+            session=self.translator.session)
         self.assertIsInstance(result, GeneratorType)
         self.assertEqual('你好世界！', ''.join(result))
 
@@ -945,7 +1429,8 @@ class TestClaudeTranslate(unittest.TestCase):
 
         mock_request.assert_called_with(
             url=url, data=data, headers=headers, method='POST', timeout=30.0,
-            proxy_uri=None, raw_object=False)
+            proxy_uri=None, raw_object=False,
+            session=self.translator.session)
         self.assertEqual('你好世界！', result)
 
     @patch(module_name + '.anthropic.EbookTranslator')
@@ -1021,11 +1506,184 @@ data: {"type":"message_stop"}
 
         mock_request.assert_called_with(
             url=url, data=data, headers=headers, method='POST', timeout=30.0,
-            proxy_uri=None, raw_object=True)
+            proxy_uri=None, raw_object=True,
+            session=self.translator.session)
         self.assertIsInstance(result, GeneratorType)
         self.assertEqual('你好世界！', ''.join(result))
 
 
+    def test_get_batch_body(self):
+        self.translator.model = 'claude-3-5-sonnet-20241022'
+        body = json.loads(self.translator.get_batch_body(['Hello']))
+
+        self.assertFalse(body['stream'])
+        self.assertTrue(body['system'].endswith(' ' + GenAI.batch_prompt))
+        self.assertEqual(
+            [{'role': 'user', 'content': '{"0": "Hello"}'}], body['messages'])
+
+    @patch(module_name + '.anthropic.EbookTranslator')
+    @patch(module_name + '.base.request')
+    def test_translate_batch(self, mock_request, mock_et):
+        mock_et.__version__ = '1.0.0'
+        mock_request.return_value = json.dumps(
+            {'content': [{'text': '{"0": "你好", "1": "世界"}'}]})
+
+        self.assertEqual(
+            ['你好', '世界'],
+            self.translator.translate_batch(['Hello', 'World']))
+
+
+class MockMessageBatchesHandler(BaseHTTPRequestHandler):
+    """A stand-in for the message batches API."""
+    protocol_version = 'HTTP/1.1'
+    batches: dict = {}
+
+    def _send(self, data, content_type='application/json'):
+        content = data.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode('utf-8')
+        if self.path.endswith('/cancel'):
+            batch = self.batches[self.path.split('/')[-2]]
+            batch['processing_status'] = 'canceling'
+            return self._send(json.dumps(batch))
+        batch_id = 'msgbatch_%d' % len(self.batches)
+        self.batches[batch_id] = {
+            'id': batch_id,
+            'type': 'message_batch',
+            'processing_status': 'ended',
+            'request_counts': {
+                'processing': 0, 'succeeded': 0, 'errored': 0,
+                'canceled': 0, 'expired': 0},
+            'requests': json.loads(body)['requests']}
+        for item in self.batches[batch_id]['requests']:
+            self.batches[batch_id]['request_counts']['succeeded'] += 1
+        self._send(json.dumps(self.batches[batch_id]))
+
+    def do_GET(self):
+        if self.path.endswith('/results'):
+            batch = self.batches[self.path.split('/')[-2]]
+            lines = []
+            for item in batch['requests']:
+                text = item['params']['messages'][0]['content'].upper()
+                lines.append(json.dumps({
+                    'custom_id': item['custom_id'],
+                    'result': {'type': 'succeeded', 'message': {
+                        'content': [{'type': 'text', 'text': text}]}}}))
+            return self._send('\n'.join(lines), 'application/x-jsonl')
+        self._send(json.dumps(self.batches[self.path.split('/')[-1]]))
+
+    def do_DELETE(self):
+        batch_id = self.path.split('/')[-1]
+        del self.batches[batch_id]
+        self._send(json.dumps(
+            {'id': batch_id, 'type': 'message_batch_deleted'}))
+
+    def log_message(self, *args):
+        pass
+
+
+class TestClaudeBatchTranslate(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(
+            ('127.0.0.1', 0), MockMessageBatchesHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.thread.join()
+
+    @patch('calibre_plugins.ebook_translator.lib.session.get_proxies')
+    @patch(module_name + '.anthropic.EbookTranslator')
+    def setUp(self, mock_et, mock_get_proxies):
+        mock_et.__version__ = '1.0.0'
+        mock_get_proxies.return_value = {}
+        MockMessageBatchesHandler.batches.clear()
+        ClaudeTranslate.set_config({'api_keys': ['a']})
+        ClaudeTranslate.lang_codes = {
+            'source': {'English': 'EN'}, 'target': {'Chinese': 'ZH'}}
+        self.translator = ClaudeTranslate()
+        self.translator.set_source_lang('English')
+        self.translator.set_target_lang('Chinese')
+        self.translator.endpoint = \
+            'http://127.0.0.1:%s/v1/messages' % self.server.server_port
+        self.translator.get_headers = Mock(
+            return_value={'Content-Type': 'application/json'})
+        # Create the session with the proxies patched.
+        self.translator.session
+        self.batch_translator = ClaudeBatchTranslate(self.translator)
+        self.paragraphs = [
+            Mock(Paragraph, md5='md5_%s' % i, original='text %s' % i)
+            for i in range(5)]
+
+    def tearDown(self):
+        close_sessions()
+
+    def test_created_translator(self):
+        self.assertFalse(self.translator.stream)
+        self.assertFalse(self.batch_translator.upload_file)
+        self.assertEqual(
+            'http://127.0.0.1:%s/v1/messages/batches'
+            % self.server.server_port, self.batch_translator.batch_endpoint)
+
+    def test_chunk(self):
+        self.batch_translator.max_requests = 2
+        bodies = self.batch_translator.chunk(self.paragraphs)
+        self.assertEqual(
+            [['md5_0', 'md5_1'], ['md5_2', 'md5_3'], ['md5_4']],
+            [[item['custom_id'] for item in json.loads(body)['requests']]
+             for body in bodies])
+        params = json.loads(bodies[0])['requests'][0]['params']
+        self.assertNotIn('stream', params)
+        self.assertEqual(
+            [{'role': 'user', 'content': 'text 0'}], params['messages'])
+
+        self.batch_translator.max_requests = 100
+        self.batch_translator.max_bytes = len(bodies[0]) // 2
+        self.assertEqual(
+            5, len(self.batch_translator.chunk(self.paragraphs)))
+
+    def test_create_check_and_retrieve(self):
+        self.batch_translator.max_requests = 3
+        batch_id = self.batch_translator.create(self.paragraphs)
+        self.assertEqual('msgbatch_0,msgbatch_1', batch_id)
+
+        details = self.batch_translator.check(batch_id)
+        self.assertEqual('completed', details['status'])
+        self.assertEqual(batch_id, details['output_file_id'])
+        self.assertEqual(5, details['request_counts']['succeeded'])
+        self.assertIsNone(details['errors'])
+
+        self.assertEqual(
+            {'md5_%s' % i: 'TEXT %s' % i for i in range(5)},
+            self.batch_translator.retrieve(details['output_file_id']))
+
+        self.assertTrue(self.batch_translator.delete(batch_id))
+        self.assertEqual({}, MockMessageBatchesHandler.batches)
+
+    def test_cancel(self):
+        batch_id = self.batch_translator.create(self.paragraphs)
+        MockMessageBatchesHandler.batches['msgbatch_0'].update(
+            processing_status='in_progress')
+        self.assertEqual(
+            'in_progress', self.batch_translator.check(batch_id)['status'])
+
+        self.assertTrue(self.batch_translator.cancel(batch_id))
+        details = self.batch_translator.check(batch_id)
+        self.assertEqual('cancelling', details['status'])
+        self.assertIsNone(details['output_file_id'])
+
+
 class TestFunction(unittest.TestCase):
     def test_create_engine_template(self):
         expect = """{
@@ -1157,7 +1815,8 @@ class TestCustom(unittest.TestCase):
             url='https://example.api', data=b'{"source": "en", "target": "zh",'
             b' "text": "Hello \\"World\\""}',
             headers={'Content-Type': 'application/json'}, method='POST',
-            timeout=10.0, proxy_uri=None, raw_object=False)
+            timeout=10.0, proxy_uri=None, raw_object=False,
+            session=translator.session)
         # XML response
         translator.response = 'response.text'
         mock_request.return_value = '<test>你好世界</test>'
@@ -0,0 +1,114 @@
+import unittest
+from unittest.mock import patch, Mock
+
+from ...lib.failover import CircuitBreaker, Failover
+
+
+module_name = 'calibre_plugins.ebook_translator.lib.failover'
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker(3, 10.0, 30.0)
+
+    def test_open_after_consecutive_failures(self):
+        self.assertFalse(self.breaker.fail(0))
+        self.assertFalse(self.breaker.fail(0))
+        self.breaker.succeed()
+        self.assertFalse(self.breaker.fail(0))
+        self.assertFalse(self.breaker.fail(0))
+        self.assertTrue(self.breaker.fail(1))
+
+        self.assertEqual(CircuitBreaker.OPEN, self.breaker.state)
+        self.assertFalse(self.breaker.allow(5))
+        self.assertFalse(self.breaker.is_available(10.9))
+        self.assertFalse(self.breaker.fail(2))
+
+    def test_half_open_probe(self):
+        self.breaker.trip(0)
+        self.assertTrue(self.breaker.is_available(10))
+        self.assertTrue(self.breaker.allow(10))
+        self.assertEqual(CircuitBreaker.HALF_OPEN, self.breaker.state)
+        self.assertFalse(self.breaker.is_available(10))
+        self.assertFalse(self.breaker.allow(10))
+
+        self.assertTrue(self.breaker.succeed())
+        self.assertEqual(CircuitBreaker.CLOSED, self.breaker.state)
+        self.assertTrue(self.breaker.allow(10))
+
+    def test_failed_probe_backs_off(self):
+        self.breaker.trip(0)
+        self.breaker.allow(10)
+        self.assertTrue(self.breaker.fail(10))
+        self.assertEqual(20, self.breaker.cooldown)
+        self.assertFalse(self.breaker.allow(29))
+        self.assertTrue(self.breaker.allow(30))
+        self.breaker.fail(30)
+        self.assertEqual(30, self.breaker.cooldown)
+
+        self.breaker.allow(60)
+        self.breaker.succeed()
+        self.assertEqual(10, self.breaker.cooldown)
+
+
+@patch(module_name + '.create_limits', return_value=(None, None))
+class TestFailover(unittest.TestCase):
+    def setUp(self):
+        self.primary = Mock()
+        self.primary.name = 'A'
+        self.primary.match_error.return_value = False
+        self.fallback = Mock()
+        self.fallback.name = 'B'
+        self.fallback.match_error.return_value = False
+        self.log = Mock()
+
+    def test_select(self, mock_create_limits):
+        failover = Failover([self.primary, self.fallback], 2, log=self.log)
+        primary, fallback = failover.routes
+        mock_create_limits.assert_called_once_with(
+            self.fallback, self.fallback.concurrency_limit)
+
+        self.assertIs(primary, failover.select())
+        self.assertIs(fallback, failover.select(1))
+        self.assertIs(fallback, failover.peek(1))
+
+        failover.release(primary, Exception('error'))
+        self.assertIs(primary, failover.select())
+        failover.release(primary, Exception('error'))
+        self.assertIs(fallback, failover.select())
+        self.assertIs(fallback, failover.peek())
+        self.assertTrue(failover.available(primary))
+        self.log.assert_called_once()
+
+        failover.release(fallback)
+        self.assertEqual(CircuitBreaker.CLOSED, fallback.breaker.state)
+
+    def test_select_all_open(self, mock_create_limits):
+        failover = Failover([self.primary, self.fallback], 1)
+        primary, fallback = failover.routes
+        failover.release(primary, Exception('error'))
+        failover.release(fallback, Exception('error'))
+
+        self.assertFalse(failover.available())
+        self.assertIs(primary, failover.select(1))
+
+    def test_release_rejected(self, mock_create_limits):
+        self.primary.match_error.return_value = True
+        failover = Failover([self.primary, self.fallback], 5)
+        primary, fallback = failover.routes
+
+        failover.release(primary, Exception('401'))
+        self.assertEqual(CircuitBreaker.OPEN, primary.breaker.state)
+        self.assertFalse(failover.available(fallback))
+
+    def test_recover(self, mock_create_limits):
+        failover = Failover(
+            [self.primary, self.fallback], 1, 0.0, log=self.log)
+        primary, fallback = failover.routes
+        failover.release(primary, Exception('error'))
+
+        self.assertIs(primary, failover.select())
+        self.assertIs(fallback, failover.select())
+        failover.release(primary)
+        self.assertIs(primary, failover.select())
+        self.log.assert_called_with('The engine A has recovered.')
@@ -0,0 +1,298 @@
+import time
+import asyncio
+import unittest
+from unittest.mock import patch, Mock, call
+
+from ...lib.handler import (
+    is_overloaded, is_rate_limited, get_retry_after, get_retry_delay,
+    ConcurrencyController, Hedging, Handler)
+from ...lib.cancel import sleep, current_scope
+from ...lib.exception import (
+    HttpError, UnexpectedResult, TranslationRetry, TranslationCanceled)
+
+
+module_name = 'calibre_plugins.ebook_translator.lib.handler'
+
+
+def http_error(status, headers={}):
+    return HttpError('https://example.com', status, 'Any reason', headers, '')
+
+
+class TestFunction(unittest.TestCase):
+    def test_is_overloaded(self):
+        self.assertTrue(is_overloaded(TimeoutError()))
+        self.assertTrue(is_overloaded(http_error(429)))
+        self.assertTrue(is_overloaded(http_error(503)))
+        self.assertFalse(is_overloaded(http_error(401)))
+        self.assertFalse(is_overloaded(Exception('any error')))
+
+        try:
+            try:
+                raise http_error(429)
+            except Exception:
+                raise UnexpectedResult('any result')
+        except Exception as e:
+            self.assertTrue(is_overloaded(e))
+
+    def test_get_retry_after(self):
+        self.assertIsNone(get_retry_after(Exception('any error')))
+        self.assertIsNone(get_retry_after(http_error(429)))
+        self.assertEqual(
+            3.0, get_retry_after(http_error(429, {'Retry-After': '3'})))
+        self.assertEqual(
+            1.5, get_retry_after(http_error(429, {'retry-after-ms': '1500'})))
+        self.assertEqual(90.0, get_retry_after(http_error(429, {
+            'x-ratelimit-reset-requests': '1m30s',
+            'x-ratelimit-reset-tokens': '250ms'})))
+        self.assertEqual(0.0, get_retry_after(http_error(429, {
+            'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'})))
+        self.assertEqual(0.0, get_retry_after(http_error(429, {
+            'anthropic-ratelimit-requests-reset': '2015-10-21T07:28:00Z'})))
+
+        try:
+            try:
+                raise http_error(429, {'Retry-After': '7'})
+            except Exception:
+                raise UnexpectedResult('any result')
+        except Exception as e:
+            self.assertEqual(7.0, get_retry_after(e))
+
+    @patch(module_name + '.random.uniform')
+    def test_get_retry_delay(self, mock_uniform):
+        mock_uniform.side_effect = lambda a, b: b
+        self.assertEqual(4.0, get_retry_delay(Exception(), 1))
+        self.assertEqual(16.0, get_retry_delay(Exception(), 3))
+        self.assertEqual(120.0, get_retry_delay(Exception(), 10))
+        self.assertEqual(
+            4.0, get_retry_delay(http_error(429, {'Retry-After': '3'}), 1))
+        mock_uniform.assert_called_with(0, 1)
+
+
+    def test_is_rate_limited(self):
+        self.assertTrue(is_rate_limited(http_error(429)))
+        self.assertFalse(is_rate_limited(http_error(503)))
+        self.assertFalse(is_rate_limited(TimeoutError()))
+
+        try:
+            try:
+                raise http_error(429)
+            except Exception:
+                raise UnexpectedResult('any result')
+        except UnexpectedResult as e:
+            self.assertTrue(is_rate_limited(e))
+
+
+class TestConcurrencyController(unittest.TestCase):
+    def setUp(self):
+        self.log = Mock()
+        self.controller = ConcurrencyController(2, 1, 4, self.log)
+
+    def test_created_controller(self):
+        self.assertEqual(2, self.controller.current)
+        self.assertEqual(1, self.controller.minimum)
+        self.assertEqual(4, self.controller.maximum)
+
+        controller = ConcurrencyController(0, 2, 0)
+        self.assertEqual(2, controller.current)
+        self.assertEqual(2, controller.maximum)
+
+    def test_record_success(self):
+        for _ in range(4):
+            self.controller.record_success(1.0)
+        self.assertEqual(3, self.controller.current)
+        self.log.assert_called_once_with('Concurrency limit: 2 -> 3')
+
+        for _ in range(20):
+            self.controller.record_success(1.0)
+        self.assertEqual(4, self.controller.current)
+
+    def test_record_success_with_slow_latency(self):
+        self.controller.record_success(1.0)
+        limit = self.controller.limit
+        self.controller.record_success(5.0)
+        self.assertEqual(limit, self.controller.limit)
+
+    @patch(module_name + '.time')
+    def test_record_failure(self, mock_time):
+        mock_time.monotonic.return_value = 10.0
+        self.controller.limit = 4.0
+        error = http_error(429)
+
+        self.controller.record_failure(5.0, error)
+        self.assertEqual(2, self.controller.current)
+        # Requests sent before the decrease do not decrease it again.
+        self.controller.record_failure(9.0, error)
+        self.assertEqual(2, self.controller.current)
+        self.controller.record_failure(11.0, error)
+        self.assertEqual(1, self.controller.current)
+        self.controller.record_failure(12.0, error)
+        self.assertEqual(1, self.controller.current)
+
+        self.controller.record_failure(13.0, Exception('any error'))
+        self.assertEqual(1, self.controller.current)
+
+    def test_measure(self):
+        with self.controller.measure():
+            pass
+        self.assertIsNotNone(self.controller.latency)
+
+        with self.assertRaises(TimeoutError):
+            with self.controller.measure():
+                raise TimeoutError()
+        self.assertEqual(1, self.controller.current)
+
+
+class TestHedging(unittest.TestCase):
+    def setUp(self):
+        self.hedging = Hedging(90, 10)
+
+    def test_threshold(self):
+        for latency in range(1, Hedging.min_samples):
+            self.hedging.record(float(latency))
+        self.assertIsNone(self.hedging.threshold())
+        self.hedging.record(20.0)
+        self.assertEqual(18.0, self.hedging.threshold())
+
+        self.hedging.latencies.clear()
+        for _ in range(Hedging.min_samples):
+            self.hedging.record(0.1)
+        self.assertEqual(Hedging.min_delay, self.hedging.threshold())
+
+    def test_budget(self):
+        self.assertFalse(self.hedging.acquire())
+        for _ in range(20):
+            self.hedging.start()
+        self.assertTrue(self.hedging.acquire())
+        self.assertTrue(self.hedging.acquire())
+        self.assertFalse(self.hedging.acquire())
+        self.hedging.start()
+        self.assertFalse(self.hedging.acquire())
+        self.assertEqual(2, self.hedging.hedges)
+
+
+class TestHandler(unittest.TestCase):
+    def test_handle_cancel_aborts_requests(self):
+        processed = []
+
+        async def translate_paragraph_async(paragraph):
+            if paragraph.id != 0:
+                await asyncio.sleep(10)
+
+        def process_translation(paragraph):
+            processed.append(paragraph.id)
+
+        paragraphs = [Mock(id=id) for id in range(8)]
+        handler = Handler(
+            paragraphs, 8, None, process_translation,
+            translate_paragraph_async,
+            cancel_request=lambda: bool(processed))
+
+        started = time.monotonic()
+        asyncio.run(handler.process_tasks())
+
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual([0], processed)
+        self.assertTrue(handler.scope.canceled)
+
+    def test_handle_cancel_interrupts_threads(self):
+        interrupted = []
+
+        def translate_paragraph(paragraph):
+            if paragraph == 0:
+                raise TranslationCanceled()
+            interrupted.append(not sleep(10))
+
+        handler = Handler(
+            list(range(4)), 4, translate_paragraph, Mock())
+
+        started = time.monotonic()
+        asyncio.run(handler.process_tasks())
+
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual([True] * 3, interrupted)
+        self.assertIsNone(current_scope.get())
+
+    def test_handle_with_concurrency_controller(self):
+        running = []
+        peak = []
+
+        async def translate_paragraph_async(paragraph):
+            running.append(paragraph)
+            peak.append(len(running))
+            await asyncio.sleep(0.01)
+            running.remove(paragraph)
+
+        paragraphs = [Mock(is_cache=False) for _ in range(6)]
+        controller = ConcurrencyController(2, 1, 4)
+        process_translation = Mock()
+        handler = Handler(
+            paragraphs, 2, None, process_translation,
+            translate_paragraph_async, controller)
+        self.assertEqual(4, handler.concurrency_limit)
+
+        asyncio.run(handler.process_tasks())
+
+        self.assertEqual(2, max(peak))
+        self.assertEqual(6, process_translation.call_count)
+        self.assertEqual(0, controller.active)
+
+    def test_handle_with_priority(self):
+        translated = []
+
+        async def translate_paragraph_async(paragraph):
+            translated.append(paragraph.original)
+            if paragraph.original == 'bbb':
+                handler.reprioritize(
+                    lambda paragraph: paragraph.original != 'a')
+                await asyncio.sleep(0)
+
+        paragraphs = [Mock(original=text) for text in ('a', 'bbb', 'cc', 'd')]
+        handler = Handler(
+            paragraphs, 1, None, Mock(), translate_paragraph_async,
+            priority=lambda paragraph: -len(paragraph.original))
+
+        asyncio.run(handler.process_tasks())
+
+        self.assertEqual(['bbb', 'a', 'cc', 'd'], translated)
+        self.assertIsNone(handler.loop)
+
+    def test_handle_with_retry(self):
+        attempts = []
+
+        async def translate_paragraph_async(paragraph):
+            attempts.append(paragraph.retry)
+            if paragraph.retry < 2:
+                raise TranslationRetry('any error', 0.01)
+
+        paragraph = Mock(is_cache=False, retry=0)
+        process_translation = Mock()
+        handler = Handler(
+            [paragraph], 1, None, process_translation,
+            translate_paragraph_async)
+
+        asyncio.run(handler.process_tasks())
+
+        self.assertEqual([0, 1, 2], attempts)
+        self.assertIsNone(paragraph.error)
+        process_translation.assert_called_once_with(paragraph)
+        self.assertEqual(set(), handler.pending_retries)
+
+    def test_handle_with_retry_items(self):
+        translated = []
+
+        async def translate_paragraph_async(item):
+            if isinstance(item, list):
+                raise TranslationRetry('any error', 0, item)
+            translated.append(item)
+
+        paragraphs = [Mock(retry=0), Mock(retry=0)]
+        process_translation = Mock()
+        handler = Handler(
+            [paragraphs], 1, None, process_translation,
+            translate_paragraph_async)
+
+        asyncio.run(handler.process_tasks())
+
+        self.assertEqual(paragraphs, translated)
+        process_translation.assert_has_calls(
+            [call(paragraphs[0]), call(paragraphs[1])])
@@ -0,0 +1,115 @@
+import time
+import unittest
+from unittest.mock import patch
+
+from mechanize import HTTPError
+
+from ...lib.keys import ApiKeyPool, is_shared
+from ...lib.exception import UnexpectedResult
+from ...engines.deepl import DeeplTranslate
+
+
+module_name = 'calibre_plugins.ebook_translator.lib.keys'
+
+
+class TestFunction(unittest.TestCase):
+    @patch(module_name + '.get_config')
+    @patch(module_name + '.is_locking_available')
+    def test_is_shared(self, mock_is_locking_available, mock_get_config):
+        config = {'translating_jobs': 0, 'warm_workers': 0}
+        mock_get_config.return_value.get.side_effect = config.get
+        mock_is_locking_available.return_value = True
+        # Without a cap, every ebook is a job translating at the same time.
+        self.assertTrue(is_shared())
+        config['translating_jobs'] = 1
+        self.assertFalse(is_shared())
+        config['translating_jobs'] = 2
+        self.assertTrue(is_shared())
+        config.update(translating_jobs=0, warm_workers=2)
+        self.assertTrue(is_shared())
+        config['warm_workers'] = 1
+        self.assertFalse(is_shared())
+
+        mock_is_locking_available.return_value = False
+        self.assertFalse(is_shared())
+
+
+@patch(module_name + '.is_locking_available', return_value=False)
+class TestApiKeyPool(unittest.TestCase):
+    def setUp(self):
+        self.translator = DeeplTranslate()
+        self.translator.api_key = 'a'
+        self.translator.api_keys = ['b', 'a', 'c']
+        self.translator.requests_per_minute = 60
+
+    def test_create(self, mock_is_locking_available):
+        pool = ApiKeyPool(self.translator)
+
+        self.assertEqual(3, len(pool))
+        self.assertEqual(
+            ['a', 'b', 'c'], [key.translator.api_key for key in pool.keys])
+        for key in pool.keys:
+            self.assertIsNot(self.translator, key.translator)
+            self.assertEqual([], key.translator.api_keys)
+            self.assertIsNotNone(key.rate_limiter)
+        self.assertEqual('a', self.translator.api_key)
+        self.assertEqual(['b', 'a', 'c'], self.translator.api_keys)
+
+    def test_select(self, mock_is_locking_available):
+        pool = ApiKeyPool(self.translator)
+        a, b, c = pool.keys
+
+        self.assertEqual([a, b, c], [pool.select() for _ in range(3)])
+        pool.release(b)
+        self.assertIs(b, pool.select())
+        pool.release(a)
+        pool.release(c)
+        self.assertIs(c, pool.select())
+        self.assertIs(a, pool.select())
+
+    def test_release_rate_limited(self, mock_is_locking_available):
+        pool = ApiKeyPool(self.translator)
+        a, b, c = pool.keys
+        error = HTTPError(
+            'https://example.com', 429, 'Too Many Requests',
+            {'Retry-After': '30'}, None)
+        key = pool.select()
+
+        try:
+            raise UnexpectedResult('error') from error
+        except UnexpectedResult as e:
+            self.assertTrue(pool.release(key, e))
+        self.assertEqual(1, a.failures)
+        self.assertGreaterEqual(a.quarantined_until, time.monotonic() + 29)
+        self.assertEqual(
+            [b, c, b, c], [pool.select() for _ in range(4)])
+        self.assertTrue(pool.available())
+
+    def test_release_rejected(self, mock_is_locking_available):
+        pool = ApiKeyPool(self.translator)
+        keys = [pool.select() for _ in range(3)]
+
+        for key in keys:
+            self.assertTrue(pool.release(key, Exception('403 Forbidden')))
+        self.assertFalse(pool.available())
+        self.assertIs(keys[0], pool.select())
+
+    def test_release_other_error(self, mock_is_locking_available):
+        pool = ApiKeyPool(self.translator)
+        key = pool.select()
+
+        self.assertFalse(pool.release(key, Exception('500')))
+        self.assertEqual(1, key.failures)
+        self.assertTrue(key.is_healthy(time.monotonic()))
+        key = pool.select()
+        pool.release(key)
+        self.assertEqual(0, key.failures)
+
+    def test_cancel(self, mock_is_locking_available):
+        pool = ApiKeyPool(self.translator)
+        key = pool.select()
+        key.failures = 1
+
+        pool.cancel(key)
+        self.assertEqual(0, key.in_flight)
+        self.assertEqual(1, key.failures)
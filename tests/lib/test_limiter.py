@@ -0,0 +1,200 @@
+import asyncio
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+from ...lib.limiter import (
+    TokenBucket, RateLimiter, SharedRateLimiter, SharedSemaphore)
+
+
+module_name = 'calibre_plugins.ebook_translator.lib.limiter'
+
+
+class TestTokenBucket(unittest.TestCase):
+    @patch(module_name + '.time')
+    def setUp(self, mock_time):
+        mock_time.monotonic.return_value = 0.0
+        self.bucket = TokenBucket(2, 2)
+
+    def test_reserve(self):
+        self.assertEqual(0.0, self.bucket.reserve(1, 0.0))
+        self.assertEqual(0.0, self.bucket.reserve(1, 0.0))
+        self.assertEqual(0.5, self.bucket.reserve(1, 0.0))
+        self.assertEqual(1.0, self.bucket.reserve(1, 0.0))
+        # The bucket has been refilled after a while.
+        self.assertEqual(0.0, self.bucket.reserve(1, 10.0))
+
+    def test_reserve_cost_exceeding_capacity(self):
+        self.assertEqual(0.0, self.bucket.reserve(10, 0.0))
+        self.assertEqual(4.5, self.bucket.reserve(1, 0.0))
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_disabled(self):
+        limiter = RateLimiter()
+        self.assertFalse(limiter.is_enabled())
+        self.assertEqual(0.0, limiter.reserve(100))
+
+    @patch(module_name + '.time')
+    def test_requests_per_minute(self, mock_time):
+        mock_time.monotonic.return_value = 0.0
+        limiter = RateLimiter(requests_per_minute=60)
+        self.assertTrue(limiter.is_enabled())
+        self.assertEqual(0.0, limiter.reserve())
+        self.assertEqual(1.0, limiter.reserve())
+        self.assertEqual(2.0, limiter.reserve())
+
+    @patch(module_name + '.time')
+    def test_min_interval(self, mock_time):
+        mock_time.monotonic.return_value = 0.0
+        limiter = RateLimiter(min_interval=5.0)
+        self.assertEqual(0.0, limiter.reserve())
+        self.assertEqual(5.0, limiter.reserve())
+
+        limiter = RateLimiter(requests_per_minute=120, min_interval=5.0)
+        self.assertEqual(0.0, limiter.reserve())
+        self.assertEqual(0.0, limiter.reserve())
+        self.assertEqual(0.5, limiter.reserve())
+
+    @patch(module_name + '.time')
+    def test_tokens_per_minute(self, mock_time):
+        mock_time.monotonic.return_value = 0.0
+        limiter = RateLimiter(tokens_per_minute=600)
+        self.assertEqual(0.0, limiter.reserve(10))
+        self.assertEqual(1.0, limiter.reserve(10))
+        self.assertEqual(1.5, limiter.reserve(5))
+
+    @patch(module_name + '.time')
+    def test_acquire(self, mock_time):
+        mock_time.monotonic.return_value = 0.0
+        limiter = RateLimiter(requests_per_minute=60)
+        limiter.acquire()
+        mock_time.sleep.assert_not_called()
+        limiter.acquire()
+        mock_time.sleep.assert_called_once_with(1.0)
+
+    @patch(module_name + '.asyncio.sleep')
+    @patch(module_name + '.time')
+    def test_acquire_async(self, mock_time, mock_sleep):
+        async def sleep(delay):
+            pass
+        mock_sleep.side_effect = sleep
+        mock_time.monotonic.return_value = 0.0
+        limiter = RateLimiter(requests_per_minute=60)
+        asyncio.run(limiter.acquire_async())
+        mock_sleep.assert_not_called()
+        asyncio.run(limiter.acquire_async())
+        mock_sleep.assert_called_once_with(1.0)
+
+
+class TestSharedRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.patcher = patch(
+            module_name + '.shared_path', return_value=self.temp_dir.name)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.temp_dir.cleanup()
+
+    @patch(module_name + '.time')
+    def test_reserve_shared_budget(self, mock_time):
+        mock_time.time.return_value = 1000.0
+        # The limiters in different processes share the same key.
+        limiter_a = SharedRateLimiter('key', requests_per_minute=60)
+        limiter_b = SharedRateLimiter('key', requests_per_minute=60)
+        other = SharedRateLimiter('other', requests_per_minute=60)
+        self.assertEqual(0.0, limiter_a.reserve())
+        self.assertEqual(1.0, limiter_b.reserve())
+        self.assertEqual(2.0, limiter_a.reserve())
+        self.assertEqual(0.0, other.reserve())
+
+        mock_time.time.return_value = 1010.0
+        self.assertEqual(0.0, limiter_b.reserve())
+
+    @patch(module_name + '.time')
+    def test_reserve_tokens(self, mock_time):
+        mock_time.time.return_value = 1000.0
+        limiter_a = SharedRateLimiter('key', tokens_per_minute=600)
+        limiter_b = SharedRateLimiter('key', tokens_per_minute=600)
+        self.assertEqual(0.0, limiter_a.reserve(10))
+        self.assertEqual(1.0, limiter_b.reserve(10))
+
+    @patch(module_name + '.time')
+    def test_reserve_with_clock_turned_back(self, mock_time):
+        mock_time.time.return_value = 1000.0
+        limiter = SharedRateLimiter('key', requests_per_minute=60)
+        limiter.reserve()
+        mock_time.time.return_value = 0.0
+        # Wait for the interval instead of the turned back time.
+        self.assertEqual(1.0, limiter.reserve())
+
+    @patch(module_name + '.asyncio.sleep')
+    def test_acquire_async(self, mock_sleep):
+        limiter = SharedRateLimiter('key', requests_per_minute=60)
+        threads = []
+
+        def reserve(cost=0):
+            threads.append(threading.current_thread())
+            return 1.0
+        limiter.reserve = reserve
+
+        asyncio.run(limiter.acquire_async())
+        # The file lock is not taken on the thread of the event loop.
+        self.assertIsNot(threading.main_thread(), threads[0])
+        mock_sleep.assert_called_once_with(1.0)
+
+
+class TestSharedSemaphore(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.patcher = patch(
+            module_name + '.shared_path', return_value=self.temp_dir.name)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.temp_dir.cleanup()
+
+    def test_try_acquire(self):
+        semaphore_a = SharedSemaphore('key', 2)
+        semaphore_b = SharedSemaphore('key', 2)
+        file_a = semaphore_a.try_acquire()
+        file_b = semaphore_b.try_acquire()
+        self.assertIsNotNone(file_a)
+        self.assertIsNotNone(file_b)
+        self.assertIsNone(semaphore_a.try_acquire())
+        self.assertIsNotNone(SharedSemaphore('other', 1).try_acquire())
+
+        semaphore_a.release(file_a)
+        file = semaphore_b.try_acquire()
+        self.assertIsNotNone(file)
+        semaphore_b.release(file)
+        semaphore_b.release(file_b)
+
+    @patch(module_name + '.time.sleep')
+    def test_hold(self, mock_sleep):
+        semaphore = SharedSemaphore('key', 1)
+        file = semaphore.try_acquire()
+        mock_sleep.side_effect = lambda delay: semaphore.release(file)
+        with semaphore.hold():
+            self.assertIsNone(semaphore.try_acquire())
+        mock_sleep.assert_called_once_with(semaphore.interval)
+        self.assertIsNotNone(semaphore.try_acquire())
+
+    @patch(module_name + '.asyncio.sleep')
+    def test_hold_async(self, mock_sleep):
+        semaphore = SharedSemaphore('key', 1)
+        file = semaphore.try_acquire()
+
+        async def sleep(delay):
+            semaphore.release(file)
+        mock_sleep.side_effect = sleep
+
+        async def hold():
+            async with semaphore.hold_async():
+                self.assertIsNone(semaphore.try_acquire())
+        asyncio.run(hold())
+        mock_sleep.assert_called_once_with(semaphore.interval)
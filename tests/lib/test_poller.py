@@ -0,0 +1,162 @@
+import tempfile
+import unittest
+import os.path
+from unittest.mock import patch, Mock
+
+from ...lib.cache import TranslationCache
+from ...lib.poller import BatchPoller
+
+
+module_name = 'calibre_plugins.ebook_translator.lib.poller'
+
+
+class TestBatchPoller(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        dir_path = self.temp_dir.name
+        self.patchers = [
+            patch.object(TranslationCache, 'dir_path', dir_path),
+            patch.object(
+                TranslationCache, 'cache_path',
+                os.path.join(dir_path, 'cache')),
+            patch.object(
+                TranslationCache, 'temp_path',
+                os.path.join(dir_path, 'temp'))]
+        for patcher in self.patchers:
+            patcher.start()
+
+        cache = TranslationCache('book')
+        for index in range(3):
+            cache.add(index, 'md5_%s' % index, 'raw', 'text %s' % index)
+        # The engine last used for the ebook is not the one of the batch.
+        cache.set_info('engine_name', 'Google(Free)')
+        cache.set_info('target_lang', 'Chinese')
+        cache.set_info('chatgpt_batch_id', 'batch-a')
+        cache.set_info('chatgpt_file_id', 'file-a')
+        cache.close()
+        TranslationCache('other').close()
+
+        self.applied = Mock()
+        self.poller = BatchPoller(self.applied)
+
+        self.mock_batch_translator = Mock()
+        self.mock_batch_translator.results.return_value = iter(
+            [('md5_0', 'A'), ('md5_2', 'C'), ('md5_x', 'X')])
+        mock_class = Mock(return_value=self.mock_batch_translator)
+        self.patchers.append(patch.dict(
+            module_name + '.batch_translators', {'chatgpt': mock_class}))
+        self.mock_get_translator = Mock()
+        self.mock_get_translator.return_value.name = 'ChatGPT'
+        self.patchers.append(patch(
+            module_name + '.get_translator', self.mock_get_translator))
+        self.mock_get_engine_class = Mock()
+        self.patchers.append(patch(
+            module_name + '.get_engine_class', self.mock_get_engine_class))
+        for patcher in self.patchers[3:]:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        self.temp_dir.cleanup()
+
+    def test_outstanding(self):
+        self.assertEqual(
+            [('book', 'chatgpt', 'batch-a')], self.poller.outstanding())
+
+    def test_poll_completed(self):
+        self.mock_batch_translator.check.return_value = {
+            'status': 'completed', 'output_file_id': 'file-x'}
+
+        self.assertEqual(self.poller.max_interval, self.poller.poll(0))
+
+        self.mock_get_engine_class.assert_called_once_with('ChatGPT')
+        self.mock_batch_translator.check.assert_called_once_with('batch-a')
+        self.mock_batch_translator.results.assert_called_once_with('file-x')
+        self.mock_batch_translator.delete.assert_called_once_with(
+            'file-a,file-x')
+        self.applied.assert_called_once_with('book', 2)
+        cache = TranslationCache('book')
+        self.assertEqual(
+            ['A', None, 'C'],
+            [paragraph.translation for paragraph in cache.all_paragraphs()])
+        self.assertEqual('ChatGPT', cache.paragraph(0).engine_name)
+        self.assertEqual('Chinese', cache.paragraph(2).target_lang)
+        self.assertIsNone(cache.get_info('chatgpt_batch_id'))
+        self.assertIsNone(cache.get_info('chatgpt_file_id'))
+        cache.close()
+        self.assertEqual([], self.poller.outstanding())
+
+    def test_poll_backoff(self):
+        self.mock_batch_translator.check.return_value = {
+            'status': 'in_progress'}
+
+        self.assertEqual(60, self.poller.poll(0))
+        self.assertEqual(30, self.poller.poll(30))
+        self.assertEqual(1, self.mock_batch_translator.check.call_count)
+        self.assertEqual(120, self.poller.poll(60))
+        self.assertEqual(240, self.poller.poll(180))
+        self.assertEqual(3, self.mock_batch_translator.check.call_count)
+        self.applied.assert_not_called()
+
+        self.poller.max_interval = 300
+        self.poller.poll(420)
+        self.assertEqual(300, self.poller.poll(900))
+
+    def test_poll_error(self):
+        self.mock_batch_translator.check.side_effect = Exception('error')
+
+        self.assertEqual(60, self.poller.poll(0))
+        self.assertEqual(
+            [('book', 'chatgpt', 'batch-a')], self.poller.outstanding())
+
+    def test_poll_failed(self):
+        self.mock_batch_translator.check.return_value = {'status': 'expired'}
+
+        self.assertEqual(self.poller.max_interval, self.poller.poll(0))
+        self.mock_batch_translator.results.assert_not_called()
+        self.mock_batch_translator.delete.assert_called_once_with('file-a')
+        self.applied.assert_not_called()
+        self.assertEqual([], self.poller.outstanding())
+
+    def test_poll_without_uploaded_files(self):
+        self.mock_batch_translator.upload_file = False
+        self.mock_batch_translator.check.return_value = {
+            'status': 'completed', 'output_file_id': 'batch-a'}
+
+        self.poller.poll(0)
+
+        self.mock_batch_translator.delete.assert_not_called()
+        self.applied.assert_called_once_with('book', 2)
+
+    def test_poll_delete_files_failed(self):
+        self.mock_batch_translator.check.return_value = {'status': 'failed'}
+        self.mock_batch_translator.delete.side_effect = Exception('error')
+
+        self.assertEqual(self.poller.max_interval, self.poller.poll(0))
+        self.assertEqual([], self.poller.outstanding())
+
+    def test_poll_forgets_removed_batches(self):
+        self.mock_batch_translator.check.return_value = {
+            'status': 'in_progress'}
+        self.poller.poll(0)
+
+        cache = TranslationCache('book')
+        cache.del_info('chatgpt_batch_id')
+        cache.close()
+
+        self.assertEqual(self.poller.max_interval, self.poller.poll(10))
+        self.assertEqual({}, self.poller.schedule)
+
+    def test_start_and_stop(self):
+        self.mock_batch_translator.check.return_value = {
+            'status': 'in_progress'}
+        self.poller.start()
+        thread = self.poller.thread
+        self.assertTrue(thread.is_alive())
+        self.poller.start()
+        self.assertIs(thread, self.poller.thread)
+
+        self.poller.stop()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
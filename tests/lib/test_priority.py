@@ -0,0 +1,71 @@
+import asyncio
+import unittest
+from unittest.mock import Mock
+
+from ...lib.priority import (
+    structure_first, longest_first, selected_first, chain, PriorityQueue)
+
+
+def paragraph(original, page='text.xhtml', row=-1):
+    return Mock(original=original, page=page, row=row)
+
+
+class TestPolicy(unittest.TestCase):
+    def test_structure_first(self):
+        self.assertEqual(0, structure_first(paragraph('a', 'toc.ncx')))
+        self.assertEqual(0, structure_first(paragraph('a', 'content.opf')))
+        self.assertEqual(1, structure_first(paragraph('a')))
+
+    def test_longest_first(self):
+        self.assertEqual(-3, longest_first(paragraph('abc')))
+        batch = Mock(paragraphs=[paragraph('ab'), paragraph('cde')])
+        self.assertEqual(-5, longest_first(batch))
+
+    def test_selected_first(self):
+        policy = selected_first([2, 3])
+        self.assertEqual(0, policy(paragraph('a', row=2)))
+        self.assertEqual(1, policy(paragraph('a', row=1)))
+        batch = Mock(paragraphs=[paragraph('a', row=1), paragraph('b', row=3)])
+        self.assertEqual(0, policy(batch))
+
+    def test_chain(self):
+        policy = chain(structure_first, longest_first)
+        self.assertEqual((0, -1), policy(paragraph('a', 'toc.ncx')))
+        self.assertEqual((1, -2), policy(paragraph('ab')))
+
+
+class TestPriorityQueue(unittest.TestCase):
+    def drain(self, queue):
+        items = []
+        while not queue.empty():
+            items.append(queue.get_nowait().original)
+        return items
+
+    def test_fifo_without_policy(self):
+        queue = PriorityQueue()
+        for text in ('b', 'a', 'c'):
+            queue.put_nowait(paragraph(text))
+        self.assertEqual(['b', 'a', 'c'], self.drain(queue))
+
+    def test_policy(self):
+        queue = PriorityQueue(chain(structure_first, longest_first))
+        for item in (paragraph('aa'), paragraph('bbbb'), paragraph('cc'),
+                     paragraph('d', 'toc.ncx')):
+            queue.put_nowait(item)
+        self.assertEqual(['d', 'bbbb', 'aa', 'cc'], self.drain(queue))
+
+    def test_reprioritize(self):
+        queue = PriorityQueue(longest_first)
+        for row, text in enumerate(('a', 'bbb', 'cc')):
+            queue.put_nowait(paragraph(text, row=row))
+
+        queue.reprioritize(chain(selected_first([0]), longest_first))
+        self.assertEqual(['a', 'bbb', 'cc'], self.drain(queue))
+
+    def test_get(self):
+        async def get():
+            queue = PriorityQueue(longest_first)
+            queue.put_nowait(paragraph('a'))
+            queue.put_nowait(paragraph('bb'))
+            return [(await queue.get()).original for _ in range(2)]
+        self.assertEqual(['bb', 'a'], asyncio.run(get()))
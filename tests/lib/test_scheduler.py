@@ -0,0 +1,77 @@
+import os
+import json
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from ...lib.scheduler import StageScheduler, get_queue_state
+
+
+module_name = 'calibre_plugins.ebook_translator.lib.scheduler'
+
+
+class TestStageScheduler(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.patcher = patch(
+            module_name + '.jobs_path', return_value=self.temp_dir.name)
+        self.patcher.start()
+        self.scheduler = StageScheduler('Book', 1, 1)
+
+    def tearDown(self):
+        self.scheduler.finish()
+        self.patcher.stop()
+        self.temp_dir.cleanup()
+
+    def test_enter(self):
+        self.scheduler.enter('parsing')
+        self.assertIsNone(self.scheduler.cpu.try_acquire())
+        self.assertEqual(
+            {'parsing': [0, 1], 'translating': [0, 0], 'writing': [0, 0]},
+            get_queue_state())
+
+        self.scheduler.enter('translating')
+        # The CPU slot is released for the other books.
+        file = self.scheduler.cpu.try_acquire()
+        self.assertIsNotNone(file)
+        self.scheduler.cpu.release(file)
+        self.assertIsNone(self.scheduler.network.try_acquire())
+        self.assertEqual([0, 1], get_queue_state()['translating'])
+
+    @patch(module_name + '.SharedSemaphore.acquire')
+    def test_enter_waiting(self, mock_acquire):
+        def acquire():
+            self.assertEqual([1, 0], get_queue_state()['writing'])
+            return self.scheduler.cpu.try_acquire()
+        mock_acquire.side_effect = acquire
+
+        self.scheduler.enter('writing')
+        mock_acquire.assert_called_once_with()
+
+    def test_enter_unlimited_translation(self):
+        scheduler = StageScheduler('Other', 1, 0)
+        self.assertIsNone(scheduler.network)
+        self.scheduler.enter('translating')
+        scheduler.enter('translating')
+        self.assertIsNone(scheduler.slot)
+        scheduler.finish()
+
+    def test_finish(self):
+        self.scheduler.enter('writing')
+        self.scheduler.finish()
+        self.assertEqual(
+            {'parsing': [0, 0], 'translating': [0, 0], 'writing': [0, 0]},
+            get_queue_state())
+        self.assertIsNotNone(self.scheduler.cpu.try_acquire())
+        self.scheduler = StageScheduler('Book', 1, 1)
+
+    def test_get_queue_state_removes_exited_jobs(self):
+        state_path = os.path.join(self.temp_dir.name, '0.json')
+        lock_path = os.path.join(self.temp_dir.name, '0.lock')
+        with open(state_path, 'w') as file:
+            json.dump({'stage': 'parsing', 'waiting': False}, file)
+        open(lock_path, 'w').close()
+
+        self.assertEqual([0, 0], get_queue_state()['parsing'])
+        self.assertFalse(os.path.exists(state_path))
+        self.assertFalse(os.path.exists(lock_path))
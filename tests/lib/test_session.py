@@ -0,0 +1,228 @@
+import io
+import json
+import time
+import asyncio
+import threading
+import unittest
+from unittest.mock import patch
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from ...lib.session import (
+    Session, AsyncSession, get_session, get_async_session, close_sessions)
+from ...lib.cancel import CancelScope, current_scope
+from ...lib.exception import HttpError, RequestCanceled
+
+
+module_name = 'calibre_plugins.ebook_translator.lib.session'
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    client_ports: list = []
+    released = threading.Event()
+
+    def do_POST(self):
+        self.client_ports.append(self.client_address[1])
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode('utf-8')
+        if body == 'hang':
+            self.released.wait(5)
+            self.close_connection = True
+            return
+        if body == 'error':
+            self.send_response(429)
+            self.send_header('Retry-After', '3')
+            content = b'{"error": "too many requests"}'
+        else:
+            self.send_response(200)
+            content = json.dumps({'text': body}).encode('utf-8')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestSession(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), MockHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.start()
+        cls.url = 'http://127.0.0.1:%s/api' % cls.server.server_port
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.thread.join()
+
+    @patch(module_name + '.get_proxies')
+    def setUp(self, mock_get_proxies):
+        mock_get_proxies.return_value = {}
+        MockHandler.client_ports.clear()
+        self.session = Session(2)
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_created_session(self):
+        self.assertEqual(2, self.session.size)
+        self.assertEqual({}, self.session.proxies)
+        self.assertEqual({}, self.session.idle)
+
+    @patch(module_name + '.get_proxies')
+    def test_proxies(self, mock_get_proxies):
+        mock_get_proxies.return_value = {'http': 'http://127.0.0.1:1234'}
+        self.assertEqual(
+            {'http': 'http://127.0.0.1:1234',
+             'https': 'http://127.0.0.1:1234'},
+            Session().proxies)
+        self.assertEqual(
+            {'http': 'http://127.0.0.1:5678',
+             'https': 'http://127.0.0.1:5678'},
+            Session(proxy_uri='http://127.0.0.1:5678').proxies)
+        mock_get_proxies.assert_called_once_with(False)
+
+    def test_request_canceled(self):
+        scope = CancelScope()
+        errors = []
+
+        def request():
+            current_scope.set(scope)
+            try:
+                self.session.request(self.url, 'hang', method='POST')
+            except Exception as e:
+                errors.append(e)
+        thread = threading.Thread(target=request)
+        thread.start()
+        try:
+            time.sleep(0.2)
+            started = time.monotonic()
+            scope.cancel()
+            thread.join(5)
+            self.assertLess(time.monotonic() - started, 1)
+        finally:
+            MockHandler.released.set()
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(1, len(errors))
+        self.assertEqual(set(), scope.connections)
+
+        token = current_scope.set(scope)
+        try:
+            self.assertRaises(
+                RequestCanceled, self.session.request, self.url, 'hello',
+                method='POST')
+        finally:
+            current_scope.reset(token)
+        MockHandler.released.clear()
+
+    def test_request_reuses_connection(self):
+        for _ in range(3):
+            self.assertEqual(
+                '{"text": "test"}',
+                self.session.request(self.url, 'test', method='POST'))
+        self.assertEqual(1, len(set(MockHandler.client_ports)))
+
+    def test_request_file_body(self):
+        body = io.BytesIO(b'test')
+        headers = {'Content-Length': '4'}
+        # The body is read from the start by each request.
+        for _ in range(2):
+            self.assertEqual(
+                '{"text": "test"}',
+                self.session.request(self.url, body, headers, 'POST'))
+
+    def test_request_raw_object(self):
+        response = self.session.request(
+            self.url, 'test', method='POST', raw_object=True)
+        self.assertEqual(200, response.status)
+        self.assertEqual(b'{"text": "test"}', response.read())
+        self.session.request(self.url, 'test', method='POST')
+        self.assertEqual(1, len(set(MockHandler.client_ports)))
+
+    def test_request_http_error(self):
+        with self.assertRaises(HttpError) as cm:
+            self.session.request(self.url, 'error', method='POST')
+        self.assertEqual(429, cm.exception.status)
+        self.assertEqual('3', cm.exception.headers.get('Retry-After'))
+        self.assertRegex(str(cm.exception), 'HTTP Error 429')
+        self.assertRegex(str(cm.exception), 'too many requests')
+
+
+class TestAsyncSession(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), MockHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.start()
+        cls.url = 'http://127.0.0.1:%s/api' % cls.server.server_port
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.thread.join()
+
+    @patch(module_name + '.get_proxies')
+    def setUp(self, mock_get_proxies):
+        mock_get_proxies.return_value = {}
+        MockHandler.client_ports.clear()
+        self.session = AsyncSession(2)
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_request_reuses_connection(self):
+        async def request():
+            return [await self.session.request(self.url, 'test', method='POST')
+                    for _ in range(3)]
+        self.assertEqual(['{"text": "test"}'] * 3, asyncio.run(request()))
+        self.assertEqual(1, len(set(MockHandler.client_ports)))
+
+    def test_request_concurrently(self):
+        async def request():
+            return await asyncio.gather(*[
+                self.session.request(self.url, str(i), method='POST')
+                for i in range(4)])
+        self.assertEqual(
+            ['{"text": "%s"}' % i for i in range(4)], asyncio.run(request()))
+
+    def test_request_raw_object(self):
+        response = asyncio.run(self.session.request(
+            self.url, 'test', method='POST', raw_object=True))
+        self.assertEqual(200, response.status)
+        self.assertEqual(b'{"text": "test"}', response.readline())
+        self.assertRaises(EOFError, response.readline)
+
+    def test_request_http_error(self):
+        with self.assertRaises(HttpError) as cm:
+            asyncio.run(self.session.request(self.url, 'error', method='POST'))
+        self.assertEqual(429, cm.exception.status)
+        self.assertEqual('3', cm.exception.headers.get('Retry-After'))
+
+
+class TestFunction(unittest.TestCase):
+    def tearDown(self):
+        close_sessions()
+
+    @patch(module_name + '.get_proxies')
+    def test_get_session(self, mock_get_proxies):
+        mock_get_proxies.return_value = {}
+        session = get_session(('Engine', None), 4)
+        self.assertIsInstance(session, Session)
+        self.assertEqual(4, session.size)
+        self.assertIs(session, get_session(('Engine', None)))
+        self.assertIsNot(session, get_session(('Other', None)))
+        get_session(('Engine', None), 8)
+        self.assertEqual(8, session.size)
+
+    @patch(module_name + '.get_proxies')
+    def test_get_async_session(self, mock_get_proxies):
+        mock_get_proxies.return_value = {}
+        session = get_async_session(('Engine', None), 4)
+        self.assertIsInstance(session, AsyncSession)
+        self.assertEqual(4, session.size)
+        self.assertIs(session, get_async_session(('Engine', None)))
+        self.assertIsNot(session, get_session(('Engine', None)))
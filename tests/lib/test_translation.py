@@ -1,14 +1,23 @@
+import json
+import time
+import asyncio
 import unittest
-from unittest.mock import patch, Mock, call
+from unittest.mock import patch, Mock, MagicMock, AsyncMock, call
 
 from ...lib.utils import dummy
-from ...lib.translation import Glossary, ProgressBar, Translation
-from ...lib.exception import TranslationCanceled, TranslationFailed
+from ...lib.handler import Hedging
+from ...lib.translation import (
+    Glossary, ProgressBar, Batch, Translation, get_fallback_translators)
+from ...lib.exception import (
+    TranslationCanceled, TranslationFailed, TranslationRetry)
 from ...engines.base import Base
 from ...engines.deepl import DeeplTranslate
+from ...engines.custom import create_engine_template
 
 
 module_name = 'calibre_plugins.ebook_translator.lib.translation'
+keys_module_name = 'calibre_plugins.ebook_translator.lib.keys'
+failover_module_name = 'calibre_plugins.ebook_translator.lib.failover'
 
 
 class TestGlossary(unittest.TestCase):
@@ -116,6 +125,18 @@ class TestTranslation(unittest.TestCase):
         self.translation.set_progress(mock_progress)
         self.assertIs(mock_progress, self.translation.progress)
 
+    def test_prioritize(self):
+        self.translation.prioritize([1])
+
+        self.translation.handler = Mock()
+        self.translation.prioritize([1])
+        policy = self.translation.handler.reprioritize.call_args.args[0]
+        self.assertEqual(
+            (0, (1, -2)),
+            policy(Mock(original='ab', page='text.xhtml', row=1)))
+        self.assertEqual(
+            (1, (0, -2)), policy(Mock(original='ab', page='toc.ncx', row=0)))
+
     def test_set_log(self):
         self.assertIs(dummy, self.translation.log)
         mock_log = Mock()
@@ -175,36 +196,281 @@ class TestTranslation(unittest.TestCase):
 
     @patch.object(Translation, 'need_stop', lambda self: False)
     @patch(f'{module_name}.traceback_error')
-    @patch(f'{module_name}.time')
-    def test_translate_text_retry_failed_translation(self, mock_time, mock_te):
+    @patch(f'{module_name}.get_retry_delay')
+    def test_translate_text_retry_failed_translation(
+            self, mock_get_retry_delay, mock_te):
         mock_te.return_value = 'test error trackback'
+        mock_get_retry_delay.return_value = 4.56
         self.translation.translator.match_error.return_value = False
-        self.translation.translator.translate.side_effect = Exception(
-            'network error')
+        error = Exception('network error')
+        self.translation.translator.translate.side_effect = error
         self.translation.log = self.log
         self.translation.cancel_request = self.cancel_request
         self.translator.request_attempt = 5
 
-        with self.assertRaises(TranslationFailed) as cm:
+        with self.assertRaises(TranslationRetry) as cm:
             self.translation.translate_text(0, 'text')
 
-        self.assertEqual(
-            str(cm.exception),
-            'Failed to retrieve data from translate engine API.\n'
-            'network error')
-        self.assertEqual(5, self.log.call_count)
+        self.assertEqual(4.56, cm.exception.delay)
+        self.assertIs(error, cm.exception.__cause__)
+        mock_get_retry_delay.assert_called_once_with(error, 1)
         log_text = (
             '══════════════════════════════════════\n'
             'Row: 0\n'
             'Original: text\n'
             '┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈\n'
-            'Status: Failed 1 times / Sleeping for 5 seconds\n'
+            'Status: Failed 1 times / Sleeping for 4.6 seconds\n'
             '┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈\n'
             'Error: test error trackback')
-        self.log.assert_any_call(log_text, True)
-        mock_time.sleep.assert_has_calls([
-            call(5), call(10), call(15), call(20), call(25)])
-        self.assertEqual(6, self.translation.abort_count)
+        self.log.assert_called_once_with(log_text, True)
+
+        with self.assertRaises(TranslationRetry):
+            self.translation.translate_text(0, 'text', 4)
+        mock_get_retry_delay.assert_called_with(error, 5)
+
+        with self.assertRaises(TranslationFailed) as cm:
+            self.translation.translate_text(0, 'text', 5)
+        self.assertEqual(
+            str(cm.exception),
+            'Failed to retrieve data from translate engine API.\n'
+            'network error')
+        self.assertEqual(2, self.log.call_count)
+        self.assertEqual(3, self.translation.abort_count)
+
+    @patch.object(Translation, 'need_stop', lambda self: False)
+    @patch(f'{module_name}.get_retry_delay')
+    def test_translate_text_async_retry_failed_translation(
+            self, mock_get_retry_delay):
+        mock_get_retry_delay.return_value = 5
+        self.translator.match_error.return_value = False
+        self.translator.translate_async = AsyncMock(
+            side_effect=Exception('network error'))
+        self.translation.cancel_request = self.cancel_request
+        self.translator.request_attempt = 1
+
+        with self.assertRaises(TranslationRetry) as cm:
+            asyncio.run(self.translation.translate_text_async(0, 'text'))
+        self.assertEqual(5, cm.exception.delay)
+
+        with self.assertRaises(TranslationFailed):
+            asyncio.run(self.translation.translate_text_async(0, 'text', 1))
+
+    def test_translate_paragraph_async(self):
+        self.translation.set_fresh(True)
+        self.translator.translate_async = AsyncMock(return_value='你好世界')
+        self.glossary.restore.return_value = '你好呀世界'
+        self.translator.name = 'Google'
+        self.translator.get_target_lang.return_value = 'zh'
+        asyncio.run(self.translation.translate_paragraph_async(self.paragraph))
+
+        self.translator.translate_async.assert_awaited_once()
+        self.translator.translate.assert_not_called()
+        self.assertEqual('你好呀世界', self.paragraph.translation)
+        self.assertEqual('Google', self.paragraph.engine_name)
+        self.assertFalse(self.paragraph.is_cache)
+
+    def test_translate_text_with_rate_limiter(self):
+        self.translation.rate_limiter = Mock()
+        self.translator.estimate_tokens.return_value = 10
+        self.translator.translate.return_value = '你好'
+
+        self.assertEqual('你好', self.translation.translate_text(0, 'Hello'))
+        self.translator.estimate_tokens.assert_called_once_with('Hello')
+        self.translation.rate_limiter.acquire.assert_called_once_with(10)
+
+    @patch(keys_module_name + '.is_shared', return_value=True)
+    @patch(keys_module_name + '.SharedSemaphore')
+    @patch(keys_module_name + '.SharedRateLimiter')
+    def test_set_rate_limiter(
+            self, mock_limiter, mock_semaphore, mock_is_shared):
+        self.translator.name = 'DeepL'
+        self.translator.api_key = 'a'
+        self.translator.api_keys = []
+        self.translator.requests_per_minute = 60
+        self.translator.tokens_per_minute = 0
+        self.translator.request_interval = 0.0
+        self.translator.adaptive_concurrency = False
+        self.translator.concurrency_limit = 4
+
+        self.translation.set_rate_limiter()
+
+        key = mock_limiter.call_args.args[0]
+        mock_limiter.assert_called_once_with(key, 60, 0, 0.0)
+        mock_semaphore.assert_called_once_with(key, 4)
+        self.assertIs(mock_limiter.return_value, self.translation.rate_limiter)
+        self.assertIs(
+            mock_semaphore.return_value, self.translation.request_slots)
+
+        self.translator.concurrency_limit = 0
+        self.translation.set_rate_limiter()
+        self.assertIsNone(self.translation.request_slots)
+
+        self.translator.adaptive_concurrency = True
+        self.translator.max_concurrency = 8
+        self.translation.set_rate_limiter()
+        mock_semaphore.assert_called_with(key, 8)
+
+        self.translator.api_key = 'b'
+        self.translation.set_rate_limiter()
+        self.assertNotEqual(key, mock_limiter.call_args.args[0])
+
+    def test_translate_text_with_request_slots(self):
+        self.translation.request_slots = MagicMock()
+        self.translator.translate.return_value = '你好'
+
+        self.assertEqual('你好', self.translation.translate_text(0, 'Hello'))
+        self.translation.request_slots.hold.assert_called_once_with()
+
+    @patch(keys_module_name + '.is_locking_available', return_value=False)
+    def test_translate_text_with_api_key_pool(self, mock_is_locking_available):
+        translator = DeeplTranslate()
+        translator.api_key = 'a'
+        translator.api_keys = ['b', 'c']
+        translator.concurrency_limit = 2
+        self.translation.translator = translator
+        self.translation.create_handler([], Mock(), Mock())
+        pool = self.translation.api_key_pool
+        self.assertEqual(3, len(pool))
+        self.assertEqual([], translator.bad_api_keys)
+
+        used = []
+
+        def translate(self, text):
+            used.append(self.api_key)
+            if self.api_key == 'b':
+                raise Exception('HTTP Error 403: Forbidden')
+            return text
+        with patch.object(DeeplTranslate, 'translate', translate):
+            self.assertEqual('x', self.translation.translate_text(0, 'x'))
+            with self.assertRaises(TranslationRetry) as context:
+                self.translation.translate_text(1, 'y')
+            self.assertEqual(0.0, context.exception.delay)
+            self.assertEqual('z', self.translation.translate_text(2, 'z'))
+            self.assertEqual('w', self.translation.translate_text(3, 'w'))
+
+        self.assertEqual(['a', 'b', 'c', 'a'], used)
+        self.assertFalse(pool.keys[1].is_healthy(time.monotonic()))
+        self.assertEqual(['b', 'c'], translator.api_keys)
+
+    def test_translate_text_cancel_without_healthy_api_key(self):
+        self.translation.api_key_pool = Mock()
+        self.translation.api_key_pool.available.return_value = False
+        self.translation.api_key_pool.release.return_value = False
+        self.translator.max_error_count = 0
+        self.translator.request_attempt = 3
+        self.translator.match_error.return_value = True
+        self.translator.translate.side_effect = Exception('403')
+        key = self.translation.api_key_pool.select.return_value
+        key.translator = self.translator
+        key.rate_limiter = key.slots = None
+
+        self.assertRaises(
+            TranslationCanceled, self.translation.translate_text, 0, 'x')
+
+    @patch(failover_module_name + '.create_limits', return_value=(None, None))
+    @patch(module_name + '.create_limits', return_value=(None, None))
+    def test_translate_paragraph_with_failover(self, *mock_create_limits):
+        self.translation.set_fresh(True)
+        self.glossary.restore.side_effect = lambda text: text
+        self.translator.name = 'A'
+        self.translator.need_api_key = False
+        self.translator.adaptive_concurrency = False
+        self.translator.hedge_requests = False
+        self.translator.concurrency_limit = 1
+        self.translator.request_attempt = 1
+        self.translator.max_error_count = 2
+        self.translator.match_error.return_value = False
+        self.translator.translate.side_effect = Exception('error')
+        self.translator.merge_enabled = False
+        fallback = Mock()
+        fallback.name = 'B'
+        fallback.merge_enabled = False
+        fallback.translate.return_value = 'translation'
+        fallback.get_target_lang.return_value = 'Chinese'
+        self.translation.set_fallbacks([fallback], 2, 60.0)
+        self.translation.create_handler([], Mock(), Mock())
+
+        self.glossary.replace.side_effect = lambda text: text
+        self.paragraph.original = 'Hello'
+        self.paragraph.row = 0
+        self.paragraph.retry = 0
+        for retry in range(2):
+            with self.assertRaises(TranslationRetry) as context:
+                self.translation.translate_paragraph(self.paragraph)
+            self.paragraph.retry += 1
+        # The paragraph moves on to the next engine at once.
+        self.assertEqual(0.0, context.exception.delay)
+        self.assertEqual(0, self.translation.abort_count)
+        # The circuit of the primary engine is open.
+        self.paragraph.retry = 0
+        self.translation.translate_paragraph(self.paragraph)
+
+        self.assertEqual(2, self.translator.translate.call_count)
+        fallback.translate.assert_called_once()
+        self.assertEqual('translation', self.paragraph.translation)
+        self.assertEqual('B', self.paragraph.engine_name)
+        self.assertEqual('Chinese', self.paragraph.target_lang)
+
+    def test_translate_text_moves_on_to_fallback(self):
+        self.translator.request_attempt = 1
+        self.translator.match_error.return_value = False
+        self.translator.max_error_count = 0
+        self.translation.failover = Mock()
+        self.translation.failover.__len__ = Mock(return_value=2)
+        route = self.translation.failover.select.return_value
+        route.translator = self.translator
+        self.translator.translate.side_effect = Exception('error')
+
+        with self.assertRaises(TranslationRetry) as context:
+            self.translation.translate_text(0, 'Hello', 1)
+        self.assertEqual(0.0, context.exception.delay)
+        self.translation.failover.select.assert_called_once_with(0)
+        # Another engine than the failed one must be available.
+        self.translation.failover.available.assert_called_once_with(route)
+
+        self.assertRaises(
+            TranslationRetry, self.translation.translate_text, 0, 'Hello', 2)
+        self.translation.failover.select.assert_called_with(1)
+        self.assertRaises(
+            TranslationFailed, self.translation.translate_text, 0, 'Hello', 3)
+
+    def test_translate_text_async_with_hedging(self):
+        canceled = []
+
+        async def translate_async(text):
+            if not canceled:
+                canceled.append(False)
+                try:
+                    await asyncio.sleep(10)
+                except asyncio.CancelledError:
+                    canceled[0] = True
+                    raise
+            return 'fast'
+        self.translator.translate_async = translate_async
+        self.translation.hedging = Hedging(95, 100)
+
+        with patch.object(self.translation.hedging, 'threshold') \
+                as mock_threshold:
+            mock_threshold.return_value = 0.01
+            self.assertEqual('fast', asyncio.run(
+                self.translation.translate_text_async(0, 'Hello')))
+
+        self.assertEqual([True], canceled)
+        self.assertEqual(1, self.translation.hedging.hedges)
+        self.assertEqual(1, len(self.translation.hedging.latencies))
+
+    def test_translate_text_async_with_hedging_failure(self):
+        self.translator.translate_async = AsyncMock(
+            side_effect=Exception('error'))
+        self.translator.request_attempt = 1
+        self.translator.max_error_count = 0
+        self.translator.match_error.return_value = False
+        self.translation.hedging = Hedging(95, 100)
+
+        self.assertRaises(
+            TranslationRetry, asyncio.run,
+            self.translation.translate_text_async(0, 'Hello'))
+        self.assertEqual(0, self.translation.hedging.hedges)
 
     def test_translate_cancel_due_to_fatal_error(self):
         pass
@@ -251,12 +517,24 @@ class TestTranslation(unittest.TestCase):
         self.glossary.restore.return_value = '你好呀世界'
         self.paragraph.translation = ''
         self.translation.total = 1
+        mock_time.monotonic.side_effect = [100.0, 100.01, 100.02, 100.05]
         self.translation.translate_paragraph(self.paragraph)
 
-        self.streaming.assert_has_calls([
+        self.assertEqual([
             call(''), call('Translating...'), call(''), call('你'),
-            call('好'), call('世'), call('界')])
-        mock_time.sleep.assert_called_with(0.05)
+            call('好世界')], self.streaming.call_args_list)
+        mock_time.sleep.assert_not_called()
+
+        # The remaining text is flushed at the end.
+        self.streaming.reset_mock()
+        self.translator.translate.return_value = (i for i in '你好')
+        self.paragraph.translation = ''
+        mock_time.monotonic.side_effect = [200.0, 200.01]
+        self.translation.translate_paragraph(self.paragraph)
+
+        self.assertEqual([
+            call(''), call('Translating...'), call(''), call('你'),
+            call('好')], self.streaming.call_args_list)
 
         self.assertEqual('你好呀世界', self.paragraph.translation)
 
@@ -288,3 +566,232 @@ class TestTranslation(unittest.TestCase):
         self.translation.translate_paragraph(self.paragraph)
 
         self.paragraph.do_aligment.assert_called_once_with('\n\n')
+
+    def test_pack_batches(self):
+        self.translator.batch_size = 3
+        self.translation.batch_budget = 10
+        paragraphs = [
+            Mock(original=text, translation=None)
+            for text in ('aaaa', 'bbbb', 'cc', 'dddddddddddd', 'e', 'f', 'g',
+                         'h')]
+        paragraphs[4].translation = 'E'
+
+        batches = self.translation.pack_batches(paragraphs, 2)
+
+        self.assertEqual(
+            [['aaaa', 'bbbb', 'cc'], ['dddddddddddd'], ['e', 'f', 'g'],
+             ['h']],
+            [[p.original for p in batch.paragraphs] for batch in batches])
+        self.assertEqual(2, batches[0].retry)
+
+    def test_pack_batches_by_page(self):
+        self.translator.batch_size = 10
+        self.translation.batch_budget = 10
+        self.translation.batch_by_page = True
+        paragraphs = [
+            Mock(original=text, translation=None, page=page)
+            for text, page in (('a', 'p1'), ('b', 'p1'), ('c', 'p2'),
+                               ('dddddddddd', 'p2'), ('e', 'p2'))]
+
+        batches = self.translation.pack_batches(paragraphs)
+
+        self.assertEqual(
+            [['a', 'b'], ['c'], ['dddddddddd'], ['e']],
+            [[p.original for p in batch.paragraphs] for batch in batches])
+
+    def test_translate_batch(self):
+        self.translation.batch_budget = 8000
+        self.glossary.replace.side_effect = lambda text: text
+        self.glossary.restore.side_effect = lambda text: text
+        paragraphs = [Mock(translation=None, row=i) for i in range(2)]
+        paragraphs[0].original = 'Hello'
+        paragraphs[1].original = 'World'
+        self.translator.translate_batch.return_value = ['你好', '世界']
+        self.translator.name = 'OpenRouter'
+        self.translator.merge_enabled = False
+        self.translator.get_target_lang.return_value = 'zh'
+
+        self.translation.translate_batch(Batch(paragraphs))
+
+        self.translator.translate_batch.assert_called_once_with(
+            ['Hello', 'World'])
+        self.assertEqual('你好', paragraphs[0].translation)
+        self.assertEqual('世界', paragraphs[1].translation)
+        self.assertEqual('OpenRouter', paragraphs[1].engine_name)
+        self.assertFalse(paragraphs[1].is_cache)
+
+    def test_translate_batch_with_glossary(self):
+        glossary = Glossary(Base.placeholder)
+        glossary.glossary = [('Alice', 'Alice'), ('Bob', '鲍勃')]
+        self.translation.glossary = glossary
+        self.translation.batch_budget = 8000
+        paragraphs = [Mock(translation=None, row=i) for i in range(2)]
+        paragraphs[0].original = 'Hello Alice'
+        paragraphs[1].original = 'Hello Bob'
+        self.translator.translate_batch.return_value = [
+            '你好 {{id_000000}}', '你好 {{id_000001}} ']
+        self.translator.merge_enabled = False
+
+        self.translation.translate_batch(Batch(paragraphs))
+
+        self.translator.translate_batch.assert_called_once_with(
+            ['Hello {{id_000000}}', 'Hello {{id_000001}}'])
+        self.assertEqual('你好 Alice', paragraphs[0].translation)
+        self.assertEqual('你好 鲍勃', paragraphs[1].translation)
+
+    def test_translate_batch_cached(self):
+        paragraph = Mock(translation='你好')
+        self.translation.translate_batch(Batch([paragraph]))
+
+        self.assertTrue(paragraph.is_cache)
+        self.translator.translate_batch.assert_not_called()
+
+    def test_translate_batch_exceeding_budget(self):
+        self.translator.batch_size = 20
+        self.translation.batch_budget = 5
+        paragraphs = [
+            Mock(original=text, translation=None) for text in ('abc', 'de')]
+        paragraphs.append(Mock(original='fg', translation=None))
+
+        with self.assertRaises(TranslationRetry) as cm:
+            self.translation.translate_batch(Batch(paragraphs, 1))
+
+        self.assertEqual(0, cm.exception.delay)
+        self.assertEqual(
+            [['abc', 'de'], ['fg']],
+            [[p.original for p in batch.paragraphs]
+             for batch in cm.exception.items])
+        self.assertEqual(1, cm.exception.items[0].retry)
+        self.translator.translate_batch.assert_not_called()
+
+    def test_translate_batch_partial(self):
+        self.translator.batch_size = 20
+        self.translation.batch_budget = 8000
+        self.translation.log = self.log
+        self.glossary.replace.side_effect = lambda text: text
+        self.glossary.restore.side_effect = lambda text: text
+        paragraphs = [
+            Mock(original=text, translation=None, row=0)
+            for text in ('Hello', 'World', 'Foo')]
+        self.translator.translate_batch.return_value = ['你好', None, '']
+
+        with self.assertRaises(TranslationRetry) as cm:
+            self.translation.translate_batch(Batch(paragraphs))
+
+        self.assertEqual(0, cm.exception.delay)
+        self.assertEqual('你好', paragraphs[0].translation)
+        self.assertIsNone(paragraphs[1].translation)
+        self.assertEqual(
+            [['World'], ['Foo']],
+            [[p.original for p in batch.paragraphs]
+             for batch in cm.exception.items])
+        self.assertEqual(6, self.translation.batch_budget)
+        self.log.assert_called_with(
+            'Incomplete batch result. Reduce the batch size to 6 '
+            'characters.', True)
+
+    def test_translate_batch_bisect(self):
+        self.translator.batch_size = 20
+        self.translation.batch_budget = 8000
+        paragraphs = [
+            Mock(original=text, translation=None, row=0)
+            for text in ('a', 'b', 'c')]
+        self.translator.translate_batch.return_value = None
+
+        with self.assertRaises(TranslationRetry) as cm:
+            self.translation.translate_batch(Batch(paragraphs, 1))
+
+        self.assertEqual(
+            [['a'], ['b', 'c']],
+            [[p.original for p in batch.paragraphs]
+             for batch in cm.exception.items])
+        self.assertEqual(1, cm.exception.items[1].retry)
+
+    def test_translate_batch_fallback(self):
+        self.translation.batch_budget = 8000
+        paragraph = Mock(original='Hello', translation=None, row=0)
+        self.translator.translate_batch.return_value = ['']
+        batch = Batch([paragraph])
+
+        with self.assertRaises(TranslationRetry) as cm:
+            self.translation.translate_batch(batch)
+        self.assertEqual([batch], cm.exception.items)
+        self.assertTrue(batch.fallback)
+        self.assertEqual(8000, self.translation.batch_budget)
+
+        self.glossary.replace.return_value = 'Hello'
+        self.glossary.restore.return_value = '你好'
+        self.translator.translate.return_value = '你好'
+        self.translation.translate_batch(batch)
+
+        self.translator.translate.assert_called_once_with('Hello')
+        self.assertEqual(1, self.translator.translate_batch.call_count)
+        self.assertEqual('你好', paragraph.translation)
+
+    def test_process_batch(self):
+        paragraphs = [Mock(), Mock()]
+        batch = Batch(paragraphs)
+        batch.error = 'any error'
+        self.translation.process_translation = Mock()
+
+        self.translation.process_batch(batch)
+
+        self.translation.process_translation.assert_has_calls(
+            [call(paragraphs[0]), call(paragraphs[1])])
+        self.assertEqual('any error', paragraphs[0].error)
+
+
+class TestFunction(unittest.TestCase):
+    @patch(module_name + '.get_translator')
+    @patch(module_name + '.get_engine_class')
+    @patch(module_name + '.get_config')
+    def test_get_fallback_translators(
+            self, mock_get_config, mock_get_engine_class,
+            mock_get_translator):
+        mock_get_config.return_value.get.side_effect = {
+            'fallback_engines': ['A', 'B', 'DeepL', 'C']}.get
+        engines = {}
+        for name in ('A', 'B', 'C'):
+            engines[name] = Mock(
+                placeholder=Base.placeholder, separator=Base.separator)
+            engines[name].name = name
+        engines['C'].separator = '\n'
+        engines['DeepL'] = DeeplTranslate
+        mock_get_engine_class.side_effect = engines.get
+        translator = Mock(
+            placeholder=Base.placeholder, separator=Base.separator,
+            source_lang='English', target_lang='Chinese')
+        translator.name = 'A'
+
+        translators = get_fallback_translators(translator)
+
+        self.assertEqual([mock_get_translator.return_value], translators)
+        mock_get_translator.assert_called_once_with(engines['B'])
+        translators[0].set_target_lang.assert_called_once_with('Chinese')
+
+    @patch(module_name + '.get_translator')
+    @patch(module_name + '.get_config')
+    def test_get_fallback_translators_custom(
+            self, mock_get_config, mock_get_translator):
+        custom_engines = {}
+        for name in ('A', 'B'):
+            data = json.loads(create_engine_template(name))
+            data['request']['url'] = 'https://%s.example.api' % name
+            custom_engines[name] = json.dumps(data)
+        mock_get_config.return_value.get.side_effect = {
+            'fallback_engines': ['A', 'B'],
+            'custom_engines': custom_engines}.get
+        mock_get_translator.side_effect = lambda engine_class: \
+            engine_class()
+        translator = Mock(
+            placeholder=Base.placeholder, separator=Base.separator,
+            source_lang='Source Language', target_lang='Target Language')
+        translator.name = 'Google(Free)'
+
+        translators = get_fallback_translators(translator)
+
+        self.assertEqual(['A', 'B'], [item.name for item in translators])
+        # Loading the second engine does not change the first one.
+        self.assertEqual(
+            ['https://A.example.api', 'https://B.example.api'],
+            [item.request['url'] for item in translators])
@@ -1,5 +1,5 @@
 import unittest
-from unittest.mock import patch
+from unittest.mock import patch, Mock
 from types import GeneratorType
 
 from ...lib.utils import (
@@ -143,3 +143,17 @@ class TestUtils(unittest.TestCase):
             'https://example.com/api', 'test data',
             headers={'User-Agent': 'Test/Agent'}, timeout=30, method='POST')
         browser.open.assert_called_once_with(mock_request())
+
+    @patch(module_name + '.Browser')
+    def test_request_with_session(self, mock_browser):
+        session = Mock()
+
+        self.assertIs(
+            request(
+                'https://example.com/api', 'test data', method='POST',
+                raw_object=True, session=session),
+            session.request.return_value)
+
+        session.request.assert_called_with(
+            'https://example.com/api', 'test data', {}, 'POST', 30, True)
+        mock_browser.assert_not_called()
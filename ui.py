@@ -1,6 +1,6 @@
 import os.path
 
-from qt.core import QMenu, QSettings  # type: ignore
+from qt.core import QMenu, QSettings, pyqtSignal  # type: ignore
 from calibre.utils.localization import _  # type: ignore
 from calibre.gui2.actions import InterfaceAction  # type: ignore
 from calibre.utils.config_base import plugin_dir  # type: ignore
@@ -8,7 +8,9 @@ from calibre.ebooks.conversion.config import (  # type: ignore
     get_input_format_for_book)
 from . import EbookTranslator
 from .lib.utils import uid
-from .lib.ebook import Ebooks
+from .lib.ebook import Ebook, Ebooks
+from .lib.cache import TranslationCache
+from .lib.poller import BatchPoller
 from .lib.config import get_config, upgrade_config
 from .lib.conversion import (
     ConversionWorker, extra_formats as predefined_extra_formats)
@@ -38,6 +40,8 @@ class EbookTranslatorGui(InterfaceAction):
         jobs: dict[object, tuple] = {}
         windows: dict[str, object] = {}
 
+    batch_applied = pyqtSignal(str, int)
+
     def genesis(self):
         try:
             self.icon = get_icons('images/icon.png', self.name)  # type: ignore
@@ -63,6 +67,34 @@ class EbookTranslatorGui(InterfaceAction):
         if not getattr(self.gui, 'bookfere_ebook_translator', False):
             self.gui.bookfere_ebook_translator = self.Status()
 
+        # The results are applied in the poller thread, and the signal hands
+        # the notification over to the GUI thread.
+        self.batch_poller = BatchPoller(self.batch_applied.emit)
+        self.batch_applied.connect(self.batch_translation_applied)
+        self.set_batch_polling(get_config().get('batch_polling'))
+
+    def set_batch_polling(self, enabled):
+        if enabled:
+            self.batch_poller.start()
+        else:
+            self.batch_poller.stop()
+
+    def batch_translation_applied(self, identity, count):
+        cache = TranslationCache(identity)
+        title = cache.get_info('title')
+        ebook_data = cache.get_info('batch_ebook')
+        cache.close()
+        self.gui.status_bar.show_message(
+            _('{} translations of the batch translation were applied: {}')
+            .format(count, title), 5000)
+        if not ebook_data or not get_config().get('batch_auto_output'):
+            return
+        ebook = Ebook.from_json(ebook_data)
+        if ebook.output_format is None:
+            return
+        worker = ConversionWorker(self.gui, self.icon)
+        worker.translate_ebook(ebook, cache_only=True)
+
     def advanced_translation_window(self, ebook):
         name = 'advanced_' + uid(ebook.get_input_path())
         if self.show_window(name):